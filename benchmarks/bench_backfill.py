@@ -0,0 +1,118 @@
+"""
+Backfill throughput against the number of worker processes.
+
+    python benchmarks/bench_backfill.py [--days 30] [--jobs 1,2,4]
+
+Writes --days rotated activity_log segments (one row per 5 s tick while
+"at the desk", gzip'ed the way LogWriter rotates them) to a scratch
+directory, then re-labels a fresh copy of them once per --jobs value. It
+reports rows/s and the speedup over one process. It also checks that
+every run, including one with tiny plain-text chunks, writes the same
+bytes, so the result does not depend on the number of workers or where
+the chunks are cut.
+"""
+import argparse
+import datetime
+import gzip
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from emotion_core import backfill  # noqa: E402
+from emotion_core.daemon import ACTIVITY_HEADER  # noqa: E402
+
+TICK = 5
+LABELS = ("Normal,Working", "Focused,Active", "Tired,Idle", "Stressed,Active")
+
+
+def make_logs(log_dir, days, seed=0):
+    """Rotated activity_log-YYYYMMDD-1.csv.gz segments; returns the row count."""
+    rng = random.Random(seed)
+    day0 = datetime.datetime(2025, 1, 1, 8)
+    rows = 0
+    for d in range(days):
+        t = day0 + datetime.timedelta(days=d)
+        end = t + datetime.timedelta(hours=10)
+        lines = [ACTIVITY_HEADER]
+        kpm = 150
+        while t < end:
+            idle = rng.random() < 0.15
+            kpm = 0 if idle else max(0, int(kpm + rng.gauss(0, 25)) or 150)
+            mouse = 0 if idle else rng.randint(1000, 15000)
+            clicks = 0 if idle else rng.randint(0, 40)
+            lines.append(f"{t.isoformat()},{kpm},{mouse},{clicks},{rng.choice(LABELS)}\n")
+            t += datetime.timedelta(seconds=TICK)
+        rows += len(lines) - 1
+        name = f"activity_log-{t:%Y%m%d}-1.csv.gz"
+        with gzip.open(os.path.join(log_dir, name), "wt") as f:
+            f.writelines(lines)
+    return rows
+
+
+def digest(log_dir):
+    h = hashlib.sha1()
+    for path in sorted(os.listdir(log_dir)):
+        if path.endswith(".gz"):
+            with gzip.open(os.path.join(log_dir, path), "rb") as f:
+                h.update(f.read())
+        elif path.endswith(".csv"):
+            with open(os.path.join(log_dir, path), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def run(source, scratch, name, jobs, chunk_bytes=backfill.CHUNK_BYTES, plain=False):
+    log_dir = os.path.join(scratch, name)
+    shutil.copytree(source, log_dir)
+    if plain:
+        # Uncompressed segments, so --chunk-bytes splits them into many chunks.
+        for path in os.listdir(log_dir):
+            with gzip.open(os.path.join(log_dir, path), "rb") as src, \
+                    open(os.path.join(log_dir, path[:-3]), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(os.path.join(log_dir, path))
+    argv = ["--log-dir", log_dir, "--jobs", str(jobs), "--chunk-bytes", str(chunk_bytes)]
+    t0 = time.perf_counter()
+    with open(os.devnull, "w") as quiet:
+        stdout, sys.stdout = sys.stdout, quiet
+        try:
+            code = backfill.main(argv)
+        finally:
+            sys.stdout = stdout
+    seconds = time.perf_counter() - t0
+    if code:
+        raise SystemExit(f"backfill {name} exited with {code}")
+    shutil.rmtree(os.path.join(log_dir, backfill.WORK_DIR))
+    return seconds, digest(log_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--jobs", default="1,2,4", type=lambda s: [int(j) for j in s.split(",")])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        source = os.path.join(scratch, "source")
+        os.makedirs(source)
+        rows = make_logs(source, args.days)
+        print(f"{args.days} segments, {rows:,} rows, {os.cpu_count()} CPUs")
+        print(f"{'jobs':>5} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+        base, digests = None, set()
+        for jobs in args.jobs:
+            seconds, d = run(source, scratch, f"jobs{jobs}", jobs)
+            base = base or seconds
+            digests.add(d)
+            print(f"{jobs:>5} {seconds:>9.2f} {rows / seconds:>12,.0f} {base / seconds:>7.2f}x")
+        _, d = run(source, scratch, "plain", max(args.jobs), chunk_bytes=64 * 1024, plain=True)
+        digests.add(d)
+        print(f"\nidentical output across runs and chunkings: {'yes' if len(digests) == 1 else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Headless input-capture throughput via synthetic event replay.
+
+    python benchmarks/bench_capture.py
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from emotion_core.capture import CLICK, KEY, MOVE, Counters, ReplaySource, WindowAggregator, synthetic_events  # noqa: E402
+
+
+def expected(events):
+    keys = sum(1 for k, _, _ in events if k == KEY)
+    clicks = sum(1 for k, _, _ in events if k == CLICK)
+    px, last = 0.0, None
+    for k, x, y in events:
+        if k == MOVE:
+            if last:
+                px += math.hypot(x - last[0], y - last[1])
+            last = (x, y)
+    return keys, clicks, px
+
+
+def main():
+    events = synthetic_events(1_000_000)
+    keys, clicks, px = expected(events)
+
+    c = Counters()
+    src = ReplaySource(c, events)
+    t0 = time.perf_counter()
+    src.start()
+    src.join()
+    dt = time.perf_counter() - t0
+    ok = c.keys == keys and c.clicks == clicks and abs(c.mouse_px - px) < 1e-6 * px
+    print(f"unpaced replay: {len(events) / dt:,.0f} events/s, counts exact: {ok}")
+
+    for rate in (10_000, 50_000):
+        n = rate * 3
+        ev = events[:n]
+        keys, clicks, _ = expected(ev)
+        c = Counters()
+        agg = WindowAggregator(c)
+        src = ReplaySource(c, ev, rate=rate)
+        total_k = total_c = 0.0
+        last = time.monotonic()
+        src.start()
+        while src.running:
+            time.sleep(0.25)
+            w = agg.window()
+            now = time.monotonic()
+            total_k += w["kpm"] * (now - last) / 60
+            total_c += w["clicks"] * (now - last) / 60
+            last = now
+        w = agg.window()
+        now = time.monotonic()
+        total_k += w["kpm"] * (now - last) / 60
+        total_c += w["clicks"] * (now - last) / 60
+        print(f"paced {rate:,}/s: sent {src.sent:,}, keys {c.keys}/{keys}, clicks {c.clicks}/{clicks}, "
+              f"aggregated keys ~{total_k:,.0f}, clicks ~{total_c:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Shadow classifiers: what they cost the tick and how the engines compare.
+
+    python benchmarks/bench_classifiers.py [--ticks 3000] [--primary xgboost]
+
+Feeds one synthetic feature stream (random window counts, FeatureExtractor
+vectors) to a ShadowHarness with 0, 1 and 2 shadows, and reports the time
+classify() spends on the analyzer thread in each case next to the bare
+primary. A short pause every 50 ticks lets the pool keep up, as the real
+5-15 s ticks do. The last run's report gives each engine's own latency,
+label mix and agreement with the primary.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from emotion_core import classifiers  # noqa: E402
+from emotion_core.features import FeatureExtractor  # noqa: E402
+
+
+def stream(ticks, seed=0):
+    """(window, feature vector) pairs; vectors are copies, unlike capture.sample()."""
+    rng = np.random.default_rng(seed)
+    fx = FeatureExtractor(clock=lambda: 0.0)
+    out = []
+    for i in range(ticks):
+        w = {"kpm": int(rng.integers(0, 320)), "mouse": int(rng.integers(0, 16000)),
+             "clicks": int(rng.integers(0, 45))}
+        out.append((w, fx.tick(w, now=i * 15.0).copy()))
+    return out
+
+
+def run(primary, shadows, ticks):
+    h = classifiers.ShadowHarness.from_names(primary, shadows)
+    h.warm()
+    lat = np.empty(len(ticks))
+    for i, (w, x) in enumerate(ticks):
+        t0 = time.perf_counter()
+        h.classify(w, x)
+        lat[i] = time.perf_counter() - t0
+        if i % 50 == 49:
+            time.sleep(0.02)
+    while h.pending:
+        time.sleep(0.01)
+    h.close()
+    return lat * 1e6, h.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ticks", type=int, default=3000)
+    parser.add_argument("--primary", default="xgboost", choices=sorted(classifiers.ENGINES))
+    args = parser.parse_args()
+
+    ticks = stream(args.ticks)
+    others = [name for name in ("heuristic", "random", "xgboost") if name != args.primary]
+    engine = classifiers.create(args.primary)
+    engine.warm()
+    bare = np.empty(len(ticks))
+    for i, (w, x) in enumerate(ticks):
+        t0 = time.perf_counter()
+        engine.predict(w, x)
+        bare[i] = time.perf_counter() - t0
+    bare *= 1e6
+    print(f"{args.ticks:,} ticks, primary {args.primary}\n")
+    print(f"{'shadows':<22} {'p50 us':>8} {'p99 us':>8} {'dropped':>8}")
+    print(f"{'(bare predict)':<22} {np.percentile(bare, 50):>8.1f} {np.percentile(bare, 99):>8.1f} {'':>8}")
+    for n in range(len(others) + 1):
+        lat, report = run(args.primary, others[:n], ticks)
+        label = ",".join(others[:n]) or "none"
+        print(f"{label:<22} {np.percentile(lat, 50):>8.1f} {np.percentile(lat, 99):>8.1f} {report['dropped']:>8}")
+
+    print(f"\n{'engine':<10} {'p50 ms':>8} {'p99 ms':>8} {'agree':>7}  labels")
+    for name, e in report["engines"].items():
+        agree = report["agreement"].get(name, {}).get("emotion", {}).get("agreement")
+        mix = " ".join(f"{k[:3]}={v:.2f}" for k, v in e["labels"].items())
+        print(f"{name:<10} {e['latency_ms']['p50']:>8.4f} {e['latency_ms']['p99']:>8.4f} "
+              f"{'-' if agree is None else f'{agree:.3f}':>7}  {mix}")
+
+
+if __name__ == "__main__":
+    main()
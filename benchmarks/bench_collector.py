@@ -0,0 +1,197 @@
+"""
+Simulated-agent load generator for the team collector.
+
+    python benchmarks/bench_collector.py [--agents 2000] [--every 5] [--seconds 20]
+                                         [--connections 32] [--ticks 1] [--url http://host:9090]
+
+Without --url it starts `python -m emotion_core.collector --no-save` on a
+free local port in its own process. --agents simulated monitors each send
+one gzip'ed batch of --ticks ticks every --every seconds, staggered evenly,
+encoded with agent.encode() exactly as a real agent does. The batches go
+out over a shared pool of --connections keep-alive connections. It reports:
+
+  - the offered and achieved batch rate, and errors;
+  - latency from each batch's scheduled send time to its response, so
+    falling behind shows up as growing latency, not a lower request rate;
+  - /api/team and /api/team/summary times with every agent known, and the
+    collector's resident memory.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from emotion_core.agent import INGEST_PATH, encode  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_collector():
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "emotion_core.collector", "--host", "127.0.0.1",
+                             "--port", str(port), "--no-save"], cwd=ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise SystemExit("collector did not start")
+
+
+class Fleet:
+    def __init__(self, agents, every, ticks, seed=0):
+        self.rng = random.Random(seed)
+        self.names = [f"ws-{i:05d}" for i in range(agents)]
+        self.seq = [0] * agents
+        self.every = every
+        self.ticks = ticks
+
+    def batch(self, i, now):
+        self.seq[i] += 1
+        rng = self.rng
+        step = self.every / self.ticks
+        ticks = [(round(now - (self.ticks - 1 - k) * step, 3), rng.randint(0, 300), rng.randint(0, 15000),
+                  rng.randint(0, 40), rng.randrange(4), rng.randint(50, 99), rng.randrange(4))
+                 for k in range(self.ticks)]
+        return encode(self.names[i], "bench", self.seq[i], ticks, interval=step, utc_offset=0)
+
+
+async def post(reader, writer, host, body):
+    writer.write((f"POST {INGEST_PATH} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Encoding: gzip\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    length = next(int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length"))
+    await reader.readexactly(length)
+    return status
+
+
+async def load(host, port, fleet, seconds, connections):
+    queue = asyncio.Queue()
+    latencies, errors = [], {}
+    start = time.monotonic() + 0.5
+    n = len(fleet.names)
+
+    async def schedule():
+        # Agent i reports at start + i * every / n, then every `every` seconds.
+        k = 0
+        while True:
+            due = start + k * fleet.every / n
+            if due - start >= seconds:
+                break
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait((k % n, due))
+            k += 1
+        for _ in range(connections):
+            queue.put_nowait(None)
+
+    async def worker():
+        reader, writer = await asyncio.open_connection(host, port)
+        while (item := await queue.get()) is not None:
+            i, due = item
+            try:
+                status = await post(reader, writer, host, fleet.batch(i, time.time()))
+            except (OSError, asyncio.IncompleteReadError) as err:
+                errors[type(err).__name__] = errors.get(type(err).__name__, 0) + 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+            latencies.append(time.monotonic() - due)
+        writer.close()
+
+    t0 = time.monotonic()
+    await asyncio.gather(schedule(), *(worker() for _ in range(connections)))
+    return np.array(latencies), errors, time.monotonic() - max(t0, start)
+
+
+def timed_get(host, port, path):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    t0 = time.perf_counter()
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    body = resp.read()
+    seconds = time.perf_counter() - t0
+    conn.close()
+    return seconds, resp.status, body
+
+
+def rss(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS"))
+    except (OSError, StopIteration):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--agents", type=int, default=2000)
+    parser.add_argument("--every", type=float, default=5.0, help="seconds between an agent's batches")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--ticks", type=int, default=1, help="ticks per batch")
+    parser.add_argument("--url", help="existing collector; default: start one locally")
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        proc, port = start_collector()
+        host = "127.0.0.1"
+    try:
+        fleet = Fleet(args.agents, args.every, args.ticks)
+        offered = args.agents / args.every
+        print(f"{args.agents:,} agents every {args.every:g} s, {args.ticks} tick(s)/batch, "
+              f"{args.connections} connections, {os.cpu_count()} CPUs")
+        print(f"  offered              {offered:10,.0f} batches/s ({offered * args.ticks:,.0f} ticks/s)")
+        lat, errors, elapsed = asyncio.run(load(host, port, fleet, args.seconds, args.connections))
+        lat *= 1e3
+        print(f"  achieved             {len(lat) / elapsed:10,.0f} batches/s over {elapsed:.1f} s")
+        print(f"  latency p50 / p99    {np.percentile(lat, 50):10.2f} / {np.percentile(lat, 99):.2f} ms "
+              f"(max {lat.max():.1f})")
+        print(f"  errors               {errors or 'none'}")
+
+        seconds, status, body = timed_get(host, port, "/api/team?limit=100")
+        team = json.loads(body)
+        print(f"  GET /api/team        {seconds * 1e3:10.1f} ms ({team['agents']:,} agents)")
+        seconds, status, body = timed_get(host, port, "/api/team/summary?days=1")
+        print(f"  GET /api/team/summary{seconds * 1e3:10.1f} ms first, ", end="")
+        seconds, status, body = timed_get(host, port, "/api/team/summary?days=1")
+        print(f"{seconds * 1e3:.1f} ms cached ({json.loads(body)['total']['ticks']:,} ticks)")
+        seconds, status, body = timed_get(host, port, f"/api/team/summary?agent={fleet.names[0]}&days=1")
+        print(f"  GET .../summary?agent{seconds * 1e3:10.1f} ms")
+        if proc is not None and rss(proc.pid):
+            print(f"  collector RSS        {rss(proc.pid) / 2**20:10.1f} MB")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Inference latency/throughput and memory: xgboost pickles vs compiled .npz.
+
+    python benchmarks/bench_inference.py
+
+Cold load and memory are measured in a fresh interpreter per backend
+(resident set after loading the models, and whether xgboost got imported).
+Latency runs in this process, with both engines loaded.
+"""
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from emotion_core.inference import InferenceEngine, features_from_counts  # noqa: E402
+
+BATCH_SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+BACKENDS = (("xgboost", False), ("numpy", True))
+
+# Fresh process: RSS before/after loading, load time, heavy modules pulled in.
+COLD = """
+import sys, time, warnings
+sys.path.insert(0, {root!r})
+warnings.simplefilter("ignore")
+def rss():
+    with open("/proc/self/status") as f:
+        return next(int(l.split()[1]) for l in f if l.startswith("VmRSS")) / 1024
+import numpy
+before = rss()
+t0 = time.perf_counter()
+from emotion_core.inference import InferenceEngine
+InferenceEngine(compiled={compiled}).models
+dt = time.perf_counter() - t0
+print(dt * 1e3, before, rss(), "xgboost" in sys.modules, "sklearn" in sys.modules)
+"""
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def cold(compiled):
+    out = subprocess.run([sys.executable, "-c", COLD.format(root=ROOT, compiled=compiled)],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), float(out[1]), float(out[2]), out[3] == "True", out[4] == "True"
+
+
+def main():
+    if sys.platform.startswith("linux"):
+        print(f"{'backend':<8} {'cold load ms':>13} {'RSS MB':>8} {'+models MB':>11}  imports")
+        for name, compiled in BACKENDS:
+            load_ms, before, after, xgb, sk = cold(compiled)
+            heavy = ", ".join(m for m, hit in (("xgboost", xgb), ("sklearn", sk)) if hit) or "numpy only"
+            print(f"{name:<8} {load_ms:>13.1f} {after:>8.1f} {after - before:>11.1f}  {heavy}")
+
+    rng = np.random.default_rng(0)
+    engines = [(name, InferenceEngine(compiled=compiled)) for name, compiled in BACKENDS]
+    mean, scale = engines[0][1].models[:2]
+    row = features_from_counts(180, 9000, 20)
+    n = 2000
+    print()
+    for name, engine in engines:
+        engine.predict_one(row)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            engine.predict_one(row)
+        print(f"{name:<8} predict_one: {(time.perf_counter() - t0) / n * 1e6:.1f} us/window")
+
+    print(f"\n{'batch':>8}" + "".join(f" {name + ' ms':>12} {'rows/s':>12}" for name, _ in engines))
+    for size in BATCH_SIZES:
+        X = rng.normal(mean, scale, size=(size, 9))
+        line = f"{size:>8}"
+        for _, engine in engines:
+            engine.predict_batch(X)
+            best = timed(lambda: engine.predict_batch(X), repeat=5 if size < 100_000 else 2)
+            line += f" {best * 1e3:>12.3f} {size / best:>12,.0f}"
+        print(line)
+
+    X = rng.normal(mean, scale, size=(10_000, 9))
+    a, b = (engine.predict_batch(X) for _, engine in engines)
+    print(f"\nlabel agreement on 10k rows: emotion {np.mean(a.emotion == b.emotion):.4%}, "
+          f"max |conf diff| {np.abs(a.emotion_conf - b.emotion_conf).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
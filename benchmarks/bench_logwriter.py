@@ -0,0 +1,94 @@
+"""
+Log-append throughput and analyzer tick jitter under a slow disk.
+
+The slow disk is a file wrapper that sleeps on every write/flush, standing
+in for a spinning or network-mounted home directory.
+
+    python benchmarks/bench_logwriter.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from emotion_core.logwriter import LogWriter  # noqa: E402
+
+DISK_LATENCY = 0.005   # seconds per write() and per flush()
+TICKS = 200
+TICK = 0.01
+LINE = "[12:00:00] Focused (84%) | KPM=214 | Mouse=7939 | Clicks=49\n"
+
+
+class SlowFile:
+    def __init__(self, path, mode, **kw):
+        self._f = open(path, mode, **kw)
+
+    def write(self, data):
+        time.sleep(DISK_LATENCY)
+        return self._f.write(data)
+
+    def flush(self):
+        time.sleep(DISK_LATENCY)
+        self._f.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def tick_jitter(append):
+    """Run a fixed-rate loop that appends one line per tick; return lateness stats (ms)."""
+    late = []
+    deadline = time.monotonic()
+    for _ in range(TICKS):
+        deadline += TICK
+        t0 = time.perf_counter()
+        append(LINE)
+        late.append((time.perf_counter() - t0) * 1e3)
+        time.sleep(max(0.0, deadline - time.monotonic()))
+    late.sort()
+    return statistics.mean(late), late[len(late) // 2], late[int(len(late) * 0.99) - 1], late[-1]
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+
+    path = os.path.join(tmp, "sync.txt")
+
+    def sync_append(line):
+        with SlowFile(path, "a") as f:
+            f.write(line)
+
+    print(f"slow disk: {DISK_LATENCY * 1e3:.0f} ms per write/flush, {TICKS} ticks every {TICK * 1e3:.0f} ms")
+    print(f"{'writer':>10} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    print(f"{'open/close':>10}" + "".join(f"{v:>10.3f}" for v in tick_jitter(sync_append)))
+    w = LogWriter(os.path.join(tmp, "queued.txt"), opener=SlowFile)
+    print(f"{'LogWriter':>10}" + "".join(f"{v:>10.3f}" for v in tick_jitter(w.write)))
+    w.close()
+
+    n = 200_000
+    w = LogWriter(os.path.join(tmp, "bulk.txt"), max_queue=n, flush_records=4096, opener=SlowFile)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        w.write(LINE)
+    w.close(timeout=60)
+    dt = time.perf_counter() - t0
+    print(f"LogWriter throughput: {w.written / dt:,.0f} records/s ({w.written} written, {w.dropped} dropped)")
+
+    n = 2000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        sync_append(LINE)
+    dt = time.perf_counter() - t0
+    print(f"open/append/close throughput: {n / dt:,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
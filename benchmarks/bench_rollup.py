@@ -0,0 +1,77 @@
+"""
+/api/summary from the rollup tables vs. recomputing it from the raw logs.
+
+    python benchmarks/bench_rollup.py [--days 90]
+
+Writes --days of rotated activity_log segments (5 s ticks, 10 h a day; see
+bench_backfill.make_logs), then:
+
+  - scans them once the way `rollup --rebuild` does (the cost of answering
+    a summary without rollups), reporting the per-tick add() cost;
+  - answers day / week / total summaries over the whole range from the
+    tables, through the same summary() the HTTP route calls;
+  - reports the size of the saved tables.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_backfill import make_logs  # noqa: E402
+from emotion_core import rollup  # noqa: E402
+from emotion_core.training import read_rows  # noqa: E402
+
+
+def best_of(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        ticks = make_logs(log_dir, args.days)
+        print(f"{args.days} days, {ticks:,} ticks")
+
+        t0 = time.perf_counter()
+        rows = list(read_rows(log_dir, "activity"))
+        read_s = time.perf_counter() - t0
+        r = rollup.Rollups()
+        t0 = time.perf_counter()
+        for ts, kpm, mouse, clicks, emotion, activity in rows:
+            r.add(ts, kpm, mouse, clicks, emotion, None, activity)
+        add_s = time.perf_counter() - t0
+        print(f"  raw log scan + fold      {(read_s + add_s) * 1e3:10.0f} ms")
+        print(f"  add() per tick           {add_s / ticks * 1e6:10.1f} us")
+
+        path = os.path.join(log_dir, rollup.ROLLUP_FILE)
+        r.save(path)
+        t0 = time.perf_counter()
+        r = rollup.Rollups.load(path)
+        load_s = time.perf_counter() - t0
+        print(f"  saved tables             {os.path.getsize(path):10,} bytes (load {load_s * 1e3:.2f} ms)")
+
+        first = rollup.day_date(r.days.first).isoformat()
+        last = rollup.day_date(r.days.first + r.days.size - 1).isoformat()
+        for group in rollup.GROUPS:
+            q = {"from": first, "to": last, "group": group}
+            status, result = rollup.summary(r, q)
+            body = json.dumps(result).encode()
+            seconds = best_of(lambda: json.dumps(rollup.summary(r, q)[1]).encode())
+            print(f"  summary group={group:<6}     {seconds * 1e3:10.2f} ms  "
+                  f"({len(result.get('rows', ())):>3} rows, {len(body):,} bytes JSON)")
+
+
+if __name__ == "__main__":
+    main()
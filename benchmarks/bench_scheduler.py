@@ -0,0 +1,155 @@
+"""
+Scheduler wakeups over a simulated day, and deadline drift on a real loop.
+
+    python benchmarks/bench_scheduler.py [--hours 8] [--seconds 10]
+
+The simulation runs v9's periodic jobs through the real TimerWheel and
+Adaptive policies on a virtual clock. The day is a pattern of active,
+idle and paused stretches. The result is compared with the fixed-sleep
+loops the jobs replaced. The drift run starts a Scheduler on asyncio with a
+job whose work takes a third of its interval. It checks that its start
+times stay on the interval grid, where a "work, then sleep(interval)" loop
+falls behind by the work time on every run.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from emotion_core.scheduler import ACTIVE, IDLE, Adaptive, Job, Scheduler, TimerWheel  # noqa: E402
+
+# (minutes, state) repeated over the simulated day.
+DAY = [(50, "active"), (10, "idle"), (45, "active"), (20, "idle"), (30, "paused"), (25, "active"), (60, "idle")]
+EMOTION_CHANGE = 0.08        # chance an active tick sees a new emotion
+LOG_FILES = 2                # session_log + activity_log
+
+
+def state_at(t):
+    cycle = sum(m for m, _ in DAY) * 60
+    t %= cycle
+    for minutes, state in DAY:
+        if t < minutes * 60:
+            return state
+        t -= minutes * 60
+    return DAY[-1][1]
+
+
+def simulate(hours, seed=1):
+    """Wheel wakeups and analyzer runs for v9's jobs on a virtual clock."""
+    rng = random.Random(seed)
+    end = hours * 3600.0
+    wheel = TimerWheel(0.0)
+    analyzer = Job("analyzer", None, Adaptive(15, fast=5, slow=120), True)
+    menubar = Job("menubar", None, Adaptive(5, slow=60), False)
+    for job in (analyzer, menubar):
+        wheel.add(job, 0.0)
+    wakeups = runs = title_pokes = 0
+    busy_before = False
+    while True:
+        when = wheel.next_time()
+        if when is None or when > end:
+            break
+        wakeups += 1
+        for job in wheel.expire(when):
+            state = state_at(when)
+            if job is analyzer:
+                runs += 1
+                if state == "paused":
+                    hint = IDLE
+                else:
+                    busy = state == "active"
+                    changed = busy and rng.random() < EMOTION_CHANGE
+                    if changed or (busy and not busy_before):
+                        hint = ACTIVE
+                    else:
+                        hint = None if busy else IDLE
+                    busy_before = busy
+                    title_pokes += 1        # analyzer wakes the menubar job
+                    wakeups += 1            # the blocking job's completion wakes the loop
+            else:
+                hint = IDLE                 # title changes arrive through wake()
+            job.deadline += job.policy.next(hint)
+            wheel.add(job, job.deadline)
+    return wakeups, runs, title_pokes
+
+
+def fixed(hours):
+    """Timer wakeups of the loops the scheduler replaced (v9)."""
+    s = hours * 3600.0
+    analyzer = s / 15
+    return {"analyzer (15 s)": analyzer, "menubar title (5 s)": s / 5,
+            "log writers (1 s poll each)": LOG_FILES * s / 1.0}
+
+
+async def grid_run(interval, work, runs):
+    starts = []
+    done = asyncio.Event()
+    scheduler = Scheduler()
+
+    def job():
+        starts.append(time.monotonic())
+        time.sleep(work)
+        if len(starts) >= runs:
+            loop.call_soon_threadsafe(done.set)
+
+    loop = asyncio.get_running_loop()
+    scheduler.add("grid", job, interval)
+    task = asyncio.create_task(scheduler.run())
+    await done.wait()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return starts, scheduler.wakeups
+
+
+def naive_run(interval, work, runs):
+    starts = []
+    for _ in range(runs):
+        starts.append(time.monotonic())
+        time.sleep(work)
+        time.sleep(interval)
+    return starts
+
+
+def drift(starts, interval):
+    lag = [t - (starts[0] + i * interval) for i, t in enumerate(starts)]
+    return lag[-1], max(lag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of the real drift run")
+    args = parser.parse_args()
+
+    print(f"--- Simulated {args.hours:g} h (virtual clock) ---")
+    old = fixed(args.hours)
+    for name, n in old.items():
+        print(f"  fixed  {name:<30} {n:9.0f} wakeups")
+    total_old = sum(old.values())
+    wakeups, runs, pokes = simulate(args.hours)
+    # Log writers now wake once per batch: one per analyzer tick that wrote lines.
+    logs = LOG_FILES * pokes
+    total_new = wakeups + pokes + logs
+    print(f"  fixed  total                          {total_old:9.0f}  ({total_old / args.hours:.0f}/h)")
+    print(f"  wheel  loop wakeups                   {wakeups:9d}  ({runs} analyzer runs, fixed: {old['analyzer (15 s)']:.0f})")
+    print(f"  wheel  menubar wake() from analyzer   {pokes:9d}")
+    print(f"  wheel  log writer batches             {logs:9d}")
+    print(f"  wheel  total                          {total_new:9d}  ({total_new / args.hours:.0f}/h, "
+          f"{total_old / max(total_new, 1):.1f}x fewer)")
+
+    interval, work = 0.1, 0.03
+    runs = max(2, int(args.seconds / interval))
+    print(f"\n--- Real loop: {runs} runs, interval {interval * 1e3:.0f} ms, work {work * 1e3:.0f} ms ---")
+    starts, loop_wakeups = asyncio.run(grid_run(interval, work, runs))
+    final, worst = drift(starts, interval)
+    print(f"  scheduler    final lag {final * 1e3:8.2f} ms   worst {worst * 1e3:8.2f} ms   "
+          f"loop wakeups {loop_wakeups}")
+    final, worst = drift(naive_run(interval, work, runs), interval)
+    print(f"  work+sleep   final lag {final * 1e3:8.2f} ms   worst {worst * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+/api/series from the history tiers vs. sending the whole range.
+
+    python benchmarks/bench_series.py [--days 30] [--points 500]
+
+Fills a HistoryStore with --days of 5 s ticks (10 h a day at the desk,
+the same shape as bench_backfill.make_logs). For a range of views from
+1 h up to the whole history it then reports:
+
+  - the tier series() reads and how many samples it reduces;
+  - the time to answer, JSON encoding included, through the same series()
+    the HTTP route calls;
+  - the body size, next to a plain JSON list of every sample in the
+    range, which is what the dashboard would fetch without downsampling.
+
+It also checks that LTTB keeps the largest kpm spike of every view.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from emotion_core import series  # noqa: E402
+from emotion_core.history import HistoryStore  # noqa: E402
+
+TICK = 5
+VIEWS = (("1 h", 3600), ("24 h", 86400), ("7 days", 7 * 86400), ("30 days", 30 * 86400))
+
+
+def best_of(fn, repeat=10):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def fill(days, seed=0):
+    """HistoryStore with `days` of ticks; returns (store, ticks, end time)."""
+    rng = np.random.default_rng(seed)
+    h = HistoryStore(utc_offset=0)
+    day0 = 1735718400 + 8 * 3600        # 2025-01-01 08:00 UTC
+    per_day = 10 * 3600 // TICK
+    for d in range(days):
+        t = day0 + d * 86400 + np.arange(per_day) * TICK
+        idle = rng.random(per_day) < 0.15
+        kpm = np.where(idle, 0, np.clip(150 + rng.normal(0, 40, per_day), 0, None)).round()
+        mouse = np.where(idle, 0, rng.integers(1000, 15000, per_day))
+        clicks = np.where(idle, 0, rng.integers(0, 40, per_day))
+        emotion = rng.integers(0, 4, per_day)
+        activity = rng.integers(0, 4, per_day)
+        conf = rng.integers(40, 100, per_day)
+        for row in zip(t.tolist(), kpm.tolist(), mouse.tolist(), clicks.tolist(),
+                       emotion.tolist(), conf.tolist(), activity.tolist()):
+            h.append(*row)
+    return h, days * per_day, float(t[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--points", type=int, default=series.DEFAULT_POINTS)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    h, ticks, end = fill(args.days)
+    print(f"{args.days} days, {ticks:,} ticks, append {(time.perf_counter() - t0) / ticks * 1e6:.1f} us/tick, "
+          f"{h.nbytes:,} bytes in memory")
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "history.bin")
+        h.save(path)
+        load_s = best_of(lambda: HistoryStore.load(path), repeat=3)
+        print(f"saved snapshot {os.path.getsize(path):,} bytes (load {load_s * 1e3:.1f} ms)\n")
+
+    print(f"{'view':<8} {'tier':>4} {'samples':>8} {'points':>7} {'ms':>7} {'bytes':>9} "
+          f"{'full range':>11} {'peak kept':>10}")
+    for name, span in VIEWS:
+        if span > args.days * 86400:
+            continue
+        q = {"from": str(end - span), "to": str(end), "points": str(args.points)}
+        status, result = series.series(h, q)
+        body = json.dumps(result, separators=(",", ":")).encode()
+        seconds = best_of(lambda: json.dumps(series.series(h, q)[1], separators=(",", ":")).encode())
+        # The same range sent as-is from the tier series() picked.
+        s = h.range(end - span, end, tier=result["tier"])
+        full = json.dumps([{"t": t, "kpm": k, "mouse": m, "emotion": e}
+                           for t, k, m, e in zip(s.t.tolist(), s.kpm.tolist(), s.mouse.tolist(),
+                                                 s.emotion.tolist())], separators=(",", ":"))
+        peak = round(float(s.kpm.max()), 1) in result["kpm"]["v"] if len(s.t) else True
+        print(f"{name:<8} {result['tier']:>4} {result['samples']:>8,} {len(result['kpm']['v']):>7} "
+              f"{seconds * 1e3:>7.2f} {len(body):>9,} {len(full):>11,} {'yes' if peak else 'NO':>10}")
+
+
+if __name__ == "__main__":
+    main()
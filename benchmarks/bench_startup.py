@@ -0,0 +1,109 @@
+"""
+Cold-start time: process launch -> first 200 from /api/stats.
+
+    python benchmarks/bench_startup.py [--runs 5]
+
+Measures the headless daemon (python -m emotion_core.daemon) against the v9
+entry point with its GUI modules stubbed out. The daemon also reports
+time-to-first-classified-tick (first snapshot with seq >= 1).
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# v9 with rumps/AppKit stubbed, serving on the port given in argv.
+V9_LAUNCHER = """
+import sys
+sys.path[:0] = [{root!r}, {bench!r}]
+import stubs; stubs.install()
+import emotionMonitor_v9_final as v9
+v9.runtime.port = int(sys.argv[1])
+v9.runtime.run()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_stats(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        conn.request("GET", "/api/stats")
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+    finally:
+        conn.close()
+
+
+def launch(cmd, port, wait_tick=False, timeout=60.0):
+    """(seconds to first /api/stats, seconds to first tick or None)."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=tempfile.mkdtemp(prefix="emotion-start-"), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first = tick = None
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                status, body = get_stats(port)
+            except OSError:
+                time.sleep(0.005)
+                continue
+            if status == 200 and first is None:
+                first = time.perf_counter() - t0
+            if not wait_tick or json.loads(body).get("seq", 0) >= 1:
+                if wait_tick:
+                    tick = time.perf_counter() - t0
+                break
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return first, tick
+
+
+def report(name, values):
+    values = [v * 1e3 for v in values if v is not None]
+    if values:
+        print(f"{name:<36} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    else:
+        print(f"{name:<36} no response")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    daemon_first, daemon_tick, v9_first = [], [], []
+    v9 = V9_LAUNCHER.format(root=ROOT, bench=os.path.join(ROOT, "benchmarks"))
+    for _ in range(args.runs):
+        port = free_port()
+        cmd = [sys.executable, "-c", f"import sys; sys.path.insert(0, {ROOT!r}); "
+               "from emotion_core.daemon import main; main(sys.argv[1:])",
+               "--port", str(port), "--interval", "0.5"]
+        first, tick = launch(cmd, port, wait_tick=True)
+        daemon_first.append(first)
+        daemon_tick.append(tick)
+        port = free_port()
+        v9_first.append(launch([sys.executable, "-c", v9, str(port)], port)[0])
+
+    report("daemon: first /api/stats", daemon_first)
+    report("daemon: first classified tick", daemon_tick)
+    report("v9 (GUI stubbed): first /api/stats", v9_first)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+/api/stats load test: per-request jsonify under a lock vs pre-encoded snapshots.
+
+Drives a Flask app through its test client (no sockets, so the numbers
+are the handler cost) and the v6.2-style handler body build directly.
+The apps no longer use Flask, so install it just for this comparison:
+
+    pip install flask
+    python benchmarks/bench_stats.py
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask, jsonify  # noqa: E402
+
+from emotion_core.api import snapshot_response  # noqa: E402
+from emotion_core.snapshot import SnapshotPublisher  # noqa: E402
+
+DURATION = 2.0
+
+stats = {"emotion": "Focused", "confidence": 84, "kpm": 214, "mouse": 7939, "clicks": 49, "timestamp": "12:00:00"}
+colors = {"Focused": "#00ff66"}
+data_lock = threading.Lock()
+snapshots = SnapshotPublisher(stats | {"color": colors["Focused"]})
+snapshots.publish(stats | {"color": colors["Focused"]})
+
+app = Flask(__name__)
+
+
+@app.route("/old")
+def old():
+    with data_lock:
+        return jsonify(stats | {"color": colors.get(stats["emotion"], "#FFFFFF")})
+
+
+@app.route("/new")
+def new():
+    return snapshot_response(snapshots)
+
+
+def rate(fn):
+    n = 0
+    end = time.perf_counter() + DURATION
+    while time.perf_counter() < end:
+        for _ in range(100):
+            fn()
+        n += 100
+    return n / DURATION
+
+
+def main():
+    client = app.test_client()
+    etag = client.get("/new").headers["ETag"]
+    print(f"{'case':<40} {'req/s':>10}")
+    for name, fn in (
+        ("flask: lock + jsonify", lambda: client.get("/old")),
+        ("flask: snapshot", lambda: client.get("/new")),
+        ("flask: snapshot, If-None-Match -> 304", lambda: client.get("/new", headers={"If-None-Match": etag})),
+    ):
+        print(f"{name:<40} {rate(fn):>10,.0f}")
+
+    history = deque(({"emotion": "Normal", "time": "12:00:00"} for _ in range(15)), maxlen=15)
+    state = {"emotion": "Normal", "activity": "Calm", "focus_mode": False, "paused": False}
+    pub = SnapshotPublisher(state, history_len=15)
+    for e in history:
+        pub.publish(state, e)
+    seq = pub.current.seq
+    for name, fn in (
+        ("handler body: json.dumps(history copy)", lambda: json.dumps(state | {"history": list(history)}).encode("utf-8")),
+        ("handler body: snapshot", lambda: pub.render()),
+        ("handler body: snapshot ?since=seq-1", lambda: pub.render(since=str(seq - 1))),
+    ):
+        print(f"{name:<40} {rate(fn):>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Headless benchmark suite for the analyzer, API and logging hot paths.
+
+    python benchmarks/run.py                      # writes benchmarks/results/<stamp>.json
+    python benchmarks/run.py --compare OLD.json   # also diff against an earlier run
+
+The entry points are imported with rumps / AppKit / objc / WebKit stubbed
+out (see stubs.py) and run from a scratch directory, so nothing under the
+repo's logs/ is touched. --compare exits non-zero when any metric is worse
+than the old run by more than --threshold.
+"""
+import argparse
+import contextlib
+import datetime
+import http.client
+import importlib
+import io
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+import stubs  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+STREAM_CLIENTS = 300
+
+
+class Suite:
+    def __init__(self, quick=False):
+        self.quick = quick
+        self.results = {}
+
+    def record(self, name, value, unit, higher_is_better):
+        self.results[name] = {"value": round(float(value), 3), "unit": unit, "higher_is_better": higher_is_better}
+        print(f"  {name:<40} {value:>14,.3f} {unit}")
+
+    def rate(self, fn, duration=None):
+        """Calls per second of fn over a fixed wall-clock budget."""
+        duration = duration or (0.5 if self.quick else 2.0)
+        n = 0
+        end = time.perf_counter() + duration
+        start = time.perf_counter()
+        while time.perf_counter() < end:
+            for _ in range(20):
+                fn()
+            n += 20
+        return n / (time.perf_counter() - start)
+
+
+def load_entry_points():
+    stubs.install()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {name: importlib.import_module(mod) for name, mod in (
+            ("v9", "emotionMonitor_v9_final"),
+            ("v7", "emotion_menubar_dashboard_app_v7"),
+            ("v6_2", "emotion_menubar_dashboard_app_v6_2"),
+        )}
+
+
+# --- Benchmarks ---
+def bench_detect_emotion(s, apps):
+    from emotion_core.heuristic import detect_emotion_batch
+
+    rng = np.random.default_rng(0)
+    n = 20_000 if s.quick else 100_000
+    rows = [{"kpm": int(k), "mouse": int(m), "clicks": int(c)}
+            for k, m, c in zip(rng.integers(0, 400, n), rng.integers(0, 20000, n), rng.integers(0, 50, n))]
+    base = {"kpm": 180.0, "mouse": 9000.0, "clicks": 20.0}
+    detect = apps["v7"].detect_emotion
+    t0 = time.perf_counter()
+    for r in rows:
+        detect(r, base)
+    s.record("detect_emotion.scalar", n / (time.perf_counter() - t0), "rows/s", True)
+
+    n = 1_000_000
+    k, m, c = rng.integers(0, 400, n), rng.integers(0, 20000, n), rng.integers(0, 50, n)
+    t0 = time.perf_counter()
+    detect_emotion_batch(k, m, c)
+    s.record("detect_emotion.batch", n / (time.perf_counter() - t0), "rows/s", True)
+
+
+def bench_inference(s):
+    from emotion_core.inference import InferenceEngine
+
+    engine = InferenceEngine()
+    t0 = time.perf_counter()
+    mean, scale = engine.models[:2]
+    s.record("inference.cold_load", (time.perf_counter() - t0) * 1e3, "ms", False)
+    rng = np.random.default_rng(0)
+    row = rng.normal(mean, scale)
+    engine.predict_one(row)
+    n = 300 if s.quick else 2000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        engine.predict_one(row)
+    s.record("inference.predict_one", (time.perf_counter() - t0) / n * 1e6, "us", False)
+    for size in (1, 100, 10_000) if s.quick else (1, 100, 10_000, 100_000):
+        X = rng.normal(mean, scale, size=(size, len(mean)))
+        engine.predict_batch(X)
+        best = min(_timed(lambda: engine.predict_batch(X)) for _ in range(3))
+        s.record(f"inference.batch_{size}.latency", best * 1e3, "ms", False)
+        s.record(f"inference.batch_{size}.throughput", size / best, "rows/s", True)
+
+
+def bench_api(s, apps):
+    from emotion_core.runtime import Runtime
+    from emotion_core.stream import broadcaster
+
+    v9 = apps["v9"]
+    runtime = Runtime(v9.snapshots, port=0, pages={"/": v9.HTML_DASHBOARD})
+    runtime.start()
+    port = runtime.port
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+
+    def get(headers={}):
+        conn.request("GET", "/api/stats", headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        return resp
+
+    def get_new_connection():
+        c = http.client.HTTPConnection("127.0.0.1", port)
+        c.request("GET", "/api/stats")
+        c.getresponse().read()
+        c.close()
+
+    s.record("api_stats.keepalive", s.rate(get), "req/s", True)
+    etag = get().getheader("ETag")
+    s.record("api_stats.keepalive.304", s.rate(lambda: get({"If-None-Match": etag})), "req/s", True)
+    s.record("api_stats.new_connection", s.rate(get_new_connection), "req/s", True)
+
+    # Tail latency with no other clients vs. with hundreds of open streams
+    # receiving a frame every 50 ms.
+    n = 500 if s.quick else 2000
+    idle = _latencies(get, n)
+    streams = []
+    for _ in range(STREAM_CLIENTS):
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.sendall(b"GET /api/stream HTTP/1.1\r\nHost: bench\r\n\r\n")
+        streams.append(sock)
+    stop = threading.Event()
+
+    def publisher():
+        while not stop.wait(0.05):
+            broadcaster.publish(v9.snapshots.current.body)
+    threading.Thread(target=publisher, daemon=True).start()
+    time.sleep(0.5)
+    busy = _latencies(get, n)
+    stop.set()
+    for name, lat in (("idle", idle), (f"{STREAM_CLIENTS}_streams", busy)):
+        s.record(f"api_stats.p50_{name}", lat[len(lat) // 2] * 1e3, "ms", False)
+        s.record(f"api_stats.p99_{name}", lat[int(len(lat) * 0.99) - 1] * 1e3, "ms", False)
+    for sock in streams:
+        sock.close()
+    conn.close()
+    runtime.stop()
+
+
+def bench_logs(s):
+    from emotion_core.logwriter import LogWriter
+
+    line = "[12:00:00] Focused (84%) | KPM=214 | Mouse=7939 | Clicks=49\n"
+    tmp = tempfile.mkdtemp()
+    n = 50_000 if s.quick else 200_000
+    w = LogWriter(os.path.join(tmp, "bulk.txt"), max_queue=n, flush_records=4096)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        w.write(line)
+    enqueue = time.perf_counter() - t0
+    w.close(timeout=60)
+    s.record("logs.writer_throughput", w.written / (time.perf_counter() - t0), "records/s", True)
+    s.record("logs.write_call", enqueue / n * 1e9, "ns", False)
+
+    path = os.path.join(tmp, "sync.txt")
+    n = 2000 if s.quick else 10_000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with open(path, "a") as f:
+            f.write(line)
+    s.record("logs.open_append_close", n / (time.perf_counter() - t0), "records/s", True)
+
+
+def bench_tick(s, apps):
+    v9 = apps["v9"]
+    period = 0.02
+    ticks = 50 if s.quick else 250
+    durations, lateness = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        v9.analyzer_tick()          # warm: loads the models
+        deadline = time.monotonic()
+        for _ in range(ticks):
+            deadline += period
+            start = time.monotonic()
+            v9.analyzer_tick()
+            durations.append(time.monotonic() - start)
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            lateness.append(max(0.0, time.monotonic() - deadline))
+    durations.sort()
+    lateness.sort()
+    s.record("tick.duration_p50", durations[len(durations) // 2] * 1e3, "ms", False)
+    s.record("tick.duration_p99", durations[int(len(durations) * 0.99) - 1] * 1e3, "ms", False)
+    s.record("tick.jitter_p99", lateness[int(len(lateness) * 0.99) - 1] * 1e3, "ms", False)
+    s.record("tick.jitter_mean", statistics.mean(lateness) * 1e3, "ms", False)
+
+
+def bench_metrics(s):
+    from emotion_core.metrics import LOCK_WAIT, TimedLock
+
+    hist = LOCK_WAIT.labels(lock="bench")
+    n = 200_000 if s.quick else 1_000_000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        hist.observe(0.0012)
+    s.record("metrics.observe", (time.perf_counter() - t0) / n * 1e9, "ns", False)
+    lock, raw = TimedLock("bench"), threading.Lock()
+    n //= 10
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with raw:
+            pass
+    base = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with lock:
+            pass
+    s.record("metrics.timed_lock_overhead", (time.perf_counter() - t0 - base) / n * 1e9, "ns", False)
+
+
+def bench_notify(s):
+    from emotion_core.notify import Notifier, Recorder
+
+    n = 20_000 if s.quick else 100_000
+    notifier = Notifier(Recorder(), name="bench")
+    notifier.notify("Emotion Monitor", "Take a short break.", key="break", cooldown=3600)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        notifier.notify("Emotion Monitor", "Take a short break.", key="break", cooldown=3600)
+    s.record("notify.coalesced_call", (time.perf_counter() - t0) / n * 1e9, "ns", False)
+    notifier.close()
+
+    # A backend that never returns: callers must still get straight back.
+    hang = threading.Event()
+    stuck = Notifier(lambda *a: hang.wait(), name="bench-hung")
+    lat = _latencies(lambda: stuck.notify("Emotion Monitor", str(time.perf_counter())), 2000)
+    s.record("notify.hung_backend_p99", lat[int(len(lat) * 0.99) - 1] * 1e6, "us", False)
+    hang.set()
+    stuck.close()
+
+
+# --- Helpers ---
+def _timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _latencies(fn, n):
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return sorted(out)
+
+
+def _meta():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def compare(new, old, threshold):
+    """Print per-metric change; return the names that regressed past threshold."""
+    regressed = []
+    print(f"\n{'metric':<40} {'old':>14} {'new':>14} {'change':>8}")
+    for name, r in new["results"].items():
+        o = old.get("results", {}).get(name)
+        if not o or not o["value"]:
+            continue
+        change = (r["value"] - o["value"]) / o["value"]
+        worse = -change if r["higher_is_better"] else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<40} {o['value']:>14,.3f} {r['value']:>14,.3f} {change:>+8.1%}{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="shorter runs, for smoke checks")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<stamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    out = args.out or os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    out = os.path.abspath(out)
+    os.chdir(tempfile.mkdtemp(prefix="emotion-bench-"))
+
+    s = Suite(quick=args.quick)
+    apps = load_entry_points()
+    for title, fn in (
+        ("detect_emotion", lambda: bench_detect_emotion(s, apps)),
+        ("inference", lambda: bench_inference(s)),
+        ("api", lambda: bench_api(s, apps)),
+        ("logs", lambda: bench_logs(s)),
+        ("analyzer tick", lambda: bench_tick(s, apps)),
+        ("metrics", lambda: bench_metrics(s)),
+        ("notify", lambda: bench_notify(s)),
+    ):
+        print(f"[{title}]")
+        fn()
+
+    report = {"meta": _meta(), "results": s.results}
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if compare(report, old, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
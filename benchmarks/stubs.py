@@ -0,0 +1,46 @@
+"""
+Headless stand-ins for the macOS-only modules the entry points import
+(rumps, AppKit, objc, WebKit), so the entry points can be imported and
+driven on Linux. Every attribute resolves to something callable or
+subclassable, and nothing here does any work.
+"""
+import sys
+import types
+
+
+class _Meta(type):
+    def __getattr__(cls, name):
+        return _Anything()
+
+
+class _Anything(metaclass=_Meta):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return _Anything()
+
+    def __getattr__(self, name):
+        return _Anything()
+
+
+class _StubModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        cls = _Meta(name, (_Anything,), {})
+        setattr(self, name, cls)
+        return cls
+
+
+def install():
+    """Register the stubs in sys.modules (only for modules that aren't importable)."""
+    for name in ("rumps", "AppKit", "objc", "WebKit"):
+        try:
+            __import__(name)
+        except ImportError:
+            sys.modules[name] = _StubModule(name)
+    rumps = sys.modules["rumps"]
+    if isinstance(rumps, _StubModule):
+        rumps.clicked = lambda *a, **k: (lambda f: f)
+        rumps.notification = lambda *a, **k: None
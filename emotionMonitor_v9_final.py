@@ -1,14 +1,44 @@
-import os, time, threading, random, datetime, webbrowser, rumps
-from flask import Flask, jsonify, render_template_string
+import os, random, datetime, webbrowser, rumps
+from functools import partial
 from AppKit import NSApplication, NSApp, NSApplicationActivationPolicyAccessory
+from emotion_core.agent import BATCH_INTERVAL, Agent
+from emotion_core.capture import InputCapture
+from emotion_core.classifiers import SAVE_INTERVAL as SHADOW_SAVE_INTERVAL, SHADOW_FILE, ShadowHarness
+from emotion_core.history import SAVE_INTERVAL as HISTORY_SAVE_INTERVAL, HistoryStore
+from emotion_core.logwriter import LogWriter
+from emotion_core.metrics import TICK, TimedLock
+from emotion_core.notify import Notifier
+from emotion_core.rollup import ROLLUP_FILE, SAVE_INTERVAL, Rollups
+from emotion_core.runtime import Runtime
+from emotion_core.scheduler import ACTIVE, IDLE, Adaptive
+from emotion_core.schema import ACTIVITY_CODES, EMOTION_CODES, UNKNOWN
+from emotion_core.snapshot import SnapshotPublisher
+from emotion_core.stream import broadcaster
 
 # --- Setup ---
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, "session_log.txt")
+ACTIVITY_FILE = os.path.join(LOG_DIR, "activity_log.csv")
+session_log = LogWriter(LOG_FILE)
+activity_log = LogWriter(ACTIVITY_FILE, header="timestamp,kpm,mouse_px,clicks,emotion,activity\n")
+# Per-day / per-week totals behind /api/summary, updated every tick.
+ROLLUP_PATH = os.path.join(LOG_DIR, ROLLUP_FILE)
+rollups = Rollups.load(ROLLUP_PATH)
+# Raw ticks plus 1m / 1h / 1d tiers behind /api/series (the long-range chart).
+HISTORY_PATH = os.path.join(LOG_DIR, "history.bin")
+history = HistoryStore.load(HISTORY_PATH)
+# The heuristic decides; the other engines score the same ticks in the background (/api/classifiers).
+# Switch to "xgboost" after retraining: the shipped models predate schema.FEATURE_NAMES.
+PRIMARY_CLASSIFIER = "heuristic"
+SHADOW_CLASSIFIERS = ("xgboost", "random")
+SHADOW_PATH = os.path.join(LOG_DIR, SHADOW_FILE)
+classifier = ShadowHarness.from_names(PRIMARY_CLASSIFIER, SHADOW_CLASSIFIERS).load(SHADOW_PATH)
+# Team collector (python -m emotion_core.collector), e.g. "http://team-host:9090"; None = stay local.
+COLLECTOR_URL = None
+agent = Agent(COLLECTOR_URL) if COLLECTOR_URL else None
 
-flask_app = Flask(__name__)
-data_lock = threading.Lock()
+data_lock = TimedLock("data_lock")
 
 # --- Global state ---
 stats = {
@@ -27,6 +57,9 @@ emotion_colors = {
     "Stressed": "#FF4040"
 }
 
+# Pre-encoded /api/stats body, swapped in by the analyzer each tick.
+snapshots = SnapshotPublisher(stats | {"color": emotion_colors.get(stats["emotion"], "#FFFFFF")})
+
 # --- Dashboard HTML ---
 HTML_DASHBOARD = """<!DOCTYPE html><html><head>
 <title>🧠 Emotion + Activity Monitor</title>
@@ -37,9 +70,12 @@ canvas{width:90%%!important;height:70vh!important;margin:auto;border-radius:12px
 .legend{display:flex;justify-content:center;gap:15px;margin-top:10px;}
 .legend div{display:flex;align-items:center;gap:6px;font-size:14px;}
 .color-box{width:16px;height:16px;border-radius:3px;}
+.ranges button{background:#1b1b1f;color:#aaa;border:1px solid #333;border-radius:6px;padding:4px 12px;margin:8px 2px;cursor:pointer;}
+.ranges button.on{color:#fff;border-color:#FFD700;}
 </style></head><body>
 <h2>🧠 Emotion + Activity Monitor</h2>
 <div id="stats">Loading...</div>
+<div class="ranges"><button class="on" data-r="0">Live</button><button data-r="86400">24 h</button><button data-r="604800">7 days</button><button data-r="2592000">30 days</button></div>
 <canvas id="chart"></canvas>
 <div class="legend">
 <div><span class="color-box" style="background:#00ff66"></span>Focused</div>
@@ -48,73 +84,140 @@ canvas{width:90%%!important;height:70vh!important;margin:auto;border-radius:12px
 <div><span class="color-box" style="background:#FF4040"></span>Stressed</div>
 </div>
 <script>
+const COLORS={Focused:'#00ff66',Normal:'#FFD700',Tired:'#0096FF',Stressed:'#FF4040'};
 const ctx=document.getElementById('chart').getContext('2d');
-const data={labels:[],datasets:[{label:'Keystrokes/min',data:[],borderColor:'#FFD700',backgroundColor:'rgba(255,215,0,0.25)',fill:true,tension:.3}]};
-const chart=new Chart(ctx,{type:'line',data:data,options:{animation:{duration:800},scales:{x:{ticks:{color:'#aaa'}},y:{ticks:{color:'#aaa'}}}}});
-async function fetchData(){
-try{
-const r=await fetch('/api/stats');const d=await r.json();
+// Live points stay in these arrays; a range view swaps other arrays into the same chart.
+const live={kpm:[],mouse:[]};
+let range=0;
+const label=v=>{const d=new Date(v*1000);return range>86400?d.toLocaleDateString([],{month:'short',day:'numeric'}):d.toLocaleTimeString();};
+const chart=new Chart(ctx,{type:'line',data:{datasets:[
+{label:'Keystrokes/min',data:live.kpm,borderColor:'#FFD700',backgroundColor:'rgba(255,215,0,0.25)',fill:true,tension:.3,yAxisID:'y'},
+{label:'Mouse px',data:live.mouse,borderColor:'#666',pointRadius:0,borderWidth:1,tension:.3,yAxisID:'y1'}]},
+options:{parsing:false,animation:{duration:800},plugins:{legend:{display:false}},scales:{
+x:{type:'linear',ticks:{color:'#aaa',maxTicksLimit:8,callback:label}},
+y:{ticks:{color:'#aaa'}},y1:{position:'right',grid:{display:false},ticks:{color:'#666'}}}}});
+function render(d){
 document.getElementById('stats').innerHTML=`Emotion:<b style="color:${d.color}">${d.emotion}</b> (${d.confidence}%) | KPM:${d.kpm} | Mouse:${d.mouse} | Clicks:${d.clicks}`;
-if(data.labels.length>40){data.labels.shift();data.datasets[0].data.shift();}
-data.labels.push(d.timestamp);data.datasets[0].data.push(d.kpm);
-data.datasets[0].borderColor=d.color;data.datasets[0].backgroundColor=d.color+'40';
+const t=Date.now()/1000;
+if(live.kpm.length>40){live.kpm.shift();live.mouse.shift();}
+live.kpm.push({x:t,y:d.kpm});live.mouse.push({x:t,y:d.mouse});
+if(range)return;
+const k=chart.data.datasets[0];
+k.borderColor=d.color;k.backgroundColor=d.color+'40';
 chart.update();
-}catch(e){document.getElementById('stats').innerText='⚠️ Waiting for live data...';}}
-setInterval(fetchData,10000);fetchData();
+}
+async function showRange(r){
+range=r;
+document.querySelectorAll('.ranges button').forEach(b=>b.classList.toggle('on',+b.dataset.r===r));
+const [k,m]=chart.data.datasets;
+if(!r){k.data=live.kpm;m.data=live.mouse;k.pointRadius=3;k.pointBackgroundColor=undefined;chart.update('none');return;}
+const points=Math.min(1000,ctx.canvas.width|0);
+const res=await fetch(`/api/series?from=${Date.now()/1000-r}&points=${points}&fields=kpm,mouse,emotion`);
+const s=await res.json();
+if(range!==r||!res.ok)return;
+k.data=s.kpm.t.map((t,i)=>({x:t,y:s.kpm.v[i]}));
+m.data=s.mouse.t.map((t,i)=>({x:t,y:s.mouse.v[i]}));
+// Colour each kpm point by the emotion bucket it falls in.
+const et=s.emotion.t,ev=s.emotion.v,names=s.labels.emotion;let j=0;
+k.pointBackgroundColor=s.kpm.t.map(t=>{while(j+1<et.length&&et[j+1]<=t)j++;return COLORS[names[ev[j]]]||'#888';});
+k.pointRadius=1.5;
+chart.update('none');
+}
+document.querySelectorAll('.ranges button').forEach(b=>b.onclick=()=>showRange(+b.dataset.r));
+setInterval(()=>{if(range)showRange(range);},60000);
+const es=new EventSource('/api/stream');
+es.addEventListener('stats',e=>render(JSON.parse(e.data)));
+es.onerror=()=>{document.getElementById('stats').innerText='⚠️ Waiting for live data...';};
 </script></body></html>"""
 
-@flask_app.route("/")
-def dashboard():
-    return render_template_string(HTML_DASHBOARD)
+# --- HTTP runtime: dashboard, /api/stats, /api/stream, /api/history, /api/summary, /api/series,
+#     /api/classifiers, /metrics ---
+runtime = Runtime(snapshots, port=8080, log_dir=LOG_DIR, pages={"/": HTML_DASHBOARD},
+                  rollups=rollups, history=history, classifiers=classifier)
+runtime.every(SAVE_INTERVAL, partial(rollups.save_if_dirty, ROLLUP_PATH), name="rollups")
+runtime.every(HISTORY_SAVE_INTERVAL, partial(history.save_if_dirty, HISTORY_PATH), name="history")
+runtime.every(SHADOW_SAVE_INTERVAL, partial(classifier.save_if_dirty, SHADOW_PATH), name="classifiers")
+if agent is not None:
+    runtime.every(BATCH_INTERVAL, agent.flush, name="collector")
 
-@flask_app.route("/api/stats")
-def api_stats():
-    with data_lock:
-        return jsonify(stats | {"color": emotion_colors.get(stats["emotion"], "#FFFFFF")})
+# --- Input sampling ---
+capture = InputCapture()
 
-# --- Simulated behavior ---
-def simulate():
-    emotions = ["Focused", "Normal", "Tired", "Stressed"]
-    e = random.choices(emotions, weights=[0.3, 0.4, 0.2, 0.1])[0]
-    return e, random.randint(60, 100), random.randint(50, 300), random.randint(2000, 20000), random.randint(10, 50)
+def sample():
+    w, x = capture.sample()
+    k, m, cl = w["kpm"], w["mouse"], w["clicks"]
+    e, c, a = classifier.classify(w, x)
+    return e, c, k, m, cl, a
 
 # --- Analyzer Loop ---
-def analyzer_loop():
-    last_notified = 0
-    while True:
-        e, c, k, m, cl = simulate()
-        ts = datetime.datetime.now().strftime("%H:%M:%S")
-        with data_lock:
-            stats.update({"emotion": e, "confidence": c, "kpm": k, "mouse": m, "clicks": cl, "timestamp": ts})
-
-        log = f"[{ts}] {e} ({c}%) | KPM={k} | Mouse={m} | Clicks={cl}\n"
-        with open(LOG_FILE, "a") as f:
-            f.write(log)
-        print(log.strip())
-
-        # Notify only if Tired or Stressed every 7–8 min
-        now = time.time()
-        if e in ["Tired", "Stressed"] and now - last_notified >= random.randint(420, 480):
-            try:
-                msg_map = {
-                    "Tired": ("Emotion Monitor", "😴 Feeling Tired?", "Take a short break to recharge."),
-                    "Stressed": ("Emotion Monitor", "⚡ Feeling Stressed?", "Breathe deeply and relax for a moment.")
-                }
-                title, subtitle, message = msg_map[e]
-                rumps.notification(title, subtitle, message)
-                last_notified = now
-            except Exception as err:
-                print(f"[WARN] Notification failed: {err}")
-
-        time.sleep(15)
+def analyzer_tick():
+    """Sample, classify, publish and log one window; returns the emotion."""
+    e, c, k, m, cl, a = sample()
+    now_dt = datetime.datetime.now()
+    ts = now_dt.strftime("%H:%M:%S")
+    with data_lock:
+        stats.update({"emotion": e, "confidence": c, "kpm": k, "mouse": m, "clicks": cl, "timestamp": ts})
+        event = stats | {"color": emotion_colors.get(e, "#FFFFFF")}
+    broadcaster.publish(snapshots.publish(event).body)
+
+    log = f"[{ts}] {e} ({c}%) | KPM={k} | Mouse={m} | Clicks={cl}\n"
+    session_log.write(log)
+    activity_log.write(f"{now_dt.isoformat()},{k},{m},{cl},{e},{a}\n")
+    codes = EMOTION_CODES.get(e, UNKNOWN), ACTIVITY_CODES.get(a, UNKNOWN)
+    history.append(now_dt.timestamp(), k, m, cl, codes[0], c, codes[1])
+    rollups.add(now_dt.timestamp(), k, m, cl, codes[0], c, codes[1])
+    if agent is not None:
+        agent.add(now_dt.timestamp(), k, m, cl, codes[0], c, codes[1])
+    print(log.strip())
+    return e
+
+# Alerts go through a queue to their own thread; the tick never waits on them.
+notifier = Notifier(rumps.notification)
+
+last_emotion = None
+was_busy = False
+paused = False
+
+def analyze():
+    """
+    Runtime job: one tick, plus a queued notification when due.
+    Returns the scheduler hint: ACTIVE when the emotion changed or input just
+    started, IDLE with no input or while paused, so the interval stretches.
+    """
+    global last_emotion, was_busy
+    if paused:
+        return IDLE
+    with TICK.time():
+        e = analyzer_tick()
+    runtime.wake("menubar")
+    with data_lock:
+        busy = bool(stats["kpm"] or stats["mouse"] or stats["clicks"])
+    if e != last_emotion or (busy and not was_busy):
+        hint = ACTIVE
+    else:
+        hint = None if busy else IDLE
+    last_emotion, was_busy = e, busy
+
+    # Notify only if Tired or Stressed every 7–8 min (one shared "break" cooldown)
+    if e in ["Tired", "Stressed"]:
+        msg_map = {
+            "Tired": ("Emotion Monitor", "😴 Feeling Tired?", "Take a short break to recharge."),
+            "Stressed": ("Emotion Monitor", "⚡ Feeling Stressed?", "Breathe deeply and relax for a moment.")
+        }
+        title, subtitle, message = msg_map[e]
+        notifier.notify(title, message, subtitle, key="break", cooldown=random.randint(420, 480))
+    return hint
+
+# 15 s normally, 5 s right after a change, backing off to 2 min when idle.
+runtime.every(Adaptive(15, fast=5, slow=120), analyze, name="analyzer")
 
 # --- Menu Bar UI ---
 class MenuBar(rumps.App):
     def __init__(self):
         super(MenuBar, self).__init__("🧠 Initializing")
         self.menu = ["Open Dashboard", None, "Pause Monitoring", "View Logs", None, "Quit"]
-        self.paused = False
-        threading.Thread(target=self.update_state, daemon=True).start()
+        # Woken by each analyzer tick; otherwise polls, backing off to 1 min.
+        runtime.every(Adaptive(5, slow=60), self.refresh_title, blocking=False, name="menubar")
 
     @rumps.clicked("Open Dashboard")
     def open_dash(self, _):
@@ -122,10 +225,13 @@ class MenuBar(rumps.App):
 
     @rumps.clicked("Pause Monitoring")
     def toggle_pause(self, sender):
-        self.paused = not self.paused
-        sender.title = "Resume Monitoring" if self.paused else "Pause Monitoring"
-        status = "Paused monitoring." if self.paused else "Resumed monitoring."
-        rumps.notification("Emotion Monitor", "Status Update", status)
+        global paused
+        paused = not paused
+        runtime.wake("analyzer")
+        runtime.wake("menubar")
+        sender.title = "Resume Monitoring" if paused else "Pause Monitoring"
+        status = "Paused monitoring." if paused else "Resumed monitoring."
+        notifier.notify("Emotion Monitor", status, "Status Update")
         print(f"[INFO] {status}")
 
     @rumps.clicked("View Logs")
@@ -135,18 +241,29 @@ class MenuBar(rumps.App):
     @rumps.clicked("Quit")
     def quit_app(self, _):
         print("[INFO] Exiting Emotion Monitor.")
+        runtime.stop()
+        notifier.close()
+        session_log.close()
+        activity_log.close()
+        rollups.save_if_dirty(ROLLUP_PATH)
+        history.save_if_dirty(HISTORY_PATH)
+        classifier.close()
+        classifier.save_if_dirty(SHADOW_PATH)
+        if agent is not None:
+            agent.flush()
+            agent.close()
         rumps.quit_application()
 
-    def update_state(self):
-        while True:
-            if not self.paused:
-                with data_lock:
-                    e = stats["emotion"]
-                    c = stats["confidence"]
-                    self.title = f"🧠 {e} ({c}%)"
-            else:
-                self.title = "⏸️ Paused"
-            time.sleep(5)
+    def refresh_title(self):
+        """Runtime job (on the loop): returns IDLE when the title didn't change."""
+        if paused:
+            title = "⏸️ Paused"
+        else:
+            with data_lock:
+                title = f"🧠 {stats['emotion']} ({stats['confidence']}%)"
+        if title == self.title:
+            return IDLE
+        self.title = title
 
 # --- Launch ---
 if __name__ == "__main__":
@@ -156,8 +273,8 @@ if __name__ == "__main__":
     NSApp = app_inst
     app_inst.setActivationPolicy_(NSApplicationActivationPolicyAccessory)
 
-    threading.Thread(target=lambda: flask_app.run(port=8080, debug=False, use_reloader=False), daemon=True).start()
-    threading.Thread(target=analyzer_loop, daemon=True).start()
+    capture.start()
+    runtime.start()
 
     MenuBar().run()
 
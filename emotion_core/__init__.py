@@ -0,0 +1,4 @@
+"""
+Emotion Monitor core
+Shared, GUI-free building blocks used by the menubar entry points.
+"""
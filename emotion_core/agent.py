@@ -0,0 +1,170 @@
+"""
+Agent side of collector mode: ship this monitor's ticks to a team collector.
+
+    agent = Agent("http://team-host:9090", interval=15)
+    runtime.every(BATCH_INTERVAL, agent.flush, name="collector")
+    agent.add(t, kpm, mouse, clicks, emotion_code, confidence, activity_code)   # every tick
+
+Ticks wait in a bounded local queue. flush() sends them as gzip'ed JSON
+batches of up to BATCH_TICKS over a small pool of keep-alive connections.
+While the collector is down the queue keeps filling, so nothing is lost
+until it holds MAX_QUEUE ticks (about two weeks at a 15 s tick; the
+oldest go first). flush() then backs off, doubling up to MAX_BACKOFF. A
+failed batch is resent unchanged with the same (session, seq), and the
+collector drops any it has already applied, so a retry never counts
+twice.
+"""
+import gzip
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+INGEST_PATH = "/api/ingest"
+FIELDS = ("t", "kpm", "mouse", "clicks", "emotion", "confidence", "activity")
+BATCH_INTERVAL = 5.0
+BATCH_TICKS = 500
+MAX_QUEUE = 100_000
+MAX_BACKOFF = 60.0
+TIMEOUT = 5.0
+
+
+def encode(agent, session, seq, ticks, interval=None, utc_offset=None):
+    """Gzip'ed batch body; `ticks` are tuples in FIELDS order."""
+    batch = {"agent": agent, "session": session, "seq": seq, "fields": FIELDS, "ticks": ticks}
+    if interval is not None:
+        batch["interval"] = interval
+    if utc_offset is not None:
+        batch["utc_offset"] = utc_offset
+    return gzip.compress(json.dumps(batch, separators=(",", ":")).encode(), compresslevel=6)
+
+
+class Pool:
+    """Keep-alive HTTP connections to one host, shared by threads."""
+
+    def __init__(self, host, port, size=2, timeout=TIMEOUT):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def post(self, path, body, headers):
+        """(status, response body). A reused connection the server already closed is retried once."""
+        for attempt in (0, 1):
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            reused = conn is not None
+            if conn is None:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request("POST", path, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused and not attempt:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                with self._lock:
+                    if len(self._idle) < self.size:
+                        self._idle.append(conn)
+                        conn = None
+                if conn is not None:
+                    conn.close()
+            return resp.status, data
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class Agent:
+    def __init__(self, url, agent_id=None, interval=None, batch=BATCH_TICKS, max_queue=MAX_QUEUE,
+                 timeout=TIMEOUT):
+        """`url` is the collector's base URL; `interval` is this monitor's tick in seconds."""
+        parts = urlsplit(url if "//" in url else f"http://{url}")
+        if parts.scheme not in ("", "http"):
+            raise ValueError(f"collector URL must be http://, got {url!r}")
+        self.url = url
+        self.path = parts.path.rstrip("/") + INGEST_PATH
+        self.agent_id = agent_id or socket.gethostname()
+        self.session = os.urandom(6).hex()       # seq restarts at 1 with every process
+        self.interval = interval
+        self.batch = batch
+        self.queue = deque(maxlen=max_queue)
+        self.pool = Pool(parts.hostname or "127.0.0.1", parts.port or 80, timeout=timeout)
+        self.seq = 0
+        self.inflight = None                     # (seq, body, ticks) until the collector acks it
+        self.sent = 0
+        self.dropped = 0
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self._headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+    def add(self, t, kpm, mouse, clicks, emotion, confidence, activity):
+        """Queue one tick (schema codes for emotion/activity); never blocks on the network."""
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append((round(t, 3), kpm, mouse, clicks, emotion, confidence, activity))
+
+    def flush(self):
+        """Send everything queued, batch by batch; returns the ticks delivered. A periodic job body."""
+        if time.monotonic() < self.retry_at:
+            return 0
+        delivered = 0
+        while True:
+            if self.inflight is None:
+                if not self.queue:
+                    break
+                ticks = [self.queue.popleft() for _ in range(min(self.batch, len(self.queue)))]
+                self.seq += 1
+                body = encode(self.agent_id, self.session, self.seq, ticks, self.interval,
+                              time.localtime().tm_gmtoff)
+                self.inflight = (self.seq, body, len(ticks))
+            seq, body, n = self.inflight
+            try:
+                status, data = self.pool.post(self.path, body, self._headers)
+            except (OSError, http.client.HTTPException) as err:
+                self._failed(err)
+                break
+            if status >= 500 or status == 429:
+                self._failed(f"HTTP {status}")
+                break
+            if self.backoff:
+                print(f"[INFO] Collector {self.url} reachable again.")
+                self.backoff = 0.0
+            if status >= 400:
+                # The collector will never take this batch; retrying would block the queue.
+                print(f"[WARN] Collector rejected batch {seq} ({n} ticks): HTTP {status} {data[:200]!r}")
+            else:
+                delivered += n
+            self.inflight = None
+        self.sent += delivered
+        return delivered
+
+    def _failed(self, err):
+        if not self.backoff:
+            print(f"[WARN] Collector {self.url} unavailable ({err}); queueing ticks locally.")
+        self.backoff = min(MAX_BACKOFF, max(1.0, 2 * self.backoff))
+        self.retry_at = time.monotonic() + self.backoff
+
+    @property
+    def pending(self):
+        return len(self.queue) + (self.inflight[2] if self.inflight else 0)
+
+    def close(self):
+        self.pool.close()
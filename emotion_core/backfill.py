@@ -0,0 +1,367 @@
+"""
+Re-label old activity logs with the current model.
+
+    python -m emotion_core.backfill [--log-dir logs] [--jobs 4] [--include-live]
+
+After the classifier changes, the emotion/activity columns of past
+activity_log.csv rows are stale. The rotated segments (and, with
+--include-live, the live file; stop the monitor first) are cut into chunks
+of about --chunk-bytes on line boundaries; a .gz segment is one chunk.
+Chunks run on a process pool: each one is parsed, turned into features by
+training.FeatureBuilder and scored with InferenceEngine.predict_batch.
+The builder is first warmed up on the rows just before the chunk (back to
+KPM_WINDOW and the last row with input, at most one segment back), so the
+labels do not depend on where the cuts fall. Timestamps and counts are
+copied byte for byte; only the two label columns are rewritten.
+
+Work goes to <log-dir>/.backfill/<version>/, where the version is a hash of
+the model files:
+
+    plan.json               segments, their chunks and which are swapped in
+    parts/<segment>.<k>     a finished chunk of a multi-chunk segment
+    new/<segment>           the re-labelled segment, gzip'ed like the original
+    old/<segment>           hard link to the replaced original
+
+Every output is written under a temp name and renamed, so a finished file
+is the checkpoint: running the command again skips finished chunks and
+segments. A segment whose size or mtime changed since it was planned is
+planned again. When every chunk is done, each segment is swapped in with
+os.replace, so readers see either the old or the new file, never a mix.
+Delete .backfill/<version> once the result looks right; moving old/ back
+undoes it.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from emotion_core.features import KPM_WINDOW
+from emotion_core.logquery import ActivityFormat
+from emotion_core.logwriter import segment_paths
+from emotion_core.schema import ACTIVITIES, EMOTIONS
+from emotion_core.training import FeatureBuilder
+
+LOG_NAME = "activity_log.csv"
+WORK_DIR = ".backfill"
+CHUNK_BYTES = 4 * 1024 * 1024
+CONTEXT_BYTES = 64 * 1024        # first look-back for the warm-up rows; grows x4 as needed
+MODEL_FILES = ("models.npz", "scaler.pkl", "emotion_xgb.json", "activity_xgb.json",
+               "emotion_xgb.pkl", "activity_xgb.pkl")
+
+
+def model_version(model_dir):
+    """Short hash of the files InferenceEngine would load from model_dir."""
+    from emotion_core.inference import COMPILED_FILE
+
+    names = [COMPILED_FILE] if os.path.exists(os.path.join(model_dir, COMPILED_FILE)) else MODEL_FILES[1:]
+    h = hashlib.sha1()
+    for name in names:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            h.update(name.encode())
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+    return h.hexdigest()[:12]
+
+
+# --- Reading ---
+_gz = OrderedDict()     # per process: the last few decompressed segments
+
+
+def _data(path):
+    data = _gz.get(path)
+    if data is None:
+        with gzip.open(path, "rb") as f:
+            data = _gz[path] = f.read()
+        while len(_gz) > 2:
+            _gz.popitem(last=False)
+    return data
+
+
+def _size(path):
+    return len(_data(path)) if path.endswith(".gz") else os.path.getsize(path)
+
+
+def _read_range(path, start, end):
+    if path.endswith(".gz"):
+        return _data(path)[start:end]
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _parse(data):
+    """Lines of `data`, plus the index, time, counts and labels of each data row."""
+    fmt = ActivityFormat(None)
+    lines = data.splitlines(keepends=True)
+    rows, ts, counts, labels = [], [], [], []
+    for i, line in enumerate(lines):
+        t = fmt.timestamp(line)
+        row = fmt.row(line, t) if t is not None else None
+        if row is None or None in row[1:4]:
+            continue        # header, torn or hand-edited line: copied as is
+        rows.append(i)
+        ts.append(t)
+        counts.append(row[1:4])
+        labels.append(row[4:6])
+    return lines, rows, np.array(ts, dtype=np.float64), np.array(counts, dtype=np.float64).reshape(-1, 3), labels
+
+
+def _warmup(segments, index, start, first_ts, window=KPM_WINDOW):
+    """Rows before byte `start` of segments[index] that the rolling features depend on."""
+    older_ts, older_counts = [], []
+    end, size, hops = start, CONTEXT_BYTES, 0
+    while True:
+        lo = max(0, end - size)
+        data = _read_range(segments[index], lo, end)
+        if lo:
+            data = data[data.find(b"\n") + 1:]      # the first line may be cut
+        _, _, ts, counts, _ = _parse(data)
+        all_ts = np.concatenate([ts] + older_ts)
+        all_counts = np.concatenate([counts] + older_counts)
+        if len(all_ts) and all_ts[0] <= first_ts - window and all_counts.any():
+            return all_ts, all_counts
+        if lo:
+            size *= 4
+        elif hops or index == 0:
+            return all_ts, all_counts
+        else:
+            older_ts, older_counts = [ts], [counts]
+            index, hops = index - 1, 1
+            end, size = _size(segments[index]), CONTEXT_BYTES
+
+
+def _write(path, chunks, compress):
+    tmp = path + ".tmp"
+    with (gzip.open(tmp, "wb") if compress else open(tmp, "wb")) as f:
+        f.write(b"".join(chunks))
+    os.replace(tmp, path)
+
+
+# --- Worker ---
+_ENGINE = None
+
+
+def _init_worker(model_dir):
+    global _ENGINE
+    from emotion_core.inference import InferenceEngine
+
+    _ENGINE = InferenceEngine(model_dir)
+    _ENGINE.models
+
+
+def _relabel(segments, index, start, end, out):
+    """Worker: re-label one chunk and write it to `out`; returns its counts."""
+    t0 = time.perf_counter()
+    path = segments[index]
+    if end is None:
+        end = _size(path)
+    lines, rows, ts, counts, labels = _parse(_read_range(path, start, end))
+    changed = 0
+    if rows:
+        builder = FeatureBuilder()
+        warm_ts, warm_counts = _warmup(segments, index, start, ts[0])
+        if len(warm_ts):
+            builder.build(warm_ts, warm_counts)
+        result = _ENGINE.predict_batch(builder.build(ts, counts))
+        for i, e, a, (old_e, old_a) in zip(rows, result.emotion, result.activity, labels):
+            emotion, activity = EMOTIONS[e], ACTIVITIES[a]
+            changed += old_e != emotion or old_a != activity
+            line = lines[i]
+            body = line.rstrip(b"\r\n")
+            parts = body.split(b",")
+            parts[4], parts[5] = emotion.encode(), activity.encode()
+            lines[i] = b",".join(parts) + line[len(body):]
+    _write(out, lines, compress=out.endswith(".gz"))
+    return {"out": out, "lines": len(lines), "rows": len(rows), "changed": changed,
+            "seconds": time.perf_counter() - t0}
+
+
+# --- Planning ---
+def _stat(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _chunk_bounds(path, chunk_bytes):
+    """[start, end) byte ranges cut after a newline; a .gz segment is one range."""
+    if path.endswith(".gz"):
+        return [[0, None]]
+    size = os.path.getsize(path)
+    bounds, start = [], 0
+    with open(path, "rb") as f:
+        while start < size:
+            f.seek(min(size, start + chunk_bytes))
+            f.readline()
+            end = min(size, f.tell())
+            bounds.append([start, end])
+            start = end
+    return bounds
+
+
+def plan(log_dir, work, include_live, chunk_bytes):
+    """Segments to re-label, reusing entries of an earlier plan that still apply."""
+    old = {}
+    if os.path.exists(os.path.join(work, "plan.json")):
+        with open(os.path.join(work, "plan.json")) as f:
+            old = {s["name"]: s for s in json.load(f)["segments"]}
+    live = os.path.join(log_dir, LOG_NAME)
+    segments = []
+    for path in segment_paths(live):
+        if path == live and not include_live:
+            continue
+        name, stat = os.path.basename(path), _stat(path)
+        prev = old.get(name)
+        if prev and stat == prev["stat"]:
+            segments.append(prev)
+            continue
+        _discard(work, name, prev)
+        segments.append({"name": name, "stat": stat, "chunks": _chunk_bounds(path, chunk_bytes), "swapped": False})
+    current = {s["name"] for s in segments}
+    for name, prev in old.items():
+        if name not in current:         # rotated away or deleted since the last run
+            _discard(work, name, prev)
+    return segments
+
+
+def _discard(work, name, segment):
+    """Drop unswapped output for a segment that has to be planned again."""
+    stale = [os.path.join(work, "new", name)]
+    stale += [os.path.join(work, "parts", f"{name}.{k}") for k in range(len(segment["chunks"]) if segment else 0)]
+    for path in stale:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _save_plan(work, version, segments):
+    tmp = os.path.join(work, "plan.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"version": version, "segments": segments}, f, indent=1)
+    os.replace(tmp, os.path.join(work, "plan.json"))
+
+
+def _assemble(work, segment):
+    """Concatenate a segment's parts into new/<segment>."""
+    name = segment["name"]
+    parts = [os.path.join(work, "parts", f"{name}.{k}") for k in range(len(segment["chunks"]))]
+    tmp = os.path.join(work, "new", name + ".tmp")
+    with (gzip.open(tmp, "wb") if name.endswith(".gz") else open(tmp, "wb")) as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out, 1 << 20)
+    os.replace(tmp, os.path.join(work, "new", name))
+    for part in parts:
+        os.remove(part)
+
+
+def _swap(log_dir, work, segment):
+    """Replace the original with new/<segment>; the original stays in old/."""
+    name = segment["name"]
+    path = os.path.join(log_dir, name)
+    if _stat(path) != segment["stat"]:
+        print(f"[WARN] {name} changed while it was being re-labelled; run the backfill again")
+        return False
+    backup = os.path.join(work, "old", name)
+    if not os.path.exists(backup):
+        try:
+            os.link(path, backup)
+        except OSError:
+            shutil.copy2(path, backup)
+    os.replace(os.path.join(work, "new", name), path)
+    segment["stat"], segment["swapped"] = _stat(path), True
+    return True
+
+
+# --- Pipeline ---
+def backfill(args):
+    from emotion_core.inference import MODEL_DIR
+
+    t0 = time.perf_counter()
+    model_dir = args.model_dir or MODEL_DIR
+    version = model_version(model_dir)
+    work = os.path.join(args.log_dir, WORK_DIR, version)
+    for sub in ("parts", "new", "old"):
+        os.makedirs(os.path.join(work, sub), exist_ok=True)
+    segments = plan(args.log_dir, work, args.include_live, args.chunk_bytes)
+    _save_plan(work, version, segments)
+    paths = [os.path.join(args.log_dir, s["name"]) for s in segments]
+
+    # A segment is finished once new/<segment> exists; otherwise run its missing parts.
+    tasks, waiting = [], {}
+    for index, segment in enumerate(segments):
+        name = segment["name"]
+        if segment["swapped"] or os.path.exists(os.path.join(work, "new", name)):
+            continue
+        if len(segment["chunks"]) == 1:
+            start, end = segment["chunks"][0]
+            tasks.append((index, start, end, os.path.join(work, "new", name)))
+            continue
+        missing = 0
+        for k, (start, end) in enumerate(segment["chunks"]):
+            part = os.path.join(work, "parts", f"{name}.{k}")
+            if not os.path.exists(part):
+                tasks.append((index, start, end, part))
+                missing += 1
+        waiting[index] = missing
+        if not missing:
+            _assemble(work, segment)
+
+    pending = sum(not s["swapped"] for s in segments)
+    print(f"[INFO] Model {version}: {len(segments)} segments, {pending} not swapped in, "
+          f"{len(tasks)} chunks to run on {args.jobs} processes")
+    rows = changed = 0
+    if tasks:
+        with ProcessPoolExecutor(args.jobs, initializer=_init_worker, initargs=(model_dir,)) as pool:
+            futures = {pool.submit(_relabel, paths, *task): task[0] for task in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                r = future.result()
+                rows += r["rows"]
+                changed += r["changed"]
+                index = futures[future]
+                if index in waiting:
+                    waiting[index] -= 1
+                    if not waiting[index]:
+                        _assemble(work, segments[index])
+                print(f"[INFO] {done}/{len(tasks)} chunks, {rows:,} rows, {changed:,} re-labelled",
+                      end="\r", flush=True)
+        print()
+    seconds = time.perf_counter() - t0
+    if rows:
+        print(f"[INFO] {rows:,} rows in {seconds:.1f} s ({rows / seconds:,.0f} rows/s)")
+
+    if args.no_swap:
+        print(f"[INFO] Re-labelled segments left in {os.path.join(work, 'new')}")
+        return 0
+    swapped = 0
+    for segment in segments:
+        if not segment["swapped"] and _swap(args.log_dir, work, segment):
+            swapped += 1
+            _save_plan(work, version, segments)
+    left = sum(not s["swapped"] for s in segments)
+    print(f"[INFO] Swapped in {swapped} segments; originals kept in {os.path.join(work, 'old')}")
+    return 1 if left else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-label activity_log.csv segments with the current model.")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--model-dir", help="default: model/")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES, help="target size of one work item")
+    parser.add_argument("--include-live", action="store_true",
+                        help=f"also rewrite the live {LOG_NAME} (only while the monitor is stopped)")
+    parser.add_argument("--no-swap", action="store_true", help="write the new segments but leave the logs alone")
+    return backfill(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Hour-of-week baselines for confidence scoring.
+
+Each of the 168 hour-of-week buckets keeps an EMA of kpm / mouse / clicks
+plus a sample count; one tick updates one bucket and the global EMA in
+O(1). Buckets that have never seen data fall back to the global EMA, which
+is seeded from logs/baseline.json (avg_kpm / avg_mouse) or the v7 defaults,
+so a cold start scores against sensible values instead of 180/9000/20 for
+every hour.
+
+State is saved atomically (temp file + fsync + rename) to a small binary
+file by a periodic runtime job whenever it has changed, and loaded with
+one read + np.frombuffer at startup.
+"""
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+FIELDS = ("kpm", "mouse", "clicks")
+DEFAULTS = (180.0, 9000.0, 20.0)
+BUCKETS = 7 * 24
+ALPHA = 0.1
+SAVE_INTERVAL = 60.0
+
+MAGIC = b"EMB1"
+_HEADER = struct.Struct("<4sHH")       # magic, buckets, fields
+
+
+def hour_of_week(t):
+    lt = time.localtime(t)
+    return lt.tm_wday * 24 + lt.tm_hour
+
+
+class BaselineModel:
+    def __init__(self, seed=DEFAULTS, alpha=ALPHA):
+        self.alpha = alpha
+        self.mean = np.tile(np.asarray(seed, dtype=np.float64), (BUCKETS, 1))
+        self.count = np.zeros(BUCKETS, dtype=np.uint32)
+        self.overall = np.asarray(seed, dtype=np.float64).copy()
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    # --- Updates ---
+    def update(self, t, metrics):
+        """Fold one tick's metrics into its hour-of-week bucket."""
+        x = (float(metrics["kpm"]), float(metrics["mouse"]), float(metrics["clicks"]))
+        b = hour_of_week(t)
+        a = self.alpha
+        with self._lock:
+            row = self.mean[b]
+            if self.count[b]:
+                for i in range(3):
+                    row[i] = row[i] * (1 - a) + x[i] * a
+            else:
+                # First sample for this hour: start from the global baseline.
+                for i in range(3):
+                    row[i] = self.overall[i] * (1 - a) + x[i] * a
+            for i in range(3):
+                self.overall[i] = self.overall[i] * (1 - a) + x[i] * a
+            self.count[b] += 1
+            self.dirty = True
+
+    def get(self, t):
+        """Baseline dict for the bucket containing time t."""
+        b = hour_of_week(t)
+        with self._lock:
+            src = self.mean[b] if self.count[b] else self.overall
+            return {"kpm": float(src[0]), "mouse": float(src[1]), "clicks": float(src[2])}
+
+    # --- Persistence ---
+    def to_bytes(self):
+        with self._lock:
+            return (_HEADER.pack(MAGIC, BUCKETS, len(FIELDS)) + self.mean.tobytes()
+                    + self.count.tobytes() + self.overall.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data, alpha=ALPHA):
+        magic, buckets, fields = _HEADER.unpack_from(data)
+        if magic != MAGIC or buckets != BUCKETS or fields != len(FIELDS):
+            raise ValueError("not a baseline snapshot")
+        off = _HEADER.size
+        model = cls(alpha=alpha)
+        n = BUCKETS * len(FIELDS)
+        model.mean = np.frombuffer(data, np.float64, n, off).reshape(BUCKETS, len(FIELDS)).copy()
+        off += n * 8
+        model.count = np.frombuffer(data, np.uint32, BUCKETS, off).copy()
+        off += BUCKETS * 4
+        model.overall = np.frombuffer(data, np.float64, len(FIELDS), off).copy()
+        return model
+
+    def save(self, path):
+        """Atomic write: readers see the old snapshot or the new one, never a torn file."""
+        data = self.to_bytes()
+        self.dirty = False
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, legacy_json=None):
+        """Load a snapshot; otherwise seed from the legacy JSON averages or defaults."""
+        try:
+            with open(path, "rb") as f:
+                return cls.from_bytes(f.read())
+        except (OSError, ValueError, struct.error) as err:
+            if os.path.exists(path):
+                print(f"[WARN] Ignoring unreadable baseline {path}: {err}")
+        seed = list(DEFAULTS)
+        if legacy_json and os.path.exists(legacy_json):
+            try:
+                with open(legacy_json) as f:
+                    old = json.load(f)
+                seed[0] = float(old.get("avg_kpm", seed[0]))
+                seed[1] = float(old.get("avg_mouse", seed[1]))
+            except (OSError, ValueError) as err:
+                print(f"[WARN] Ignoring {legacy_json}: {err}")
+        return cls(seed=seed)
+
+    def save_if_dirty(self, path):
+        """Save if anything changed since the last save (a periodic job body)."""
+        if self.dirty:
+            try:
+                self.save(path)
+            except OSError as err:
+                print(f"[WARN] Baseline save failed: {err}")
+
+    def close(self, path):
+        if self.dirty:
+            self.save(path)
@@ -0,0 +1,193 @@
+"""
+Keyboard / mouse capture.
+
+Listener callbacks only bump running totals on a __slots__ object: one
+integer add per key or click, and one hypot per mouse move coalesced into a
+running pixel distance. Nothing is queued per event. Totals are never reset.
+The aggregator turns them into per-window rates by diffing against the
+totals it saw last time, so a callback racing a window boundary is counted
+in the next window instead of being lost.
+
+Events come from pynput on a desktop, or from ReplaySource for headless
+runs and benchmarks.
+"""
+import math
+import threading
+import time
+
+KEY, MOVE, CLICK = 0, 1, 2
+
+
+class Counters:
+    """Running input totals; each field has a single writer thread."""
+
+    __slots__ = ("keys", "clicks", "mouse_px", "_x", "_y", "sink")
+
+    def __init__(self, sink=None):
+        self.keys = 0
+        self.clicks = 0
+        self.mouse_px = 0.0
+        self._x = None
+        self._y = None
+        self.sink = sink         # e.g. a FeatureExtractor wanting key timestamps
+
+    def on_key(self, *_):
+        self.keys += 1
+        if self.sink is not None:
+            self.sink.on_key(time.monotonic())
+
+    def on_move(self, x, y):
+        if self._x is not None:
+            self.mouse_px += math.hypot(x - self._x, y - self._y)
+        self._x = x
+        self._y = y
+
+    def on_click(self, x, y, button=None, pressed=True):
+        if pressed:
+            self.clicks += 1
+            if self.sink is not None:
+                self.sink.on_input(time.monotonic())
+
+
+class WindowAggregator:
+    """Per-window kpm / mouse px per minute / clicks per minute."""
+
+    def __init__(self, counters, clock=time.monotonic):
+        self.counters = counters
+        self.clock = clock
+        self._last = (clock(), counters.keys, counters.mouse_px, counters.clicks)
+
+    def window(self):
+        c = self.counters
+        now, keys, mouse, clicks = self.clock(), c.keys, c.mouse_px, c.clicks
+        t0, k0, m0, c0 = self._last
+        self._last = (now, keys, mouse, clicks)
+        per_min = 60.0 / max(now - t0, 1e-6)
+        return {
+            "kpm": int(round((keys - k0) * per_min)),
+            "mouse": int(round((mouse - m0) * per_min)),
+            "clicks": int(round((clicks - c0) * per_min)),
+        }
+
+
+# --- Sources ---
+class PynputSource:
+    """Global keyboard + mouse listeners (needs Accessibility permission on macOS)."""
+
+    def __init__(self, counters):
+        self.counters = counters
+        self._listeners = ()
+
+    def start(self):
+        from pynput import keyboard, mouse
+
+        c = self.counters
+        self._listeners = (
+            keyboard.Listener(on_press=c.on_key),
+            mouse.Listener(on_move=c.on_move, on_click=c.on_click),
+        )
+        for listener in self._listeners:
+            listener.daemon = True
+            listener.start()
+
+    def stop(self):
+        for listener in self._listeners:
+            listener.stop()
+
+
+class ReplaySource:
+    """
+    Feeds synthetic (kind, x, y) events through the same callbacks as pynput.
+
+    rate=None replays as fast as possible; otherwise events are paced to
+    `rate` per second against a monotonic deadline.
+    """
+
+    def __init__(self, counters, events, rate=None):
+        self.counters = counters
+        self.events = events
+        self.rate = rate
+        self.sent = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="input-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        c = self.counters
+        dispatch = (lambda x, y: c.on_key(), c.on_move, c.on_click)
+        step = 1.0 / self.rate if self.rate else 0.0
+        deadline = time.monotonic()
+        batch = max(1, int(self.rate / 1000)) if self.rate else 0
+        for i, (kind, x, y) in enumerate(self.events):
+            dispatch[kind](x, y)
+            self.sent = i + 1
+            if batch and self.sent % batch == 0:
+                # Pace in ~1 ms slices; per-event sleeps cannot keep up at 10k/s.
+                deadline += step * batch
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if self._stop.is_set():
+                break
+
+
+def synthetic_events(n, seed=0, mix=(0.5, 0.45, 0.05)):
+    """n random (kind, x, y) tuples with the given key/move/click mix."""
+    import random
+
+    rng = random.Random(seed)
+    kinds = rng.choices((KEY, MOVE, CLICK), weights=mix, k=n)
+    x = y = 500.0
+    events = []
+    for kind in kinds:
+        if kind == MOVE:
+            x += rng.uniform(-20, 20)
+            y += rng.uniform(-20, 20)
+        events.append((kind, x, y))
+    return events
+
+
+class InputCapture:
+    """Counters + aggregator + feature stage + source, started together by the entry points."""
+
+    def __init__(self, source=PynputSource):
+        """`source` is a factory called with the Counters, e.g. PynputSource."""
+        from emotion_core.features import FeatureExtractor
+
+        self.features = FeatureExtractor()
+        self.counters = Counters(sink=self.features)
+        self.aggregator = WindowAggregator(self.counters)
+        self.source = source(self.counters)
+
+    def start(self):
+        """Start the source; returns False (and reports zeros) if it can't run here."""
+        try:
+            self.source.start()
+            return True
+        except Exception as err:
+            print(f"[WARN] Input capture unavailable: {err}")
+            return False
+
+    def stop(self):
+        self.source.stop()
+
+    def window(self):
+        return self.aggregator.window()
+
+    def sample(self):
+        """(window counts, model feature vector) for one analyzer tick."""
+        w = self.aggregator.window()
+        return w, self.features.tick(w)
@@ -0,0 +1,381 @@
+"""
+Pluggable emotion classifiers and a shadow-mode harness to compare them.
+
+Every engine takes the same input, the tick's window counts and its
+feature vector (capture.sample()), and returns (emotion, confidence %,
+activity or None), the shape of InferenceEngine.predict_one:
+
+    "xgboost"    the models in model/ (inference.get_engine()); the shipped
+                 ones predate schema.FEATURE_NAMES, retrain before promoting
+    "heuristic"  the v7 detect_emotion thresholds against an EMA baseline
+    "random"     the old v9 weighted-random simulate(), as a chance floor
+
+    harness = ShadowHarness.from_names("heuristic", ["xgboost", "random"])
+    e, c, a = harness.classify(w, x)          # primary only, on this thread
+    harness.report()                          # /api/classifiers
+
+The primary runs inline and its result is what the app shows and logs.
+The shadows get a copy of the same input and the primary's answer on a
+small thread pool, so they never add to the tick; when the pool falls
+behind, ticks are dropped (and counted) rather than queued without limit.
+For each engine the harness keeps its latency, its label distribution
+overall and over the last `window` ticks (drift is the total variation
+distance between the two), and for each shadow a primary x shadow
+confusion matrix for emotion and, where both give one, activity.
+Latencies also go to /metrics as emotion_classifier_seconds{engine=...}.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from emotion_core import heuristic
+from emotion_core.metrics import registry
+from emotion_core.schema import ACTIVITIES, ACTIVITY_CODES, EMOTIONS, EMOTION_CODES
+
+DRIFT_WINDOW = 240            # ticks; about an hour at the 15 s default
+MAX_PENDING = 32              # shadow ticks waiting for the pool before new ones are dropped
+SAVE_INTERVAL = 300.0
+SHADOW_FILE = "classifiers.json"
+
+CLASSIFIER_SECONDS = registry.histogram("emotion_classifier_seconds", "Classifier latency per tick by engine.")
+
+
+# --- Registry ---
+ENGINES = {}
+
+
+def register(name):
+    """Class decorator: make an engine available to create() under `name`."""
+    def wrap(cls):
+        cls.name = name
+        ENGINES[name] = cls
+        return cls
+    return wrap
+
+
+def create(name, **kwargs):
+    try:
+        cls = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"unknown classifier {name!r} (have {', '.join(sorted(ENGINES))})") from None
+    return cls(**kwargs)
+
+
+class Classifier:
+    """Base engine: predict(window, features) -> (emotion, confidence %, activity or None)."""
+
+    name = "?"
+
+    def warm(self):
+        """Load whatever predict() needs, so the first tick is not the slow one."""
+
+    def predict(self, window, features):
+        raise NotImplementedError
+
+
+@register("xgboost")
+class ModelClassifier(Classifier):
+    """
+    The models in model/. They are trained (training.py) and backfilled on
+    rows rebuilt from the logged window counts, so the live row is rebuilt
+    the same way with training.FeatureBuilder rather than taken from the
+    FeatureExtractor vector, whose rhythm statistics are not in the logs.
+    """
+
+    def __init__(self, engine=None, clock=time.time):
+        from emotion_core.training import FeatureBuilder
+
+        if engine is None:
+            from emotion_core.inference import get_engine
+
+            engine = get_engine()
+        self.engine = engine
+        self.clock = clock
+        self.rows = FeatureBuilder()
+        self._lock = threading.Lock()
+
+    def warm(self):
+        self.engine.models
+
+    def predict(self, window, features):
+        counts = np.array([[window["kpm"], window["mouse"], window["clicks"]]], dtype=np.float64)
+        with self._lock:
+            row = self.rows.build(np.array([self.clock()]), counts)[0]
+        return self.engine.predict_one(row)
+
+
+@register("heuristic")
+class HeuristicClassifier(Classifier):
+    """
+    v7's thresholds (heuristic.classify), with the activity labelled from
+    the counts (heuristic.activity). The confidence is scored against
+    `baseline(now)` when given (v7 passes its hour-of-week model), else
+    against a kpm EMA kept here, as in detect_emotion_batch.
+    """
+
+    def __init__(self, baseline=None):
+        self.baseline = baseline
+        self.kpm = float(heuristic.DEFAULT_BASELINE["kpm"])
+
+    def predict(self, window, features):
+        kpm, mouse = float(window["kpm"]), float(window["mouse"])
+        if self.baseline is not None:
+            base = self.baseline(time.time())["kpm"]
+        else:
+            self.kpm += heuristic.EMA_ALPHA * (kpm - self.kpm)
+            base = self.kpm
+        code = int(heuristic.classify(kpm, mouse))
+        activity = int(heuristic.activity(kpm, mouse, window["clicks"]))
+        return EMOTIONS[code], int(heuristic.confidence(kpm, base)), ACTIVITIES[activity]
+
+
+@register("random")
+class RandomClassifier(Classifier):
+    """The pre-model v9 simulate(): weighted random labels, whatever the input."""
+
+    WEIGHTS = {"Focused": 0.3, "Normal": 0.4, "Tired": 0.2, "Stressed": 0.1}
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.labels = list(self.WEIGHTS)
+        self.weights = list(self.WEIGHTS.values())
+
+    def predict(self, window, features):
+        return self.rng.choices(self.labels, self.weights)[0], self.rng.randint(60, 100), None
+
+
+# --- Shadow harness ---
+class _EngineStats:
+    def __init__(self, window):
+        self.latency = deque(maxlen=window)
+        self.recent = deque(maxlen=window)
+        self.emotion = np.zeros(len(EMOTIONS), dtype=np.int64)
+        self.errors = 0
+
+    def add(self, seconds, code):
+        self.latency.append(seconds)
+        self.recent.append(code)
+        self.emotion[code] += 1
+
+
+def _distribution(counts):
+    total = counts.sum()
+    return counts / total if total else counts.astype(np.float64)
+
+
+def _matrix_report(m):
+    total = int(m.sum())
+    return {"n": total, "agreement": round(float(np.trace(m) / total), 4) if total else None,
+            "matrix": m.tolist()}
+
+
+class ShadowHarness:
+    def __init__(self, primary, shadows=(), workers=1, window=DRIFT_WINDOW, max_pending=MAX_PENDING):
+        """`primary` and `shadows` are Classifier instances; names must differ."""
+        self.primary = primary
+        self.shadows = list(shadows)
+        names = [primary.name] + [s.name for s in self.shadows]
+        if len(set(names)) != len(names):
+            raise ValueError(f"duplicate classifier names: {names}")
+        self.window = window
+        self.max_pending = max_pending
+        self.stats = {name: _EngineStats(window) for name in names}
+        k, a = len(EMOTIONS), len(ACTIVITIES)
+        self.emotion_matrix = {s.name: np.zeros((k, k), dtype=np.int64) for s in self.shadows}
+        self.activity_matrix = {s.name: np.zeros((a, a), dtype=np.int64) for s in self.shadows}
+        # Recent agreement per shadow, for drift in agreement rather than in labels alone.
+        self.recent_agree = {s.name: deque(maxlen=window) for s in self.shadows}
+        self.ticks = 0
+        self.dropped = 0
+        self.pending = 0
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._latency = {name: CLASSIFIER_SECONDS.labels(engine=name) for name in names}
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="shadow") if self.shadows else None
+
+    @classmethod
+    def from_names(cls, primary, shadows=(), **kwargs):
+        """Harness over registered engines; shadows that fail to build are skipped with a warning."""
+        built = []
+        for name in shadows:
+            try:
+                built.append(create(name))
+            except Exception as err:
+                print(f"[WARN] Shadow classifier {name} unavailable: {err}")
+        return cls(create(primary), built, **kwargs)
+
+    def warm(self):
+        for engine in [self.primary] + self.shadows:
+            engine.warm()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Tick side ---
+    def classify(self, window, features):
+        """
+        Primary result for this tick; the shadows are queued on the pool. The
+        activity is never None: for a primary without an activity head
+        (random) it is labelled from the counts, as the heuristic does.
+        """
+        t0 = time.perf_counter()
+        e, c, a = result = self.primary.predict(window, features)
+        if a is None:
+            a = ACTIVITIES[int(heuristic.activity(window["kpm"], window["mouse"], window["clicks"]))]
+            result = e, c, a
+        self.observe(window, features, result, time.perf_counter() - t0)
+        return result
+
+    def observe(self, window, features, result, seconds=None):
+        """
+        Record a primary result computed elsewhere (v7 keeps its own
+        detect_emotion call) and queue the shadows for the same input.
+        """
+        e, _, a = result
+        code = EMOTION_CODES[e]
+        with self._lock:
+            self.ticks += 1
+            self.dirty = True
+            if seconds is not None:
+                self.stats[self.primary.name].add(seconds, code)
+                self._latency[self.primary.name].observe(seconds)
+            else:
+                self.stats[self.primary.name].recent.append(code)
+                self.stats[self.primary.name].emotion[code] += 1
+            if self.executor is None:
+                return
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self.pending += 1
+        # The feature array is reused by the next tick.
+        features = None if features is None else np.array(features, copy=True)
+        self.executor.submit(self._run_shadows, dict(window), features, code, ACTIVITY_CODES.get(a))
+
+    def _run_shadows(self, window, features, emotion, activity):
+        try:
+            for engine in self.shadows:
+                t0 = time.perf_counter()
+                try:
+                    e, _, a = engine.predict(window, features)
+                except Exception as err:
+                    with self._lock:
+                        errors = self.stats[engine.name].errors = self.stats[engine.name].errors + 1
+                    if errors == 1:
+                        print(f"[WARN] Shadow classifier {engine.name} failed: {err}")
+                    continue
+                seconds = time.perf_counter() - t0
+                self._latency[engine.name].observe(seconds)
+                code = EMOTION_CODES[e]
+                with self._lock:
+                    self.stats[engine.name].add(seconds, code)
+                    self.emotion_matrix[engine.name][emotion, code] += 1
+                    self.recent_agree[engine.name].append(emotion == code)
+                    if activity is not None and a is not None:
+                        self.activity_matrix[engine.name][activity, ACTIVITY_CODES[a]] += 1
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    # --- Reporting ---
+    def report(self):
+        """Latency, label mix, drift and agreement as one JSON-able dict."""
+        with self._lock:
+            engines = {}
+            for name, s in self.stats.items():
+                lat = np.array(s.latency) * 1e3
+                recent = np.bincount(np.array(s.recent, dtype=np.intp), minlength=len(EMOTIONS))
+                overall, now = _distribution(s.emotion), _distribution(recent)
+                engines[name] = {
+                    "role": "primary" if name == self.primary.name else "shadow",
+                    "ticks": int(s.emotion.sum()),
+                    "errors": s.errors,
+                    "latency_ms": {
+                        "mean": round(float(lat.mean()), 4), "p50": round(float(np.percentile(lat, 50)), 4),
+                        "p99": round(float(np.percentile(lat, 99)), 4), "max": round(float(lat.max()), 4),
+                    } if len(lat) else None,
+                    "labels": dict(zip(EMOTIONS, np.round(overall, 4).tolist())),
+                    "recent": dict(zip(EMOTIONS, np.round(now, 4).tolist())),
+                    "drift": round(0.5 * float(np.abs(now - overall).sum()), 4) if len(s.recent) else None,
+                }
+            agreement = {}
+            for name in self.emotion_matrix:
+                emotion = _matrix_report(self.emotion_matrix[name])
+                recent = self.recent_agree[name]
+                emotion["recent_agreement"] = round(sum(recent) / len(recent), 4) if recent else None
+                agreement[name] = {"emotion": emotion, "activity": _matrix_report(self.activity_matrix[name])}
+            return {
+                "primary": self.primary.name, "ticks": self.ticks, "dropped": self.dropped,
+                "pending": self.pending, "window": self.window,
+                "labels": {"emotion": list(EMOTIONS), "activity": list(ACTIVITIES)},
+                "engines": engines, "agreement": agreement,
+            }
+
+    # --- Persistence ---
+    def save(self, path):
+        """Cumulative counts (not latencies) as JSON, written atomically."""
+        with self._lock:
+            state = {
+                "primary": self.primary.name, "ticks": self.ticks,
+                "emotion": {name: s.emotion.tolist() for name, s in self.stats.items()},
+                "emotion_matrix": {name: m.tolist() for name, m in self.emotion_matrix.items()},
+                "activity_matrix": {name: m.tolist() for name, m in self.activity_matrix.items()},
+            }
+            self.dirty = False
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """
+        Resume counts saved by save() for the same primary; engines that are
+        no longer configured are dropped. Returns self.
+        """
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return self
+        except (OSError, ValueError) as err:
+            print(f"[WARN] Could not read {path} ({err}); comparing from scratch.")
+            return self
+        if state.get("primary") != self.primary.name:
+            print(f"[INFO] {path} was recorded for primary {state.get('primary')!r}; comparing from scratch.")
+            return self
+        try:
+            with self._lock:
+                for name, counts in state["emotion"].items():
+                    if name in self.stats:
+                        self.stats[name].emotion[:] = counts
+                for key, matrices in (("emotion_matrix", self.emotion_matrix),
+                                      ("activity_matrix", self.activity_matrix)):
+                    for name, m in state[key].items():
+                        if name in matrices:
+                            matrices[name][:] = m
+                self.ticks = int(state["ticks"])
+        except (KeyError, TypeError, ValueError) as err:
+            print(f"[WARN] Ignoring malformed {path} ({err}).")
+        return self
+
+    def save_if_dirty(self, path):
+        """Save if anything changed since the last save (a periodic job body)."""
+        if self.dirty:
+            try:
+                self.save(path)
+            except OSError as err:
+                print(f"[WARN] Classifier stats save failed: {err}")
+
+
+def classifiers(harness, args):
+    """/api/classifiers for any server; returns (status, JSON-able dict)."""
+    return 200, harness.report()
@@ -0,0 +1,430 @@
+"""
+Collector mode: one node aggregating the monitors of a whole team.
+
+    python -m emotion_core.collector [--host 0.0.0.0] [--port 9090] [--shards 16] [--log-dir logs]
+    python -m emotion_core.daemon --collector http://team-host:9090        # on every workstation
+
+Agents (agent.py) POST gzip'ed JSON batches of ticks to /api/ingest. Each
+agent's ticks are folded into its own Rollups, the same per-day and
+per-week tables as /api/summary, and its latest tick is kept for the live
+view. Agents are spread over `shards` dicts by a hash of their id. Each
+shard has its own lock, so batches from different agents, and the readers
+behind /api/team, do not queue on one lock. A batch whose (session, seq)
+the agent already delivered is acknowledged and skipped, so agent retries
+are safe.
+
+    POST /api/ingest                     agent batches
+    GET  /                               team dashboard
+    GET  /api/stats, /api/stream         team snapshot (agents online, current emotions, ingest rate)
+    GET  /api/team[?online=1&limit=N]    one row per agent: latest tick, last seen
+    GET  /api/team/summary?[agent=]...   rollup summary (from/to/days/group) for one agent or the team
+
+Everything is aggregated in memory. The per-agent tables are also saved to
+`<log-dir>/collector.bin` every SAVE_INTERVAL and on exit, so a restart
+keeps the history. Thousands of agents each hold a keep-alive connection,
+so raise the open-file limit (ulimit -n) to match.
+"""
+import argparse
+import json
+import math
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+import zlib
+from functools import partial
+
+from emotion_core import rollup
+from emotion_core.agent import FIELDS, INGEST_PATH
+from emotion_core.metrics import registry
+from emotion_core.runtime import Runtime
+from emotion_core.schema import ACTIVITIES, EMOTIONS
+from emotion_core.snapshot import SnapshotPublisher
+
+COLLECTOR_FILE = "collector.bin"
+SHARDS = 16
+TEAM_INTERVAL = 2.0          # seconds between team snapshots on /api/stats and /api/stream
+TEAM_TTL = 10.0              # the merged team rollups are rebuilt at most this often
+ONLINE_AFTER = 60.0          # an agent is online if it reported within max(this, 3 ticks)
+SAVE_INTERVAL = 60.0
+MAX_AGENTS = 20_000
+MAX_TICKS = 10_000           # per batch
+# Ticks must lie within [now - MAX_TICK_AGE, now + MAX_TICK_SKEW] of the collector's clock, so
+# one batch can stretch an agent's day table by at most about 400 rows.
+MAX_TICK_AGE = 400 * 86400.0
+MAX_TICK_SKEW = 86400.0
+MAX_UTC_OFFSET = 86400       # seconds
+MAX_DECODED = 32 * 1024 * 1024
+MAX_AGENT_ID = 128
+
+MAGIC = b"EMC1"
+_HEADER = struct.Struct("<4sI")        # magic, agents
+_RECORD = struct.Struct("<II")         # meta JSON length, rollup snapshot length
+
+
+def decode(body, encoding=None):
+    """Batch dict from a request body (gzip, deflate or plain JSON)."""
+    if encoding in ("gzip", "deflate"):
+        d = zlib.decompressobj(47)     # 32 + 15: zlib or gzip header, detected
+        body = d.decompress(body, MAX_DECODED)
+        if d.unconsumed_tail:
+            raise ValueError("batch too large once decompressed")
+    elif encoding not in (None, "", "identity"):
+        raise ValueError(f"unsupported Content-Encoding {encoding!r}")
+    batch = json.loads(body)
+    if not isinstance(batch, dict):
+        raise ValueError("batch must be a JSON object")
+    return batch
+
+
+def _rows(ticks, now):
+    """Validated (t, kpm, mouse, clicks, emotion, confidence, activity) tuples."""
+    if not isinstance(ticks, list) or len(ticks) > MAX_TICKS:
+        raise ValueError(f"ticks must be a list of at most {MAX_TICKS}")
+    rows = []
+    for t, kpm, mouse, clicks, emotion, conf, activity in ticks:
+        row = (float(t), float(kpm), float(mouse), float(clicks), int(emotion),
+               None if conf is None else float(conf), int(activity))
+        if not all(math.isfinite(v) for v in row if v is not None):
+            raise ValueError(f"non-finite value in tick {t}")
+        if not now - MAX_TICK_AGE <= row[0] <= now + MAX_TICK_SKEW:
+            raise ValueError(f"tick time {t} is too far from the collector's clock")
+        if not (-1 <= row[4] < len(EMOTIONS) and -1 <= row[6] < len(ACTIVITIES)):
+            raise ValueError(f"label code out of range in {t}")
+        rows.append(row)
+    return rows
+
+
+class _Agent:
+    __slots__ = ("id", "rollups", "session", "seq", "interval", "last_seen", "latest", "ticks")
+
+    def __init__(self, agent_id, rollups, interval=None):
+        self.id = agent_id
+        self.rollups = rollups
+        self.session = None
+        self.seq = 0
+        self.interval = interval
+        self.last_seen = 0.0
+        self.latest = None
+        self.ticks = 0
+
+    def online(self, now):
+        return now - self.last_seen <= max(ONLINE_AFTER, 3 * (self.interval or 0))
+
+    def row(self, now):
+        out = {"agent": self.id, "online": self.online(now), "last_seen_s": round(now - self.last_seen, 1),
+               "ticks": self.ticks}
+        if self.latest is not None:
+            t, kpm, mouse, clicks, e, conf, a = self.latest
+            out.update(emotion=EMOTIONS[e] if e >= 0 else None, activity=ACTIVITIES[a] if a >= 0 else None,
+                       confidence=conf, kpm=kpm, mouse=mouse, clicks=clicks, t=t)
+        return out
+
+
+class _Shard:
+    __slots__ = ("agents", "lock")
+
+    def __init__(self):
+        self.agents = {}
+        self.lock = threading.Lock()
+
+
+class Collector:
+    def __init__(self, host="0.0.0.0", port=9090, shards=SHARDS, log_dir="logs", save=True):
+        self.shards = [_Shard() for _ in range(shards)]
+        self.path = os.path.join(log_dir, COLLECTOR_FILE) if save else None
+        self.log_dir = log_dir
+        self.count = 0
+        self.batches = self.ingested = self.duplicates = self.rejected = 0
+        self.dirty = False
+        self._count_lock = threading.Lock()
+        self._rate = (time.monotonic(), 0, 0)
+        self._team = (0.0, None)            # (built at, merged Rollups)
+        if self.path:
+            self.load(self.path)
+        self.snapshots = SnapshotPublisher(self.team_stats())
+        self.runtime = Runtime(self.snapshots, host, port, log_dir, pages={"/": TEAM_HTML},
+                               routes={"/api/team": self.team, "/api/team/summary": self.summary},
+                               posts={INGEST_PATH: self.ingest})
+        self.runtime.every(TEAM_INTERVAL, self.publish, name="team")
+        if self.path:
+            self.runtime.every(SAVE_INTERVAL, partial(self.save_if_dirty, self.path), name="collector")
+        registry.gauge("emotion_collector_agents", "Agents known to the collector.", lambda: self.count)
+        registry.gauge("emotion_collector_ticks_total", "Ticks ingested from agents.",
+                       lambda: self.ingested, kind="counter")
+        registry.gauge("emotion_collector_batches_total", "Agent batches by outcome.",
+                       lambda: self.batches, kind="counter", outcome="applied")
+        registry.gauge("emotion_collector_batches_total", "Agent batches by outcome.",
+                       lambda: self.duplicates, kind="counter", outcome="duplicate")
+        registry.gauge("emotion_collector_batches_total", "Agent batches by outcome.",
+                       lambda: self.rejected, kind="counter", outcome="rejected")
+
+    def start(self):
+        self.runtime.start()
+
+    def stop(self):
+        self.runtime.stop()
+        if self.path:
+            self.save_if_dirty(self.path)
+
+    @property
+    def address(self):
+        return self.runtime.host, self.runtime.port
+
+    def shard(self, agent_id):
+        return self.shards[zlib.crc32(agent_id.encode()) % len(self.shards)]
+
+    def agents(self):
+        """Snapshot list of every agent (no shard lock held afterwards)."""
+        out = []
+        for shard in self.shards:
+            with shard.lock:
+                out.extend(shard.agents.values())
+        return out
+
+    # --- Ingest ---
+    def ingest(self, body, headers):
+        """POST /api/ingest: fold one agent batch in. Returns (status, JSON-able dict)."""
+        try:
+            batch = decode(body, headers.get("content-encoding"))
+            agent_id = batch["agent"]
+            if not isinstance(agent_id, str) or not 0 < len(agent_id) <= MAX_AGENT_ID:
+                raise ValueError("agent must be a non-empty string")
+            if tuple(batch.get("fields", FIELDS)) != FIELDS:
+                raise ValueError(f"fields must be {','.join(FIELDS)}")
+            session, seq = str(batch.get("session", "")), int(batch["seq"])
+            interval = batch.get("interval")
+            interval = None if interval is None else float(interval)
+            if interval is not None and not 0 < interval <= 86400:
+                raise ValueError("interval must be in (0, 86400] seconds")
+            utc_offset = int(batch.get("utc_offset") or 0)
+            if abs(utc_offset) > MAX_UTC_OFFSET:
+                raise ValueError(f"utc_offset must be within +/-{MAX_UTC_OFFSET} s")
+            rows = _rows(batch["ticks"], time.time())
+        except (ValueError, KeyError, TypeError, zlib.error) as err:
+            self.rejected += 1
+            return 400, {"error": f"bad batch: {err}"}
+
+        shard = self.shard(agent_id)
+        with shard.lock:
+            agent = shard.agents.get(agent_id)
+            if agent is None:
+                with self._count_lock:
+                    if self.count >= MAX_AGENTS:
+                        return 503, {"error": "collector is full"}
+                    self.count += 1
+                gap = max(rollup.MAX_GAP, 2 * (interval or 0))
+                agent = shard.agents[agent_id] = _Agent(agent_id, rollup.Rollups(gap, utc_offset), interval)
+            if session == agent.session and seq <= agent.seq:
+                self.duplicates += 1
+                return 200, {"seq": agent.seq, "duplicate": True}
+            add = agent.rollups.add
+            for row in rows:
+                add(*row)
+            # Only now: a batch that failed to apply must not be acked as a duplicate on retry.
+            agent.session, agent.seq = session, seq
+            agent.interval = interval or agent.interval
+            newest = max(rows, key=lambda r: r[0], default=None)
+            if newest is not None and (agent.latest is None or newest[0] >= agent.latest[0]):
+                agent.latest = newest
+            agent.last_seen = time.time()
+            agent.ticks += len(rows)
+        with self._count_lock:
+            self.batches += 1
+            self.ingested += len(rows)
+        self.dirty = True
+        return 200, {"seq": seq, "ticks": len(rows)}
+
+    # --- Reads ---
+    def team_stats(self):
+        now, mono = time.time(), time.monotonic()
+        emotions = dict.fromkeys(EMOTIONS, 0)
+        activities = dict.fromkeys(ACTIVITIES, 0)
+        online = kpm = 0
+        for agent in self.agents():
+            if agent.latest is None or not agent.online(now):
+                continue
+            online += 1
+            _, k, _, _, e, _, a = agent.latest
+            kpm += k
+            if e >= 0:
+                emotions[EMOTIONS[e]] += 1
+            if a >= 0:
+                activities[ACTIVITIES[a]] += 1
+        t0, batches, ticks = self._rate
+        dt = max(mono - t0, 1e-6)
+        self._rate = (mono, self.batches, self.ingested)
+        return {
+            "agents": self.count, "online": online, "emotions": emotions, "activities": activities,
+            "avg_kpm": round(kpm / online, 1) if online else 0,
+            "batches_per_s": round((self.batches - batches) / dt, 1),
+            "ticks_per_s": round((self.ingested - ticks) / dt, 1),
+            "rejected": self.rejected, "timestamp": time.strftime("%H:%M:%S"),
+        }
+
+    def publish(self):
+        """Runtime job: refresh /api/stats and push the team snapshot to /api/stream."""
+        self.runtime.hub.publish(self.snapshots.publish(self.team_stats()).body)
+
+    def team(self, args):
+        """GET /api/team: per-agent rows, sorted by agent id."""
+        try:
+            limit = int(args.get("limit") or MAX_AGENTS)
+            offset = int(args.get("offset") or 0)
+        except ValueError as err:
+            return 400, {"error": str(err)}
+        now = time.time()
+        rows = sorted((a.row(now) for a in self.agents()), key=lambda r: r["agent"])
+        if args.get("online") in ("1", "true"):
+            rows = [r for r in rows if r["online"]]
+        return 200, {"agents": len(rows), "offset": offset, "rows": rows[offset:offset + limit]}
+
+    def team_rollups(self):
+        """Every agent's tables summed; rebuilt at most every TEAM_TTL seconds."""
+        built, merged = self._team
+        if merged is None or time.monotonic() - built > TEAM_TTL:
+            merged = rollup.merge(a.rollups for a in self.agents())
+            self._team = (time.monotonic(), merged)
+        return merged
+
+    def summary(self, args):
+        """GET /api/team/summary: /api/summary for `agent`, or for the whole team."""
+        agent_id = args.get("agent")
+        if agent_id:
+            shard = self.shard(agent_id)
+            with shard.lock:
+                agent = shard.agents.get(agent_id)
+            if agent is None:
+                return 404, {"error": f"unknown agent {agent_id!r}"}
+            status, result = rollup.summary(agent.rollups, args)
+            result["agent"] = agent_id
+        else:
+            status, result = rollup.summary(self.team_rollups(), args)
+            result["agents"] = self.count
+        return status, result
+
+    # --- Persistence ---
+    def save(self, path):
+        """Every agent's rollups and sequence state, written atomically."""
+        self.dirty = False
+        parts = []
+        agents = self.agents()
+        for a in agents:
+            meta = json.dumps({"agent": a.id, "session": a.session, "seq": a.seq, "interval": a.interval,
+                               "last_seen": a.last_seen, "latest": a.latest, "ticks": a.ticks,
+                               "max_gap": a.rollups.max_gap, "utc_offset": a.rollups.utc_offset}).encode()
+            blob = a.rollups.to_bytes()
+            parts += (_RECORD.pack(len(meta), len(blob)), meta, blob)
+        tmp = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(agents)))
+            f.writelines(parts)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def load(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        try:
+            magic, n = _HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise ValueError("not a collector snapshot")
+            off = _HEADER.size
+            for _ in range(n):
+                meta_len, blob_len = _RECORD.unpack_from(data, off)
+                off += _RECORD.size
+                meta = json.loads(data[off:off + meta_len])
+                off += meta_len
+                r = rollup.Rollups.from_bytes(data[off:off + blob_len], max_gap=meta["max_gap"],
+                                              utc_offset=meta["utc_offset"])
+                off += blob_len
+                agent = _Agent(meta["agent"], r, meta["interval"])
+                agent.session, agent.seq = meta["session"], meta["seq"]
+                agent.last_seen, agent.ticks = meta["last_seen"], meta["ticks"]
+                agent.latest = tuple(meta["latest"]) if meta["latest"] else None
+                self.shard(agent.id).agents[agent.id] = agent
+                self.count += 1
+        except (OSError, ValueError, KeyError, struct.error) as err:
+            print(f"[WARN] Ignoring unreadable collector state {path}: {err}")
+            for shard in self.shards:
+                shard.agents.clear()
+            self.count = 0
+
+    def save_if_dirty(self, path):
+        if self.dirty:
+            try:
+                self.save(path)
+            except OSError as err:
+                print(f"[WARN] Collector save failed: {err}")
+
+
+TEAM_HTML = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>Team Emotion Monitor</title>
+<style>
+body{font-family:-apple-system,Helvetica,sans-serif;background:#0e0e10;color:#eee;margin:0;padding:20px;}
+h2{margin:0 0 12px}#head{font-size:15px;color:#aaa;margin-bottom:10px}#head b{color:#fff}
+#mix{display:flex;height:26px;border-radius:6px;overflow:hidden;margin-bottom:16px;background:#222}
+#mix div{display:flex;align-items:center;justify-content:center;font-size:12px;color:#000;transition:width .5s}
+table{border-collapse:collapse;width:100%;font-size:13px}th,td{padding:5px 8px;text-align:left;border-bottom:1px solid #222}
+th{color:#888;font-weight:normal}.off{opacity:.4}.dot{display:inline-block;width:9px;height:9px;border-radius:50%;margin-right:6px}
+</style></head><body>
+<h2>🧠 Team Emotion Monitor</h2>
+<div id="head">Waiting for agents...</div>
+<div id="mix"></div>
+<table><thead><tr><th>Agent</th><th>Emotion</th><th>Activity</th><th>Conf.</th><th>KPM</th><th>Mouse</th><th>Last seen</th></tr></thead>
+<tbody id="rows"></tbody></table>
+<script>
+const COLORS={Focused:'#00ff66',Normal:'#FFD700',Tired:'#0096FF',Stressed:'#FF4040'};
+// Agent ids and every other field come from the network: escape all of them.
+const esc=v=>String(v??'-').replace(/[&<>"']/g,c=>`&#${c.charCodeAt(0)};`);
+const color=e=>Object.hasOwn(COLORS,e)?COLORS[e]:'#555';
+function team(s){
+document.getElementById('head').innerHTML=`<b>${esc(s.online)}</b> of ${esc(s.agents)} agents online · avg KPM <b>${esc(s.avg_kpm)}</b> · ingest ${esc(s.ticks_per_s)} ticks/s`;
+const total=Object.values(s.emotions).reduce((a,b)=>a+b,0)||1;
+document.getElementById('mix').innerHTML=Object.entries(s.emotions).filter(([,n])=>n).map(([e,n])=>
+`<div style="width:${esc(100*n/total)}%;background:${color(e)}">${esc(e)} ${esc(n)}</div>`).join('');
+}
+async function rows(){
+const r=await (await fetch('/api/team?limit=500')).json();
+document.getElementById('rows').innerHTML=r.rows.map(a=>`<tr class="${a.online?'':'off'}"><td>${esc(a.agent)}</td>
+<td><span class="dot" style="background:${color(a.emotion)}"></span>${esc(a.emotion)}</td><td>${esc(a.activity)}</td>
+<td>${esc(a.confidence)}</td><td>${esc(a.kpm)}</td><td>${esc(a.mouse)}</td><td>${esc(a.last_seen_s)}s ago</td></tr>`).join('');
+}
+const es=new EventSource('/api/stream');
+es.addEventListener('stats',e=>team(JSON.parse(e.data)));
+rows();setInterval(rows,5000);
+</script></body></html>"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Team collector: ingest from many monitors, one dashboard.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--shards", type=int, default=SHARDS)
+    parser.add_argument("--log-dir", default="logs", help=f"where {COLLECTOR_FILE} is kept")
+    parser.add_argument("--no-save", action="store_true", help="keep everything in memory only")
+    args = parser.parse_args(argv)
+
+    collector = Collector(args.host, args.port, args.shards, args.log_dir, save=not args.no_save)
+    collector.start()
+    host, port = collector.address
+    print(f"[INFO] Collector serving http://{host}:{port} ({collector.count} agents loaded)")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        threading.Event().wait()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        print("[INFO] Shutting down.")
+        collector.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+XGBoost boosters compiled to flat NumPy arrays.
+
+    python -m emotion_core.compiled [--model-dir model]     # pickles -> model/models.npz
+
+Every tree of a booster is stored in one set of node arrays (feature,
+threshold, child, default_left, value). Nodes are renumbered so that a
+node's right child always follows its left child, which turns a split into
+`node = child[node] + go_right`. Leaves point at themselves with an
+infinite threshold, so a batch walks all trees in lockstep, level by level,
+without branching; trees that are already done drop out of the walk. The
+scaler's mean/scale go in the same file.
+
+The file is an uncompressed .npz, and load() memory-maps each member in
+place. Loading it imports NumPy only: no xgboost, scikit-learn or joblib.
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import zipfile
+
+import numpy as np
+
+CHUNK = 128                  # rows per pass; keeps the (trees, rows) scratch arrays in cache
+HEADS = ("emotion", "activity")
+OBJECTIVES = ("multi:softprob", "binary:logistic", "reg:squarederror")
+
+_NODE = np.dtype([("threshold", np.float32), ("child", np.int32), ("feature", np.intp)])
+
+
+class CompiledForest:
+    """Vectorized evaluator; inplace_predict() matches Booster.inplace_predict."""
+
+    def __init__(self, arrays, prefix=""):
+        get = lambda name: arrays[prefix + name]
+        roots, depth = np.asarray(get("roots")), np.asarray(get("tree_depth"))
+        tree_class, value = np.asarray(get("tree_class")), get("value")
+        self.objective = str(get("objective"))
+        self.n_features = int(get("n_features"))
+        self.n_classes = len(get("base_margin"))
+        # Single-leaf trees are constants: fold them into the base margin.
+        self.base_margin = np.array(get("base_margin"), dtype=np.float32)
+        const = depth == 0
+        np.add.at(self.base_margin, tree_class[const], value[roots[const]])
+        # Deepest trees first, so level L only touches the first level_counts[L] trees.
+        order = np.argsort(-depth, kind="stable")
+        order = order[~const[order]]
+        self.roots = roots[order].astype(np.intp)
+        self.level_counts = [int((depth[order] > level).sum()) for level in range(int(depth.max()))]
+        self.value = value
+        # One gather per step fetches threshold, child and feature together.
+        self.nodes = np.empty(len(value), dtype=_NODE)
+        self.nodes["threshold"] = get("threshold")
+        self.nodes["child"] = get("child")
+        self.nodes["feature"] = get("feature")
+        self.default_left = get("default_left")
+        # (trees, classes) indicator: leaf values -> per-class margins in one matmul.
+        self.onehot = np.zeros((len(self.roots), self.n_classes), dtype=np.float32)
+        self.onehot[np.arange(len(self.roots)), tree_class[order]] = 1.0
+
+    def margin(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected an (n, {self.n_features}) array, got {X.shape}")
+        out = np.empty((len(X), self.n_classes), dtype=np.float32)
+        missing = bool(np.isnan(X).any())
+        for start in range(0, len(X), CHUNK):
+            Xc = X[start:start + CHUNK]
+            flat = Xc.ravel()
+            offset = np.arange(len(Xc)) * self.n_features
+            # (trees, rows): each level works on a contiguous prefix of trees.
+            node = np.empty((len(self.roots), len(Xc)), dtype=np.intp)
+            node[:] = self.roots[:, None]
+            for count in self.level_counts:
+                active = node[:count]
+                rec = self.nodes[active]
+                x = flat[rec["feature"] + offset]
+                go_right = x >= rec["threshold"]
+                if missing:
+                    go_right |= np.isnan(x) & ~self.default_left[active]
+                np.add(rec["child"], go_right, out=active)
+            out[start:start + len(Xc)] = self.value[node].T @ self.onehot
+        out += self.base_margin
+        return out
+
+    def inplace_predict(self, X):
+        m = self.margin(X)
+        if self.objective == "multi:softprob":
+            m -= m.max(axis=1, keepdims=True)
+            np.exp(m, out=m)
+            m /= m.sum(axis=1, keepdims=True)
+            return m
+        if self.objective == "binary:logistic":
+            p = 1.0 / (1.0 + np.exp(-m[:, 0]))
+            return np.stack([1.0 - p, p], axis=1)
+        return m[:, 0]
+
+
+# --- Compiling ---
+def compile_booster(booster):
+    """Flat node arrays for an xgboost Booster (tree models only)."""
+    model = json.loads(booster.save_raw("json"))["learner"]
+    objective = model["objective"]["name"]
+    params = model["learner_model_param"]
+    gbm = model["gradient_booster"]
+    if gbm.get("name") != "gbtree":
+        raise ValueError(f"unsupported booster {gbm.get('name')}")
+    if objective not in OBJECTIVES:
+        raise ValueError(f"unsupported objective {objective}")
+    trees_model = gbm["model"]
+    n_classes = max(1, int(params.get("num_class", "0")))
+    base = [float(v) for v in params["base_score"].strip("[]").split(",")]
+    base = np.resize(np.asarray(base, dtype=np.float64), n_classes)
+    if objective == "binary:logistic":
+        base = np.log(base / (1.0 - base))
+
+    feature, threshold, child, default_left, value, roots, depth = [], [], [], [], [], [], []
+    for tree in trees_model["trees"]:
+        if any(tree.get("split_type", [])):
+            raise ValueError("categorical splits are not supported")
+        left, right = tree["left_children"], tree["right_children"]
+        cond, index, dleft = tree["split_conditions"], tree["split_indices"], tree["default_left"]
+        # Breadth-first renumbering; siblings get consecutive slots.
+        base_id = len(feature)
+        order, new_id = [0], {0: base_id}
+        levels = {0: 0}
+        for old in order:
+            if left[old] != -1:
+                for c in (left[old], right[old]):
+                    new_id[c] = base_id + len(order)
+                    levels[c] = levels[old] + 1
+                    order.append(c)
+        for old in order:
+            nid = new_id[old]
+            if left[old] == -1:
+                feature.append(0)
+                threshold.append(np.inf)
+                child.append(nid)
+                default_left.append(True)
+                value.append(cond[old])
+            else:
+                feature.append(index[old])
+                threshold.append(cond[old])
+                child.append(new_id[left[old]])
+                default_left.append(bool(dleft[old]))
+                value.append(0.0)
+        roots.append(base_id)
+        depth.append(max(levels.values()))
+
+    tree_class = np.asarray(trees_model["tree_info"], dtype=np.int16)
+    if n_classes == 1:
+        tree_class[:] = 0
+    return {
+        "feature": np.asarray(feature, dtype=np.int16),
+        "threshold": np.asarray(threshold, dtype=np.float32),
+        "child": np.asarray(child, dtype=np.int32),
+        "default_left": np.asarray(default_left, dtype=bool),
+        "value": np.asarray(value, dtype=np.float32),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_class": tree_class,
+        "base_margin": base.astype(np.float32),
+        "tree_depth": np.asarray(depth, dtype=np.int8),
+        "objective": np.str_(objective),
+        "n_features": np.int32(int(params["num_feature"])),
+    }
+
+
+def save(path, mean, scale, heads):
+    """Write scaler + heads ({name: compile_booster() dict, or the name of an identical head})."""
+    arrays = {"scaler.mean": np.asarray(mean, dtype=np.float64),
+              "scaler.scale": np.asarray(scale, dtype=np.float64)}
+    for name, head in heads.items():
+        if isinstance(head, str):
+            arrays[f"{name}.same_as"] = np.str_(head)
+        else:
+            arrays.update((f"{name}.{key}", value) for key, value in head.items())
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+# --- Loading ---
+def load_arrays(path, mmap=True):
+    """Members of an uncompressed .npz, memory-mapped where possible."""
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                with zf.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, fortran, dtype = read_header(f)
+            if not shape or dtype.hasobject:
+                f.seek(info.header_offset + 30 + name_len + extra_len)
+                arrays[name] = np.lib.format.read_array(f)[()]
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran else "C")
+    return arrays
+
+
+def load(path, mmap=True):
+    """(mean, scale, emotion forest, activity forest); identical heads share one forest."""
+    arrays = load_arrays(path, mmap)
+    forests = {}
+    for name in HEADS:
+        alias = arrays.get(f"{name}.same_as")
+        forests[name] = forests[str(alias)] if alias is not None else CompiledForest(arrays, f"{name}.")
+    return arrays["scaler.mean"], arrays["scaler.scale"], forests["emotion"], forests["activity"]
+
+
+# --- CLI ---
+def main(argv=None):
+    from emotion_core.inference import COMPILED_FILE, MODEL_DIR
+
+    parser = argparse.ArgumentParser(description="Compile the XGBoost pickles to a NumPy .npz.")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--out", help=f"default: <model-dir>/{COMPILED_FILE}")
+    parser.add_argument("--check-rows", type=int, default=20000, help="random rows compared against xgboost")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="max allowed probability difference")
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    path = lambda name: os.path.join(args.model_dir, name)
+    out = args.out or path(COMPILED_FILE)
+    scaler = joblib.load(path("scaler.pkl"))
+    boosters = {name: joblib.load(path(f"{name}_xgb.pkl")).get_booster() for name in HEADS}
+    heads = {"emotion": compile_booster(boosters["emotion"])}
+    if boosters["activity"].save_raw() == boosters["emotion"].save_raw():
+        heads["activity"] = "emotion"
+    else:
+        heads["activity"] = compile_booster(boosters["activity"])
+    # Built next to `out` and only moved over it once it matches xgboost.
+    staged = out + ".new.npz"
+    save(staged, scaler.mean_, scaler.scale_, heads)
+
+    # Scaled rows around the training distribution, plus a few missing values.
+    rng = np.random.default_rng(0)
+    X = rng.normal(scale=2.0, size=(args.check_rows, len(scaler.mean_))).astype(np.float32)
+    X[rng.random(X.shape) < 0.01] = np.nan
+    mean, scale, *forests = load(staged)
+    worst = 0.0
+    for name, forest in zip(HEADS, forests):
+        expected = boosters[name].inplace_predict(X)
+        got = forest.inplace_predict(X)
+        diff = float(np.abs(expected - got).max())
+        agree = float((expected.argmax(1) == got.argmax(1)).mean())
+        worst = max(worst, diff)
+        print(f"[INFO] {name}: {len(forest.roots)} trees (+ constants), {len(forest.value)} nodes, "
+              f"depth {len(forest.level_counts)}; "
+              f"max |p - xgboost| = {diff:.2e}, label agreement {agree:.4%}")
+    del mean, scale, forests
+    if worst > args.tolerance:
+        os.remove(staged)
+        print(f"[WARN] Compiled model differs from xgboost by {worst:.2e} (> {args.tolerance:g}); "
+              f"{out} left unchanged")
+        return 1
+    os.replace(staged, out)
+    print(f"[INFO] Wrote {out} ({os.path.getsize(out) / 1024:.0f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Headless monitoring daemon: analyzer + HTTP API, no GUI imports.
+
+    python -m emotion_core.daemon [--host 127.0.0.1] [--port 8080] [--interval 15] [--log-dir logs]
+                                  [--classifier heuristic] [--shadow xgboost,random]
+                                  [--collector http://team-host:9090 [--agent-id NAME]]
+
+Runs on the asyncio runtime, serving /api/stats, /api/stream, /api/history,
+/api/summary, /api/series, /api/classifiers and /metrics. The port opens
+first and answers with the boot snapshot. The first analyzer job then
+imports numpy, starts input capture, loads the rollups, the history tiers
+and the models. Before the first response only the
+standard library and the light core modules (runtime, snapshot, stream,
+metrics, logwriter, schema) are loaded, so startup is not spent importing
+numpy, xgboost or AppKit.
+
+With --collector, every tick is also queued for a team collector (see
+agent.py and collector.py).
+"""
+import argparse
+import datetime
+import os
+import signal
+import sys
+import threading
+from functools import partial
+
+from emotion_core import metrics
+from emotion_core.logwriter import LogWriter
+from emotion_core.runtime import Runtime
+from emotion_core.schema import ACTIVITY_CODES, EMOTION_CODES, UNKNOWN
+from emotion_core.snapshot import SnapshotPublisher
+from emotion_core.stream import broadcaster
+
+ACTIVITY_HEADER = "timestamp,kpm,mouse_px,clicks,emotion,activity\n"
+
+
+class Daemon:
+    def __init__(self, host="127.0.0.1", port=8080, interval=15.0, log_dir="logs", capture_source=None,
+                 classifier="heuristic", shadows=(), collector=None, agent_id=None):
+        self.log_dir = log_dir
+        self.collector = collector, agent_id
+        self.classifier_names = classifier, tuple(shadows)
+        self.capture_source = capture_source      # InputCapture source factory; None = pynput
+        self.stats = {
+            "emotion": "Initializing", "confidence": 0, "activity": "Idle",
+            "kpm": 0, "mouse": 0, "clicks": 0,
+            "timestamp": datetime.datetime.now().strftime("%H:%M:%S"),
+        }
+        self.snapshots = SnapshotPublisher(self.stats)
+        self.runtime = Runtime(self.snapshots, host, port, log_dir)
+        self.runtime.every(interval, self.analyze, name="daemon")
+        self.interval = interval
+        self.ready = threading.Event()            # set after the first classified tick
+        self.capture = self.classifier = None
+        self.session_log = self.activity_log = None
+        self.rollups = self.history = None
+        self.agent = None
+
+    def start(self):
+        self.runtime.start()
+
+    def stop(self):
+        self.runtime.stop()
+        for log in (self.session_log, self.activity_log):
+            if log is not None:
+                log.close()
+        if self.rollups is not None:
+            self.rollups.save_if_dirty(self.rollup_path)
+        if self.history is not None:
+            self.history.save_if_dirty(self.history_path)
+        if self.classifier is not None:
+            self.classifier.close()
+            self.classifier.save_if_dirty(self.shadow_path)
+        if self.agent is not None:
+            self.agent.flush()          # last batch, unless the collector is known to be down
+            self.agent.close()
+
+    @property
+    def address(self):
+        return self.runtime.host, self.runtime.port
+
+    # --- Analyzer job ---
+    def setup(self):
+        # Heavy imports happen here, after the HTTP server is already answering.
+        from emotion_core.capture import InputCapture, PynputSource
+        from emotion_core import classifiers, history
+        from emotion_core.rollup import MAX_GAP, ROLLUP_FILE, SAVE_INTERVAL, Rollups
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.rollup_path = os.path.join(self.log_dir, ROLLUP_FILE)
+        self.rollups = Rollups.load(self.rollup_path, max_gap=max(MAX_GAP, 2 * self.interval))
+        self.runtime.rollups = self.rollups
+        self.runtime.every(SAVE_INTERVAL, partial(self.rollups.save_if_dirty, self.rollup_path), name="rollups")
+        self.history_path = os.path.join(self.log_dir, history.HISTORY_FILE)
+        self.history = history.HistoryStore.load(self.history_path)
+        self.runtime.history = self.history
+        self.runtime.every(history.SAVE_INTERVAL, partial(self.history.save_if_dirty, self.history_path),
+                           name="history")
+        self.session_log = LogWriter(os.path.join(self.log_dir, "session_log.txt"))
+        self.activity_log = LogWriter(os.path.join(self.log_dir, "activity_log.csv"), header=ACTIVITY_HEADER)
+        self.capture = InputCapture(self.capture_source or PynputSource)
+        self.capture.start()
+        primary, shadows = self.classifier_names
+        self.shadow_path = os.path.join(self.log_dir, classifiers.SHADOW_FILE)
+        self.classifier = classifiers.ShadowHarness.from_names(primary, shadows).load(self.shadow_path)
+        self.classifier.warm()      # load models now rather than inside the first tick
+        self.runtime.classifiers = self.classifier
+        self.runtime.every(classifiers.SAVE_INTERVAL, partial(self.classifier.save_if_dirty, self.shadow_path),
+                           name="classifiers")
+        url, agent_id = self.collector
+        if url:
+            from emotion_core.agent import BATCH_INTERVAL, Agent
+
+            self.agent = Agent(url, agent_id, interval=self.interval)
+            self.runtime.every(BATCH_INTERVAL, self.agent.flush, name="collector")
+
+    def analyze(self):
+        """First run loads everything; later runs classify one window each."""
+        if self.capture is None:
+            self.setup()
+            return
+        with metrics.TICK.time():
+            self.tick()
+        self.ready.set()
+
+    def tick(self):
+        """Sample, classify, publish and log one window."""
+        w, x = self.capture.sample()
+        k, m, cl = w["kpm"], w["mouse"], w["clicks"]
+        e, c, a = self.classifier.classify(w, x)
+        now = datetime.datetime.now()
+        ts = now.strftime("%H:%M:%S")
+        self.stats = stats = {"emotion": e, "confidence": c, "activity": a,
+                              "kpm": k, "mouse": m, "clicks": cl, "timestamp": ts}
+        broadcaster.publish(self.snapshots.publish(stats).body)
+        line = f"[{ts}] {e} ({c}%) | KPM={k} | Mouse={m} | Clicks={cl}\n"
+        self.session_log.write(line)
+        self.activity_log.write(f"{now.isoformat()},{k},{m},{cl},{e},{a}\n")
+        codes = EMOTION_CODES.get(e, UNKNOWN), ACTIVITY_CODES.get(a, UNKNOWN)
+        self.rollups.add(now.timestamp(), k, m, cl, codes[0], c, codes[1])
+        self.history.append(now.timestamp(), k, m, cl, codes[0], c, codes[1])
+        if self.agent is not None:
+            self.agent.add(now.timestamp(), k, m, cl, codes[0], c, codes[1])
+        print(line.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Emotion Monitor: analyzer + HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--interval", type=float, default=15.0, help="seconds between analyzer ticks")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--classifier", default="heuristic", help="engine whose labels are shown and logged")
+    parser.add_argument("--shadow", default="xgboost", type=lambda s: [n for n in s.split(",") if n],
+                        help="comma-separated engines scored alongside in the background ('' for none)")
+    parser.add_argument("--collector", help="team collector URL to report every tick to")
+    parser.add_argument("--agent-id", help="name shown by the collector (default: host name)")
+    args = parser.parse_args(argv)
+
+    daemon = Daemon(args.host, args.port, args.interval, args.log_dir,
+                    classifier=args.classifier, shadows=args.shadow,
+                    collector=args.collector, agent_id=args.agent_id)
+    daemon.start()
+    host, port = daemon.address
+    print(f"[INFO] Emotion Monitor daemon serving http://{host}:{port}")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        threading.Event().wait()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        print("[INFO] Shutting down.")
+        daemon.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Streaming feature stage between input capture and the classifier.
+
+Per-key work is O(1): one Welford update of the inter-key-interval (IKI)
+window, one histogram bin increment and a burst-run check. Windows are
+rings of fixed-width time buckets holding Welford aggregates. Expiring a
+bucket subtracts its aggregate from the window total (Chan's formula run
+backwards), so a tick costs the same whatever the window length, and no raw
+events are kept.
+
+`tick()` fills a float64 vector in schema.FEATURE_NAMES order.
+"""
+import bisect
+import math
+import threading
+import time
+
+import numpy as np
+
+from emotion_core.schema import FEATURE_NAMES, N_FEATURES
+
+IKI_WINDOW = 60.0          # seconds of keystrokes behind iki_* and burst_count
+KPM_WINDOW = 300.0         # seconds of ticks behind kpm_mean / kpm_std
+IKI_MAX = 2.0              # longer gaps are pauses, not inter-key intervals
+BURST_IKI = 0.15           # keys closer than this belong to one burst
+BURST_MIN_KEYS = 5
+IKI_EDGES_MS = (50, 100, 150, 200, 300, 500, 750, 1000, 1500)   # histogram bin edges
+
+
+class SlidingWindow:
+    """Count / mean / variance (and optional histogram) over the last `window` seconds."""
+
+    __slots__ = ("bucket", "size", "cur", "keys", "n", "mean", "m2", "hist",
+                 "tn", "tmean", "tm2", "thist")
+
+    def __init__(self, window, bucket=1.0, nbins=0):
+        self.bucket = bucket
+        self.size = max(1, int(math.ceil(window / bucket)))
+        self.cur = None
+        self.keys = [None] * self.size
+        self.n = [0] * self.size
+        self.mean = [0.0] * self.size
+        self.m2 = [0.0] * self.size
+        self.hist = [[0] * nbins for _ in range(self.size)] if nbins else None
+        self.tn = 0
+        self.tmean = 0.0
+        self.tm2 = 0.0
+        self.thist = [0] * nbins
+
+    def _advance(self, key):
+        if self.cur is not None and key <= self.cur:
+            return
+        start = key - self.size + 1 if self.cur is None else max(self.cur + 1, key - self.size + 1)
+        for k in range(start, key + 1):
+            self._expire(k % self.size)
+            self.keys[k % self.size] = k
+        self.cur = key
+
+    def _expire(self, slot):
+        nb = self.n[slot]
+        if nb:
+            n = self.tn - nb
+            if n <= 0:
+                self.tn, self.tmean, self.tm2 = 0, 0.0, 0.0
+            else:
+                mb = self.mean[slot]
+                mean = (self.tn * self.tmean - nb * mb) / n
+                d = mb - mean
+                self.tm2 = max(0.0, self.tm2 - self.m2[slot] - d * d * n * nb / self.tn)
+                self.tn, self.tmean = n, mean
+            if self.hist is not None:
+                h = self.hist[slot]
+                for i, c in enumerate(h):
+                    if c:
+                        self.thist[i] -= c
+                        h[i] = 0
+        self.n[slot], self.mean[slot], self.m2[slot] = 0, 0.0, 0.0
+
+    def add(self, t, x, b=None):
+        """Add observation x at time t (and count it in histogram bin b)."""
+        key = int(t // self.bucket)
+        self._advance(key)
+        slot = key % self.size
+        # Welford, once for the bucket and once for the window total.
+        n = self.n[slot] + 1
+        d = x - self.mean[slot]
+        self.mean[slot] += d / n
+        self.m2[slot] += d * (x - self.mean[slot])
+        self.n[slot] = n
+        self.tn += 1
+        d = x - self.tmean
+        self.tmean += d / self.tn
+        self.tm2 += d * (x - self.tmean)
+        if b is not None:
+            self.hist[slot][b] += 1
+            self.thist[b] += 1
+
+    def stats(self, now):
+        """(count, mean, std) of the window ending at `now`."""
+        self._advance(int(now // self.bucket))
+        if not self.tn:
+            return 0, 0.0, 0.0
+        return self.tn, self.tmean, math.sqrt(self.tm2 / self.tn)
+
+    def histogram(self, now):
+        self._advance(int(now // self.bucket))
+        return list(self.thist)
+
+
+class FeatureExtractor:
+    """Receives key events from capture.Counters and emits one vector per tick."""
+
+    def __init__(self, iki_window=IKI_WINDOW, kpm_window=KPM_WINDOW, clock=time.monotonic):
+        self.clock = clock
+        self.iki = SlidingWindow(iki_window, 1.0, nbins=len(IKI_EDGES_MS) + 1)
+        self.bursts = SlidingWindow(iki_window, 1.0)
+        self.kpm = SlidingWindow(kpm_window, max(1.0, kpm_window / 60))
+        self.last_key = None
+        self.last_input = clock()
+        self.run = 0
+        self.vector = np.zeros(N_FEATURES, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    # --- Event side (listener threads) ---
+    def on_key(self, t):
+        with self._lock:
+            last = self.last_key
+            self.last_key = self.last_input = t
+            if last is None:
+                return
+            gap = t - last
+            if gap > IKI_MAX:
+                self.run = 0
+                return
+            ms = gap * 1000.0
+            self.iki.add(t, ms, bisect.bisect_right(IKI_EDGES_MS, ms))
+            if gap < BURST_IKI:
+                self.run += 1
+                if self.run == BURST_MIN_KEYS - 1:
+                    self.bursts.add(t, 1.0)
+            else:
+                self.run = 0
+
+    def on_input(self, t):
+        self.last_input = t
+
+    # --- Tick side (analyzer thread) ---
+    def tick(self, window, now=None):
+        """Feature vector for this tick; the array is reused, copy it to keep it."""
+        now = self.clock() if now is None else now
+        if window["mouse"] or window["clicks"]:
+            self.last_input = max(self.last_input, now)
+        with self._lock:
+            self.kpm.add(now, float(window["kpm"]))
+            _, kpm_mean, kpm_std = self.kpm.stats(now)
+            _, iki_mean, iki_std = self.iki.stats(now)
+            bursts = self.bursts.stats(now)[0]
+            idle = max(0.0, now - self.last_input)
+        v = self.vector
+        v[:] = (window["kpm"], window["mouse"], window["clicks"], kpm_mean, kpm_std,
+                iki_mean, iki_std, bursts, idle)
+        return v
+
+    def iki_histogram(self, now=None):
+        """Counts per IKI bin over the window; bin i covers IKI_EDGES_MS[i-1]..[i]."""
+        with self._lock:
+            return self.iki.histogram(self.clock() if now is None else now)
+
+    def named(self, vector=None):
+        v = self.vector if vector is None else vector
+        return dict(zip(FEATURE_NAMES, v.tolist()))
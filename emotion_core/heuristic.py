@@ -0,0 +1,97 @@
+"""
+Array form of the v7 `detect_emotion` heuristic.
+
+Takes whole columns of kpm / mouse / clicks and returns label codes, emojis
+and confidences in one call, e.g. to re-score logs/activity_log.csv. Labels
+and confidences match the scalar version row for row; the adaptive baseline
+is the same EMA that `EmotionApp.loop` applies before each detection.
+`activity()` labels the same windows from the counts alone.
+"""
+from itertools import accumulate
+
+import numpy as np
+
+from emotion_core.schema import ACTIVITY_CODES, EMOTIONS, EMOTION_CODES, EMOTION_EMOJI
+
+DEFAULT_BASELINE = {"kpm": 180, "mouse": 9000, "clicks": 20}
+EMA_ALPHA = 0.1
+WORKING_KPM = 60             # sustained typing
+ACTIVE_MOUSE = 3000          # pointer work without much typing
+ACTIVE_CLICKS = 10
+IDLE_MOUSE = 100             # below this, mouse movement is jitter
+
+_EMOJI = np.array([EMOTION_EMOJI[name] for name in EMOTIONS])
+
+
+def ema(x, start, alpha=EMA_ALPHA):
+    """
+    Running EMA b[t] = (1 - alpha) * b[t-1] + alpha * x[t], seeded with `start`.
+
+    Evaluated step by step with the loop's own float operations, so a
+    confidence truncated from it matches the scalar loop exactly. A
+    closed-form cumsum scan drifts by a few ulps, which flips int() on
+    constant or idle runs.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    decay = 1.0 - alpha
+    steps = accumulate(x.tolist(), lambda b, v: b * decay + v * alpha, initial=float(start))
+    return np.fromiter(steps, dtype=np.float64, count=len(x) + 1)[1:]
+
+
+def classify(kpm, mouse):
+    """Emotion codes for each row; same branch order as detect_emotion."""
+    kpm = np.asarray(kpm)
+    mouse = np.asarray(mouse)
+    codes = np.full(kpm.shape, EMOTION_CODES["Normal"], dtype=np.int8)
+    focused = (kpm > 160) & (kpm < 230) & (mouse > 7000) & (mouse < 11000)
+    tired = (kpm < 120) & (mouse < 5000)
+    stressed = (kpm > 240) | (mouse > 14000)
+    # Later assignments win, so apply in reverse of the scalar if/elif chain.
+    codes[focused] = EMOTION_CODES["Focused"]
+    codes[tired] = EMOTION_CODES["Tired"]
+    codes[stressed] = EMOTION_CODES["Stressed"]
+    return codes
+
+
+def activity(kpm, mouse, clicks):
+    """Activity codes for each row: Idle, Working (typing), Active (pointer), else Calm."""
+    kpm, mouse, clicks = np.asarray(kpm), np.asarray(mouse), np.asarray(clicks)
+    codes = np.full(kpm.shape, ACTIVITY_CODES["Calm"], dtype=np.int8)
+    codes[(mouse > ACTIVE_MOUSE) | (clicks > ACTIVE_CLICKS)] = ACTIVITY_CODES["Active"]
+    codes[kpm >= WORKING_KPM] = ACTIVITY_CODES["Working"]
+    codes[(kpm == 0) & (mouse < IDLE_MOUSE) & (clicks == 0)] = ACTIVITY_CODES["Idle"]
+    return codes
+
+
+def confidence(kpm, baseline_kpm):
+    conf = np.trunc(90 - np.abs(np.asarray(kpm) - baseline_kpm) / 3)
+    return np.clip(conf, 60, 99).astype(np.int8)
+
+
+def detect_emotion_batch(kpm, mouse, clicks, baseline=None, adaptive=True):
+    """
+    Vectorized detect_emotion over columns.
+
+    With adaptive=True the baseline follows the loop's EMA, so row t is
+    scored against the baseline after rows 0..t. Returns
+    (codes, emojis, confidences, final_baseline).
+    """
+    baseline = dict(DEFAULT_BASELINE if baseline is None else baseline)
+    kpm = np.asarray(kpm, dtype=np.float64)
+    columns = {"kpm": kpm, "mouse": np.asarray(mouse, dtype=np.float64),
+               "clicks": np.asarray(clicks, dtype=np.float64)}
+    if adaptive and len(kpm):
+        base_kpm = ema(kpm, baseline["kpm"])
+        baseline["kpm"] = float(base_kpm[-1])
+        for k in ("mouse", "clicks"):
+            baseline[k] = float(ema(columns[k], baseline[k])[-1])
+    else:
+        base_kpm = baseline["kpm"]
+    codes = classify(columns["kpm"], columns["mouse"])
+    return codes, _EMOJI[codes], confidence(kpm, base_kpm), baseline
+
+
+def read_counts(path):
+    """kpm, mouse_px and clicks columns of an activity_log.csv file."""
+    data = np.loadtxt(path, delimiter=",", skiprows=1, usecols=(1, 2, 3), ndmin=2)
+    return data[:, 0], data[:, 1], data[:, 2]
@@ -0,0 +1,342 @@
+"""
+Multi-resolution live history.
+
+Samples go into preallocated NumPy ring buffers (one array per field) and
+are rolled up into 1-minute, 1-hour and 1-day tiers as buckets close. Every
+tier has a fixed capacity, so memory stays flat however long the app runs.
+Range queries return array views (or one concatenation when the range wraps
+the ring), never per-sample dicts.
+
+`save()` / `load()` keep the tiers, and the buckets still open, in a small
+binary snapshot (temp file + fsync + rename, as in baseline.py), so
+long-range charts survive a restart.
+"""
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from emotion_core.schema import ACTIVITIES, EMOTIONS, UNKNOWN, activity_name, emotion_name
+
+# (name, bucket width in seconds, capacity)
+TIERS = (
+    ("raw", 0, 4096),        # ~5.7 h at a 5 s tick
+    ("1m", 60, 7 * 1440),    # 1 week
+    ("1h", 3600, 90 * 24),   # 90 days
+    ("1d", 86400, 3660),     # 10 years
+)
+
+Series = namedtuple("Series", "tier t kpm mouse clicks emotion activity confidence n")
+
+HISTORY_FILE = "history.bin"
+SAVE_INTERVAL = 300.0
+MAGIC = b"EMH1"
+_HEADER = struct.Struct("<4sHHHq")          # magic, tiers, emotions, activities, utc offset at save
+_TIER = struct.Struct("<qqq")               # width, capacity, size
+_BUCKET = struct.Struct(f"<?qq4d{len(EMOTIONS)}q{len(ACTIVITIES)}q")
+
+
+class Ring:
+    """Fixed-capacity struct-of-arrays ring, ordered by time."""
+
+    __slots__ = ("capacity", "start", "size", "t", "kpm", "mouse", "clicks",
+                 "emotion", "activity", "confidence", "n")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.t = np.zeros(capacity, dtype=np.float64)
+        self.kpm = np.zeros(capacity, dtype=np.float32)
+        self.mouse = np.zeros(capacity, dtype=np.float32)
+        self.clicks = np.zeros(capacity, dtype=np.float32)
+        self.emotion = np.full(capacity, UNKNOWN, dtype=np.int8)
+        self.activity = np.full(capacity, UNKNOWN, dtype=np.int8)
+        self.confidence = np.zeros(capacity, dtype=np.int8)
+        self.n = np.zeros(capacity, dtype=np.int32)
+
+    def push(self, t, kpm, mouse, clicks, emotion, activity, confidence, n=1):
+        i = self.start + self.size
+        if i >= self.capacity:
+            i -= self.capacity
+        if self.size == self.capacity:
+            self.start = i + 1 if i + 1 < self.capacity else 0
+        else:
+            self.size += 1
+        self.t[i] = t
+        self.kpm[i] = kpm
+        self.mouse[i] = mouse
+        self.clicks[i] = clicks
+        self.emotion[i] = emotion
+        self.activity[i] = activity
+        self.confidence[i] = confidence
+        self.n[i] = n
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, f).nbytes for f in Series._fields[1:])
+
+    def oldest(self):
+        return self.t[self.start] if self.size else None
+
+    def to_bytes(self):
+        """Used samples, oldest first, one field after another."""
+        ranges = self._segments() if self.size else ()
+        return b"".join(getattr(self, f)[a:b].tobytes() for f in Series._fields[1:] for a, b in ranges)
+
+    def fill(self, data, offset, size):
+        """Load `size` samples written by to_bytes(); returns the offset after them."""
+        self.start, self.size = 0, size
+        for f in Series._fields[1:]:
+            arr = getattr(self, f)
+            arr[:size] = np.frombuffer(data, arr.dtype, size, offset)
+            offset += size * arr.itemsize
+        return offset
+
+    def _segments(self):
+        end = self.start + self.size
+        if end <= self.capacity:
+            return ((self.start, end),)
+        return (self.start, self.capacity), (0, end - self.capacity)
+
+    def select(self, t0, t1):
+        """Index ranges [a, b) of samples with t0 <= t < t1, oldest first."""
+        out = []
+        for a, b in self._segments():
+            t = self.t[a:b]
+            lo = a + int(np.searchsorted(t, t0, side="left"))
+            hi = a + int(np.searchsorted(t, t1, side="left"))
+            if hi > lo:
+                out.append((lo, hi))
+        return out
+
+    def tail_ranges(self, count):
+        count = min(count, self.size)
+        out = []
+        for a, b in reversed(self._segments()):
+            take = min(count, b - a)
+            if take:
+                out.append((b - take, b))
+                count -= take
+        return out[::-1]
+
+    def gather(self, tier, ranges):
+        fields = Series._fields[1:]
+        if len(ranges) == 1:
+            a, b = ranges[0]
+            return Series(tier, *(getattr(self, f)[a:b] for f in fields))
+        if not ranges:
+            return Series(tier, *(getattr(self, f)[:0] for f in fields))
+        return Series(tier, *(np.concatenate([getattr(self, f)[a:b] for a, b in ranges]) for f in fields))
+
+
+class _Bucket:
+    """Running aggregate for one open rollup bucket."""
+
+    __slots__ = ("key", "n", "kpm", "mouse", "clicks", "conf", "votes_e", "votes_a")
+
+    def __init__(self, key):
+        self.key = key
+        self.n = 0
+        self.kpm = self.mouse = self.clicks = self.conf = 0.0
+        self.votes_e = [0] * len(EMOTIONS)
+        self.votes_a = [0] * len(ACTIVITIES)
+
+    def fold(self, n, kpm, mouse, clicks, conf, votes_e, votes_a):
+        self.n += n
+        self.kpm += kpm * n
+        self.mouse += mouse * n
+        self.clicks += clicks * n
+        self.conf += conf * n
+        for i, v in votes_e:
+            self.votes_e[i] += v
+        for i, v in votes_a:
+            self.votes_a[i] += v
+
+    def votes(self):
+        return ([(i, v) for i, v in enumerate(self.votes_e) if v],
+                [(i, v) for i, v in enumerate(self.votes_a) if v])
+
+
+def _mode(votes):
+    best = max(range(len(votes)), key=votes.__getitem__)
+    return best if votes[best] else UNKNOWN
+
+
+class HistoryStore:
+    """Raw samples plus automatic 1m / 1h / 1d rollups."""
+
+    def __init__(self, tiers=TIERS, utc_offset=None):
+        self.tiers = tuple(name for name, _, _ in tiers)
+        self.widths = tuple(width for _, width, _ in tiers)
+        self.rings = tuple(Ring(capacity) for _, _, capacity in tiers)
+        self._open = [None] * len(tiers)
+        # Buckets are aligned to local midnight rather than UTC. None follows
+        # the local offset tick by tick, so DST changes move the boundaries.
+        self.utc_offset = utc_offset
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return sum(r.nbytes for r in self.rings)
+
+    def __len__(self):
+        return self.rings[0].size
+
+    def _offset(self, t):
+        return time.localtime(t).tm_gmtoff if self.utc_offset is None else self.utc_offset
+
+    def _start(self, key, width):
+        """UTC start of local bucket `key`."""
+        local = key * width
+        if self.utc_offset is not None:
+            return local - self.utc_offset
+        return local - time.localtime(local - time.localtime(local).tm_gmtoff).tm_gmtoff
+
+    # --- Writing ---
+    def append(self, t, kpm, mouse, clicks, emotion, confidence, activity=UNKNOWN):
+        """Record one tick; emotion/activity are schema codes."""
+        with self._lock:
+            self.rings[0].push(t, kpm, mouse, clicks, emotion, activity, confidence)
+            votes_e = ((emotion, 1),) if emotion >= 0 else ()
+            votes_a = ((activity, 1),) if activity >= 0 else ()
+            self._roll(1, t, self._offset(t), 1, kpm, mouse, clicks, confidence, votes_e, votes_a)
+            self.dirty = True
+
+    def _roll(self, level, t, offset, n, kpm, mouse, clicks, conf, votes_e, votes_a):
+        if level >= len(self.rings):
+            return
+        width = self.widths[level]
+        key = int((t + offset) // width)
+        bucket = self._open[level]
+        if bucket is not None and bucket.key != key:
+            self._close(level, bucket)
+            bucket = None
+        if bucket is None:
+            bucket = self._open[level] = _Bucket(key)
+        bucket.fold(n, kpm, mouse, clicks, conf, votes_e, votes_a)
+
+    def _close(self, level, b):
+        t = self._start(b.key, self.widths[level])
+        kpm, mouse, clicks, conf = b.kpm / b.n, b.mouse / b.n, b.clicks / b.n, b.conf / b.n
+        self.rings[level].push(t, kpm, mouse, clicks, _mode(b.votes_e), _mode(b.votes_a), round(conf), b.n)
+        # The parent bucket is keyed in the same local time as this one.
+        self._roll(level + 1, t, b.key * self.widths[level] - t, b.n, kpm, mouse, clicks, conf, *b.votes())
+
+    # --- Reading ---
+    def tier_for(self, t0, t1=None, max_points=None):
+        """Finest tier that still covers t0 (and fits max_points, if given)."""
+        for level, ring in enumerate(self.rings):
+            oldest = ring.oldest()
+            # A ring that has never wrapped holds everything since the store began.
+            if oldest is None or (oldest > t0 and ring.size == ring.capacity):
+                continue
+            if max_points and t1 is not None and level + 1 < len(self.rings):
+                # Count what is actually there: idle hours leave no samples behind.
+                if sum(hi - lo for lo, hi in ring.select(t0, t1)) > max_points:
+                    continue
+            return level
+        # Nothing reaches back that far; serve the coarsest tier that has data.
+        for level in range(len(self.rings) - 1, -1, -1):
+            if self.rings[level].size:
+                return level
+        return 0
+
+    def range(self, t0, t1, tier=None, max_points=None):
+        """Samples with t0 <= t < t1 as a Series of arrays."""
+        with self._lock:
+            level = self.tiers.index(tier) if tier else self.tier_for(t0, t1, max_points)
+            ring = self.rings[level]
+            return ring.gather(self.tiers[level], ring.select(t0, t1))
+
+    def tail(self, count, tier="raw"):
+        with self._lock:
+            ring = self.rings[self.tiers.index(tier)]
+            return ring.gather(tier, ring.tail_ranges(count))
+
+    def latest(self):
+        """Most recent raw sample as a dict, or None before the first tick."""
+        s = self.tail(1)
+        if not len(s.t):
+            return None
+        return {
+            "time": float(s.t[0]),
+            "emotion": emotion_name(int(s.emotion[0])),
+            "activity": activity_name(int(s.activity[0])),
+            "confidence": int(s.confidence[0]),
+            "kpm": int(s.kpm[0]),
+            "mouse": int(s.mouse[0]),
+            "clicks": int(s.clicks[0]),
+        }
+
+    # --- Persistence ---
+    def to_bytes(self):
+        with self._lock:
+            parts = [_HEADER.pack(MAGIC, len(self.rings), len(EMOTIONS), len(ACTIVITIES), self._offset(time.time()))]
+            for width, ring, b in zip(self.widths, self.rings, self._open):
+                parts.append(_TIER.pack(width, ring.capacity, ring.size))
+                parts.append(ring.to_bytes())
+                if b is None:
+                    parts.append(_BUCKET.pack(False, 0, 0, 0.0, 0.0, 0.0, 0.0,
+                                              *[0] * (len(EMOTIONS) + len(ACTIVITIES))))
+                else:
+                    parts.append(_BUCKET.pack(True, b.key, b.n, b.kpm, b.mouse, b.clicks, b.conf,
+                                              *b.votes_e, *b.votes_a))
+            return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, tiers=TIERS, utc_offset=None):
+        # The header's offset is only the one in force at save time.
+        magic, n_tiers, n_e, n_a, _ = _HEADER.unpack_from(data)
+        if magic != MAGIC or (n_tiers, n_e, n_a) != (len(tiers), len(EMOTIONS), len(ACTIVITIES)):
+            raise ValueError("not a history snapshot")
+        store = cls(tiers, utc_offset)
+        off = _HEADER.size
+        for level, ring in enumerate(store.rings):
+            width, capacity, size = _TIER.unpack_from(data, off)
+            if (width, capacity) != (store.widths[level], ring.capacity):
+                raise ValueError("history snapshot has different tiers")
+            off = ring.fill(data, off + _TIER.size, size)
+            fields = _BUCKET.unpack_from(data, off)
+            off += _BUCKET.size
+            if fields[0]:
+                b = store._open[level] = _Bucket(fields[1])
+                b.n, b.kpm, b.mouse, b.clicks, b.conf = fields[2:7]
+                b.votes_e = list(fields[7:7 + n_e])
+                b.votes_a = list(fields[7 + n_e:])
+        return store
+
+    def save(self, path):
+        """Atomic write: readers see the old snapshot or the new one, never a torn file."""
+        with self._lock:
+            self.dirty = False          # a tick from here on is in this snapshot or marks the next
+        data = self.to_bytes()
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, tiers=TIERS, utc_offset=None):
+        """Load a snapshot, or start empty."""
+        try:
+            with open(path, "rb") as f:
+                return cls.from_bytes(f.read(), tiers, utc_offset)
+        except (OSError, ValueError, struct.error) as err:
+            if os.path.exists(path):
+                print(f"[WARN] Ignoring unreadable history {path}: {err}")
+        return cls(tiers, utc_offset)
+
+    def save_if_dirty(self, path):
+        """Save if anything changed since the last save (a periodic job body)."""
+        if self.dirty:
+            try:
+                self.save(path)
+            except OSError as err:
+                print(f"[WARN] History save failed: {err}")
@@ -0,0 +1,154 @@
+"""
+Batched inference for the shipped XGBoost models.
+
+The scaler and both boosters are loaded once, on first use, and shared by
+every caller. A batch is scaled with one vectorized NumPy expression and
+both heads score the same scaled buffer, so replaying a backlog costs one
+predict call per head instead of one per row.
+
+When model/models.npz exists (see compiled.py) the boosters come from it
+and only NumPy is imported; otherwise the pickles are loaded through
+joblib and xgboost.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from emotion_core.metrics import INFERENCE
+from emotion_core.schema import ACTIVITIES, EMOTIONS, N_FEATURES
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+COMPILED_FILE = "models.npz"
+
+BatchResult = namedtuple("BatchResult", "emotion emotion_conf activity activity_conf")
+
+_ONE = INFERENCE.labels(mode="one")
+_BATCH = INFERENCE.labels(mode="batch")
+
+
+def features_from_counts(kpm, mouse, clicks):
+    """Feature row for callers that only have the three window counts."""
+    iki = 60000.0 / kpm if kpm else 0.0
+    return [kpm, mouse, clicks, kpm, 0.0, iki, 0.0, 0.0, 0.0 if kpm or clicks else 60.0]
+
+
+class InferenceEngine:
+    """Scaler + emotion/activity boosters, loaded lazily and thread-safe."""
+
+    def __init__(self, model_dir=MODEL_DIR, compiled=True):
+        self.model_dir = model_dir
+        self.compiled = compiled            # False: always use the xgboost pickles
+        self.backend = None                 # "numpy" or "xgboost" once loaded
+        self._lock = threading.Lock()
+        self._models = None
+
+    # --- Loading ---
+    def _load(self):
+        import numpy as np
+
+        path = lambda name: os.path.join(self.model_dir, name)
+        if self.compiled and os.path.exists(path(COMPILED_FILE)):
+            from emotion_core import compiled
+
+            mean, scale, emotion, activity = compiled.load(path(COMPILED_FILE))
+            if len(mean) != N_FEATURES:
+                raise ValueError(f"scaler expects {len(mean)} features, schema has {N_FEATURES}")
+            self.backend = "numpy"
+            return mean, scale, emotion, activity, np.empty((1, N_FEATURES), dtype=np.float32)
+
+        import joblib
+
+        scaler = joblib.load(path("scaler.pkl"))
+        if scaler.n_features_in_ != N_FEATURES:
+            raise ValueError(f"scaler expects {scaler.n_features_in_} features, schema has {N_FEATURES}")
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+        emotion, activity = (self._booster(path, head) for head in ("emotion", "activity"))
+        # The two heads are often the same trained booster; score it once.
+        if emotion.save_raw() == activity.save_raw():
+            activity = emotion
+        self.backend = "xgboost"
+        return mean, scale, emotion, activity, np.empty((1, N_FEATURES), dtype=np.float32)
+
+    @staticmethod
+    def _booster(path, head):
+        # Retrained models (training.py) are xgboost JSON; the shipped ones are pickles.
+        if os.path.exists(path(f"{head}_xgb.json")):
+            import xgboost
+
+            return xgboost.Booster(model_file=path(f"{head}_xgb.json"))
+        import joblib
+
+        return joblib.load(path(f"{head}_xgb.pkl")).get_booster()
+
+    @property
+    def models(self):
+        models = self._models
+        if models is None:
+            with self._lock:
+                if self._models is None:
+                    self._models = self._load()
+                models = self._models
+        return models
+
+    @property
+    def loaded(self):
+        return self._models is not None
+
+    # --- Scoring ---
+    def _scale(self, X):
+        import numpy as np
+
+        mean, scale = self.models[:2]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != N_FEATURES:
+            raise ValueError(f"expected an (n, {N_FEATURES}) feature array, got {X.shape}")
+        # Same arithmetic as StandardScaler.transform, cast once for xgboost.
+        return ((X - mean) / scale).astype(np.float32)
+
+    def predict_proba(self, X):
+        """Return (emotion_proba, activity_proba) for an (n, 9) batch."""
+        _, _, emotion, activity, _ = self.models
+        Xs = self._scale(X)
+        pe = emotion.inplace_predict(Xs)
+        pa = pe if activity is emotion else activity.inplace_predict(Xs)
+        return pe, pa
+
+    def predict_batch(self, X):
+        """Label codes and confidences for every row of an (n, 9) batch."""
+        import numpy as np
+
+        with _BATCH.time():
+            pe, pa = self.predict_proba(X)
+        e = pe.argmax(axis=1)
+        a = e if pa is pe else pa.argmax(axis=1)
+        rows = np.arange(len(e))
+        return BatchResult(
+            e.astype(np.int8), pe[rows, e],
+            a.astype(np.int8), pa[rows, a],
+        )
+
+    def predict_one(self, features):
+        """Low-latency path for the live loop: (emotion, confidence %, activity)."""
+        mean, scale, emotion, activity, buf = self.models
+        t0 = time.perf_counter()
+        with self._lock:
+            buf[0] = (features - mean) / scale
+            pe = emotion.inplace_predict(buf)[0]
+            pa = pe if activity is emotion else activity.inplace_predict(buf)[0]
+        _ONE.observe(time.perf_counter() - t0)
+        e, a = int(pe.argmax()), int(pa.argmax())
+        return EMOTIONS[e], int(round(float(pe[e]) * 100)), ACTIVITIES[a]
+
+
+_engine = None
+
+
+def get_engine():
+    """Process-wide engine; nothing is loaded until the first prediction."""
+    global _engine
+    if _engine is None:
+        _engine = InferenceEngine()
+    return _engine
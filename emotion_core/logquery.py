@@ -0,0 +1,369 @@
+"""
+Time-range queries over activity_log.csv and session_log.txt segments.
+
+Each segment gets a sparse index: one (timestamp, byte offset) pair roughly
+every INDEX_STRIDE bytes, built by probing the memory-mapped file at those
+offsets rather than parsing every line. A query skips whole segments by
+their first/last timestamp, bisects the sparse index to the first block
+that can hold `from`, and parses only the lines up to `to`.
+
+Indexes are cached per segment and extended in place as the live file
+grows. Rotated .gz segments are decompressed once into memory on demand.
+Session lines only carry a clock time, so each session segment is also
+scanned once (incrementally for the live file) for midnight rollovers.
+"""
+import bisect
+import datetime
+import gzip
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from emotion_core.logwriter import segment_paths
+
+INDEX_STRIDE = 16 * 1024
+GZ_CACHE = 8   # decompressed rotated segments kept in memory
+
+SESSION_RE = re.compile(
+    rb"\[(\d\d):(\d\d):(\d\d)\]\s*(?:Emotion=)?(\w+)\s*\((\d+)%+\),?\s*\|?\s*"
+    rb"KPM=(\d+),?\s*\|?\s*Mouse=(\d+),?\s*\|?\s*Clicks=(\d+)"
+)
+CLOCK_RE = re.compile(rb"^\[(\d\d):(\d\d):(\d\d)\]", re.M)
+ROLLOVER = 3600     # a clock that goes back further than this (not a DST fall-back) is a new day
+
+FIELDS = {
+    "activity": ("time", "kpm", "mouse", "clicks", "emotion", "activity"),
+    "session": ("time", "emotion", "confidence", "kpm", "mouse", "clicks"),
+}
+
+
+def parse_time(value):
+    """Epoch seconds from an epoch number or an ISO-8601 string."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _num(text):
+    try:
+        v = float(text)
+    except ValueError:
+        return None
+    return int(v) if v.is_integer() else v
+
+
+# --- Line formats ---
+class ActivityFormat:
+    """timestamp,kpm,mouse_px,clicks,emotion,activity with ISO timestamps."""
+
+    name = "activity"
+
+    def __init__(self, path):
+        pass
+
+    def scan(self, buf):
+        pass
+
+    def timestamp(self, line, pos=0):
+        comma = line.find(b",")
+        if comma <= 0:
+            return None
+        try:
+            return datetime.datetime.fromisoformat(line[:comma].decode()).timestamp()
+        except ValueError:
+            return None     # header or a torn line
+
+    def row(self, line, ts):
+        parts = line.decode("utf-8", "replace").split(",")
+        if len(parts) < 6:
+            return None
+        # Older rows carry the emoji in the label ("Normal 🙂").
+        return (ts, _num(parts[1]), _num(parts[2]), _num(parts[3]),
+                parts[4].split(" ")[0], parts[5].strip())
+
+
+class SessionFormat:
+    """
+    [HH:MM:SS] lines. A segment's first day comes from its name; the live
+    file's is walked back from its mtime, one day per clock rollover.
+    scan() must see the bytes before timestamp() is asked about them.
+    """
+
+    name = "session"
+
+    def __init__(self, path):
+        self.path = path
+        base = os.path.basename(path).split(".")[0]
+        day = base.rsplit("-", 2)[1] if base.count("-") >= 2 else None
+        self.first = datetime.datetime.strptime(day, "%Y%m%d").date() if day else None
+        self.rollovers = []     # byte offsets of the first line of each later day
+        self.midnights = []     # epoch midnight of each day in the segment
+        self.scanned = 0
+        self.clock = None       # seconds of day of the last scanned line
+
+    def scan(self, buf):
+        """Record midnight rollovers in the complete lines added since the last call."""
+        end = buf.rfind(b"\n") + 1
+        for m in CLOCK_RE.finditer(buf, self.scanned, end):
+            clock = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3))
+            if self.clock is not None and self.clock - clock > ROLLOVER:
+                self.rollovers.append(m.start())
+            self.clock = clock
+        self.scanned = max(self.scanned, end)
+        if self.first is None:
+            last = datetime.date.fromtimestamp(os.path.getmtime(self.path))
+            self.first = last - datetime.timedelta(days=len(self.rollovers))
+        while len(self.midnights) <= len(self.rollovers):
+            d = self.first + datetime.timedelta(days=len(self.midnights))
+            self.midnights.append(datetime.datetime(d.year, d.month, d.day).timestamp())
+
+    def timestamp(self, line, pos=0):
+        if len(line) < 10 or line[:1] != b"[" or line[9:10] != b"]":
+            return None
+        try:
+            clock = int(line[1:3]) * 3600 + int(line[4:6]) * 60 + int(line[7:9])
+        except ValueError:
+            return None
+        return self.midnights[bisect.bisect_right(self.rollovers, pos)] + clock
+
+    def row(self, line, ts):
+        m = SESSION_RE.match(line)
+        if not m:
+            return None
+        return (ts, m.group(4).decode(), int(m.group(5)), int(m.group(6)), int(m.group(7)), int(m.group(8)))
+
+
+# --- Segments ---
+class Segment:
+    """One log file plus its sparse (timestamp, offset) index."""
+
+    def __init__(self, path, fmt, sealed):
+        self.path = path
+        self.make_fmt = fmt
+        self.sealed = sealed        # rotated segments never change once indexed
+        self.inode = None
+        self._reset()
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self.fmt = self.make_fmt(self.path)
+        self.size = 0
+        self.times = []
+        self.offsets = []
+        self.last_ts = None
+
+    @property
+    def indexed(self):
+        return self.sealed and self.inode is not None
+
+    def open(self):
+        """Buffer over the whole segment: an mmap, or bytes for .gz."""
+        if self.path.endswith(".gz"):
+            inode = os.stat(self.path).st_ino
+            self._check_inode(inode)
+            return _read_gz(self.path, inode)
+        with open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self._check_inode(st.st_ino)
+            if st.st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _check_inode(self, inode):
+        # First use, the live file was rotated away and recreated, or a
+        # rotated segment was replaced (backfill.py): the index is stale.
+        if inode != self.inode:
+            with self._lock:
+                self.inode = inode
+                self._reset()
+
+    def refresh(self, buf):
+        """Extend the index over bytes appended since the last call."""
+        with self._lock:
+            if len(buf) < self.size:          # truncated in place: start over
+                self._reset()
+            if len(buf) == self.size:
+                return
+            self.fmt.scan(buf)
+            pos = self.size
+            if pos:
+                # Resume after the last indexed line.
+                pos = self.offsets[-1] + INDEX_STRIDE if self.offsets else 0
+            end = len(buf)
+            while pos < end:
+                ts, line_start = self._probe(buf, pos, end)
+                if ts is None:
+                    break
+                self.times.append(ts)
+                self.offsets.append(line_start)
+                pos = line_start + INDEX_STRIDE
+            self.last_ts = self._last_timestamp(buf, end)
+            self.size = end
+
+    def _probe(self, buf, pos, end):
+        """First parsable line starting at or after pos."""
+        if pos:
+            nl = buf.find(b"\n", pos - 1)
+            if nl < 0:
+                return None, end
+            pos = nl + 1
+        while pos < end:
+            nl = buf.find(b"\n", pos)
+            stop = end if nl < 0 else nl
+            ts = self.fmt.timestamp(buf[pos:stop], pos)
+            if ts is not None:
+                return ts, pos
+            if nl < 0:
+                break
+            pos = nl + 1
+        return None, end
+
+    def _last_timestamp(self, buf, end):
+        stop = end
+        while stop > 0:
+            start = buf.rfind(b"\n", 0, stop - 1) + 1
+            ts = self.fmt.timestamp(buf[start:stop].rstrip(b"\n"), start)
+            if ts is not None:
+                return ts
+            stop = start
+        return None
+
+    def query(self, buf, t0, t1, limit):
+        if not self.times or (t1 is not None and self.times[0] >= t1) or (t0 is not None and self.last_ts < t0):
+            return []
+        i = 0 if t0 is None else max(0, bisect.bisect_left(self.times, t0) - 1)
+        pos, end = self.offsets[i], len(buf)
+        rows = []
+        while pos < end and len(rows) < limit:
+            nl = buf.find(b"\n", pos)
+            stop = end if nl < 0 else nl
+            line = buf[pos:stop]
+            ts = self.fmt.timestamp(line, pos)
+            pos = stop + 1
+            if ts is None or (t0 is not None and ts < t0):
+                continue
+            if t1 is not None and ts >= t1:
+                break
+            row = self.fmt.row(line, ts)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+
+_gz_cache = OrderedDict()
+_gz_lock = threading.Lock()
+
+
+def _read_gz(path, inode):
+    key = (path, inode)
+    with _gz_lock:
+        data = _gz_cache.get(key)
+        if data is not None:
+            _gz_cache.move_to_end(key)
+            return data
+    with gzip.open(path, "rb") as f:
+        data = f.read()
+    with _gz_lock:
+        _gz_cache[key] = data
+        while len(_gz_cache) > GZ_CACHE:
+            _gz_cache.popitem(last=False)
+    return data
+
+
+class LogQuery:
+    """Range queries over one log (all of its rotated segments plus the live file)."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.fields = FIELDS[fmt.name]
+        self._segments = {}
+
+    def _segment(self, path):
+        seg = self._segments.get(path)
+        if seg is None:
+            seg = self._segments[path] = Segment(path, self.fmt, sealed=path != self.path)
+        return seg
+
+    def range(self, t0=None, t1=None, limit=10000):
+        """Rows with t0 <= time < t1 (either bound may be None), oldest first."""
+        rows = []
+        live = set()
+        for path in segment_paths(self.path):
+            live.add(path)
+            seg = self._segment(path)
+            if seg.indexed:
+                # Skip rotated segments by their bounds without touching them.
+                if not seg.times or (t0 is not None and seg.last_ts < t0):
+                    continue
+                if t1 is not None and seg.times[0] >= t1:
+                    break
+            buf = seg.open()
+            try:
+                seg.refresh(buf)
+                rows.extend(seg.query(buf, t0, t1, limit - len(rows)))
+            finally:
+                if isinstance(buf, mmap.mmap):
+                    buf.close()
+            if len(rows) >= limit:
+                break
+        for path in list(self._segments):
+            if path not in live:
+                del self._segments[path]
+        return rows
+
+    def columns(self, t0=None, t1=None, fields=None, limit=10000):
+        """Like range(), but column-oriented: {field: [values...]}."""
+        fields = [f for f in (fields or self.fields) if f in self.fields]
+        rows = self.range(t0, t1, limit + 1)
+        truncated = len(rows) > limit
+        rows = rows[:limit]
+        idx = [self.fields.index(f) for f in fields]
+        cols = {f: [r[i] for r in rows] for f, i in zip(fields, idx)}
+        return {"fields": fields, "count": len(rows), "truncated": truncated, "columns": cols}
+
+
+def activity_log(log_dir="logs"):
+    return LogQuery(os.path.join(log_dir, "activity_log.csv"), ActivityFormat)
+
+
+def session_log(log_dir="logs"):
+    return LogQuery(os.path.join(log_dir, "session_log.txt"), SessionFormat)
+
+
+_open = {}
+
+
+def open_log(log_dir, source):
+    """Cached LogQuery for `source` ("activity" or "session") under log_dir."""
+    key = (log_dir, source)
+    q = _open.get(key)
+    if q is None:
+        q = _open[key] = globals()[f"{source}_log"](log_dir)
+    return q
+
+
+def history(log_dir, args):
+    """
+    /api/history for any server: `args` maps from/to/fields/source/limit to
+    strings. Returns (status, JSON-able dict).
+    """
+    source = args.get("source") or "activity"
+    if source not in FIELDS:
+        return 400, {"error": f"unknown source {source!r}"}
+    try:
+        t0 = parse_time(args.get("from"))
+        t1 = parse_time(args.get("to"))
+        limit = min(int(args.get("limit") or 10000), 1_000_000)
+    except ValueError as err:
+        return 400, {"error": str(err)}
+    fields = args.get("fields")
+    fields = ["time"] + [f for f in fields.split(",") if f and f != "time"] if fields else None
+    result = open_log(log_dir, source).columns(t0, t1, fields, limit)
+    result["source"] = source
+    return 200, result
@@ -0,0 +1,168 @@
+"""
+Buffered background log writer.
+
+Callers hand finished lines to `write()`, which only enqueues; a daemon
+thread drains the bounded queue and flushes in batches (by record count or
+age), fsyncing each batch so everything up to the last flush survives a
+crash. Files rotate by size or calendar day and rotated segments are
+gzip-compressed next to the live file:
+
+    logs/session_log.txt                      live segment
+    logs/session_log-20251105-1.txt.gz        rotated segments
+"""
+import datetime
+import glob
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+
+from emotion_core.metrics import LOG_WRITE, registry
+
+_STOP = object()
+
+
+def segment_paths(path):
+    """Rotated segments of `path`, oldest first, followed by the live file."""
+    stem, ext = os.path.splitext(path)
+    compressed = glob.glob(f"{stem}-*{ext}.gz")
+    # A plain segment next to its .gz is a rotation interrupted after compressing.
+    rotated = [p for p in glob.glob(f"{stem}-*{ext}") if p + ".gz" not in compressed] + compressed
+    rotated.sort(key=_segment_key)
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def _segment_key(p):
+    # session_log-20251105-12.txt.gz -> ("20251105", 12)
+    name = os.path.basename(p).split(".")[0]
+    _, day, seq = name.rsplit("-", 2)
+    return day, int(seq)
+
+
+class LogWriter:
+    def __init__(self, path, header=None, max_queue=10000, flush_records=256,
+                 flush_interval=1.0, max_bytes=10 * 1024 * 1024, rotate_daily=True,
+                 compress=True, fsync=True, opener=open):
+        self.path = path
+        self.header = header
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self.fsync = fsync
+        self.opener = opener
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._day = None
+        name = os.path.basename(path)
+        self._latency = LOG_WRITE.labels(file=name)
+        registry.gauge("emotion_log_queue_depth", "Lines waiting for the log writer thread.",
+                       self._queue.qsize, file=name)
+        registry.gauge("emotion_log_dropped_total", "Lines dropped because the log queue was full.",
+                       lambda: self.dropped, kind="counter", file=name)
+        self._thread = threading.Thread(target=self._run, name=f"logwriter:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    # --- Producer side ---
+    def write(self, line):
+        """Queue one line; never blocks. Returns False if the queue was full."""
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout=5.0):
+        """Flush everything queued so far and stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # --- Writer thread ---
+    def _run(self):
+        batch = []
+        stop = False
+        deadline = None
+        while not stop:
+            try:
+                # Nothing pending: sleep until a line arrives rather than
+                # waking every flush_interval for an empty batch.
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                item = self._queue.get(timeout=timeout)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                # Drain whatever else is already waiting without blocking.
+                while True:
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.flush_records:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if stop or len(batch) >= self.flush_records or time.monotonic() >= deadline:
+                try:
+                    self._flush(batch)
+                except OSError as err:
+                    print(f"[WARN] Log write failed ({self.path}): {err}")
+                batch = []
+                deadline = None
+        if self._file:
+            self._file.close()
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        data = "".join(batch)
+        self._maybe_rotate(len(data))
+        with self._latency.time():
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        self.written += len(batch)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            self._day = datetime.date.fromtimestamp(os.path.getmtime(self.path))
+        else:
+            self._day = datetime.date.today()
+        self._file = self.opener(self.path, "a", encoding="utf-8")
+        if self.header and self._file.tell() == 0:
+            self._file.write(self.header)
+
+    def _maybe_rotate(self, incoming):
+        if self._file is None:
+            self._open()
+        today = datetime.date.today()
+        size = self._file.tell()
+        too_big = self.max_bytes and size and size + incoming > self.max_bytes
+        new_day = self.rotate_daily and size and today != self._day
+        if too_big or new_day:
+            self._rotate()
+            self._open()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        stem, ext = os.path.splitext(self.path)
+        day = self._day.strftime("%Y%m%d")
+        seq = 1 + len(glob.glob(f"{stem}-{day}-*{ext}") + glob.glob(f"{stem}-{day}-*{ext}.gz"))
+        target = f"{stem}-{day}-{seq}{ext}"
+        os.replace(self.path, target)
+        if self.compress:
+            # Until the .gz is complete the plain segment stays authoritative.
+            with open(target, "rb") as src, gzip.open(target + ".gz.tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(target + ".gz.tmp", target + ".gz")
+            os.remove(target)
+        self.rotations += 1
@@ -0,0 +1,214 @@
+"""
+In-process latency histograms, rendered as Prometheus text at /metrics.
+
+Every histogram has fixed bucket bounds and keeps one row of counts per
+writing thread, merged when /metrics is scraped. observe() is a C bisect
+plus two adds on the caller's own row: no lock, no allocation, nothing that
+grows with history (metrics.observe in benchmarks/run.py, well under 1 us).
+Labelled series (per lock, per HTTP route, per log file) are separate
+Histogram objects. Look each one up once and keep the reference:
+
+    TICK.observe(dt)
+    drift = SLEEP_DRIFT.labels(loop="analyzer")
+    with HTTP.labels(path="/api/stats").time(): ...
+    data_lock = TimedLock("data_lock")
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# 1 us .. 10 s, three buckets per decade; rounded so le="2.5e-06", not 2.4999999999999998e-06.
+LATENCY_BUCKETS = tuple(round(m * 10.0 ** e, 12) for e in range(-6, 1) for m in (1, 2.5, 5)) + (10.0,)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    __slots__ = ("name", "labels_text", "bounds", "shards", "_local", "_lock")
+
+    def __init__(self, name, buckets=LATENCY_BUCKETS, labels=None):
+        self.name = name
+        self.labels_text = ",".join(f'{k}="{v}"' for k, v in sorted((labels or {}).items()))
+        self.bounds = tuple(float(b) for b in buckets)
+        self.shards = []            # one row per writing thread, kept after it exits
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        # Only this thread writes its row, so the adds need no lock.
+        try:
+            row = self._local.row
+        except AttributeError:
+            row = self._new_row()
+        row[bisect_left(self.bounds, value)] += 1
+        row[-1] += value
+
+    def _new_row(self):
+        row = self._local.row = [0] * (len(self.bounds) + 1) + [0.0]    # ..., +Inf, sum
+        with self._lock:
+            self.shards.append(row)
+        return row
+
+    def time(self):
+        """Context manager observing the elapsed wall time of its block."""
+        return _Timer(self)
+
+    def snapshot(self):
+        """Merged (counts, sum). A row being written may lag its sum by one sample."""
+        with self._lock:
+            rows = list(self.shards)
+        counts = [0] * (len(self.bounds) + 1)
+        total = 0.0
+        for row in rows:
+            total += row[-1]
+            for i, n in enumerate(row[:-1]):
+                counts[i] += n
+        return counts, total
+
+    def render(self, out):
+        counts, total = self.snapshot()
+        sep = "," if self.labels_text else ""
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            out.append(f'{self.name}_bucket{{{self.labels_text}{sep}le="{le}"}} {cumulative}')
+        suffix = f"{{{self.labels_text}}}" if self.labels_text else ""
+        out.append(f"{self.name}_sum{suffix} {total!r}")
+        out.append(f"{self.name}_count{suffix} {cumulative}")
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0)
+
+
+class Family:
+    """All series of one metric name; children are created on first use."""
+
+    def __init__(self, name, help, kind="histogram", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.buckets = buckets
+        self.children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(sorted(labels.items()))
+        child = self.children.get(key)
+        if child is None:
+            with self._lock:
+                child = self.children.get(key)
+                if child is None:
+                    child = self.children[key] = Histogram(self.name, self.buckets, labels)
+        return child
+
+    def render(self, out):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} {self.kind}")
+        for child in list(self.children.values()):
+            child.render(out)
+
+
+class _Gauge:
+    """A value read from a callback at scrape time (queue depth, drop counts...)."""
+
+    def __init__(self, name, help, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.sources = {}
+
+    def render(self, out):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} {self.kind}")
+        for labels, fn in list(self.sources.items()):
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            text = ",".join(f'{k}="{v}"' for k, v in labels)
+            out.append(f"{self.name}{{{text}}} {value!r}" if text else f"{self.name} {value!r}")
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = Family(name, help, buckets=buckets)
+            return self.metrics[name]
+
+    def gauge(self, name, help, fn, kind="gauge", **labels):
+        """Register a callback; re-registering the same labels replaces it."""
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = _Gauge(name, help, kind)
+            metric.sources[tuple(sorted(labels.items()))] = fn
+
+    def render(self):
+        out = []
+        for metric in list(self.metrics.values()):
+            metric.render(out)
+        return ("\n".join(out) + "\n").encode("utf-8")
+
+
+registry = Registry()
+
+# --- Standard series ---
+TICK = registry.histogram("emotion_tick_seconds", "Analyzer tick duration (sample, classify, publish, log).").labels()
+SLEEP_DRIFT = registry.histogram("emotion_sleep_drift_seconds", "How much later than requested a loop woke up.")
+INFERENCE = registry.histogram("emotion_inference_seconds", "Scaler + classifier latency per call.")
+LOCK_WAIT = registry.histogram("emotion_lock_wait_seconds", "Time spent waiting to acquire a shared lock.")
+LOCK_HOLD = registry.histogram("emotion_lock_hold_seconds", "Time a shared lock was held.")
+LOG_WRITE = registry.histogram("emotion_log_flush_seconds", "Log batch write + flush + fsync latency.")
+HTTP = registry.histogram("emotion_http_request_seconds", "HTTP handler latency by route.")
+NOTIFY = registry.histogram("emotion_notify_seconds", "Notification backend delivery latency.")
+
+
+class TimedLock:
+    """
+    Drop-in for threading.Lock that records wait and hold times.
+    """
+
+    __slots__ = ("_lock", "_wait", "_hold", "_t")
+
+    def __init__(self, name, lock=None):
+        self._lock = lock if lock is not None else threading.Lock()
+        self._wait = LOCK_WAIT.labels(lock=name)
+        self._hold = LOCK_HOLD.labels(lock=name)
+        self._t = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        t0 = time.perf_counter()
+        ok = self._lock.acquire(blocking, timeout)
+        if ok:
+            self._t = t1 = time.perf_counter()
+            self._wait.observe(t1 - t0)
+        return ok
+
+    def release(self):
+        self._hold.observe(time.perf_counter() - self._t)
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,130 @@
+"""
+Notification dispatcher.
+
+Callers hand alerts to `notify()`, which only checks the coalescing table
+and enqueues; a daemon thread delivers them through the backend, one at a
+time. An alert is coalesced (dropped) when the same key is still waiting
+in the queue or was accepted less than `cooldown` seconds ago, so a Tired
+reading every tick turns into one banner per cooldown window. The queue is
+bounded: if the backend hangs, the dispatcher thread is the only thing
+stuck, and later alerts are dropped and counted instead of piling up.
+
+A backend is any callable (title, subtitle, message):
+
+    notifier = Notifier(rumps.notification)
+    notifier.notify("Emotion Monitor", "Take a short break.", key="break", cooldown=900)
+
+`osascript` shells out on macOS; `null` and `Recorder` are for headless
+runs, tests and benchmarks.
+"""
+import queue
+import subprocess
+import threading
+import time
+
+from emotion_core.metrics import NOTIFY, registry
+
+_STOP = object()
+
+
+# --- Backends ---
+def osascript(title, subtitle, message, timeout=10.0):
+    """macOS banner via AppleScript; no PyObjC needed."""
+    script = f"display notification {_quote(message)} with title {_quote(title)}"
+    if subtitle:
+        script += f" subtitle {_quote(subtitle)}"
+    subprocess.run(["osascript", "-e", script], timeout=timeout, check=False,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _quote(text):
+    return '"' + str(text).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def null(title, subtitle, message):
+    pass
+
+
+class Recorder:
+    """Keeps every delivered alert; `delay` simulates a slow backend."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    def __call__(self, title, subtitle, message):
+        if self.delay:
+            time.sleep(self.delay)
+        self.sent.append((title, subtitle, message))
+
+
+# --- Dispatcher ---
+class Notifier:
+    def __init__(self, backend, max_queue=16, name="notify"):
+        self.backend = backend
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._pending = set()               # keys queued or being delivered
+        self._accepted = {}                 # key -> monotonic time last accepted
+        self._latency = NOTIFY.labels(backend=getattr(backend, "__name__", type(backend).__name__))
+        registry.gauge("emotion_notify_queue_depth", "Alerts waiting for the notification backend.",
+                       self._queue.qsize, notifier=name)
+        registry.gauge("emotion_notify_coalesced_total", "Alerts merged into one already queued or cooling down.",
+                       lambda: self.coalesced, kind="counter", notifier=name)
+        registry.gauge("emotion_notify_dropped_total", "Alerts dropped because the queue was full.",
+                       lambda: self.dropped, kind="counter", notifier=name)
+        self._thread = threading.Thread(target=self._run, name=f"notifier:{name}", daemon=True)
+        self._thread.start()
+
+    # --- Producer side ---
+    def notify(self, title, message, subtitle="", key=None, cooldown=0.0):
+        """
+        Queue one alert; never blocks. `key` groups alerts for coalescing
+        (default: the full text). Returns True if it was queued.
+        """
+        if key is None:
+            key = (title, subtitle, message)
+        now = time.monotonic()
+        with self._lock:
+            last = self._accepted.get(key)
+            if key in self._pending or (last is not None and now - last < cooldown):
+                self.coalesced += 1
+                return False
+            try:
+                self._queue.put_nowait((key, title, subtitle, message))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending.add(key)
+            self._accepted[key] = now
+        return True
+
+    def close(self, timeout=2.0):
+        """Deliver what is queued (up to `timeout`) and stop the thread."""
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    # --- Dispatcher thread ---
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            key, title, subtitle, message = item
+            try:
+                with self._latency.time():
+                    self.backend(title, subtitle, message)
+                self.delivered += 1
+            except Exception as err:
+                self.failed += 1
+                print(f"[WARN] Notification failed: {err}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
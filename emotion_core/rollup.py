@@ -0,0 +1,356 @@
+"""
+Per-day and per-week rollups, updated on every tick.
+
+Each table row holds one local calendar day (or Monday-to-Sunday week):
+ticks, seconds spent in each emotion and activity, the longest streak of
+each emotion, and running sums of kpm / mouse / clicks / confidence for the
+averages. A tick is credited with the time since the previous one; a gap
+longer than `max_gap` (app closed, machine asleep) counts the tick but no
+time, and ends the current streak. A streak that crosses midnight counts
+towards the day it reaches.
+
+Rows live in one NumPy record array per table (~100 bytes a row), so
+`add()` is a few in-place field updates and a summary over months reads a
+few hundred rows:
+
+    rollups = Rollups.load("logs/rollups.bin")
+    rollups.add(time.time(), kpm, mouse, clicks, EMOTION_CODES[e], conf, ACTIVITY_CODES[a])
+    GET /api/summary?from=2025-01-01&to=2025-03-31&group=week
+
+State is saved like baseline.py (temp file + fsync + rename) when dirty.
+`python -m emotion_core.rollup --rebuild` fills the tables from the
+activity logs once, e.g. for history recorded before rollups existed.
+"""
+import argparse
+import datetime
+import os
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from emotion_core.schema import ACTIVITIES, EMOTIONS, UNKNOWN
+
+ROLLUP_FILE = "rollups.bin"
+MAX_GAP = 300.0              # seconds; longer gaps between ticks are not counted as time
+SAVE_INTERVAL = 60.0
+DEFAULT_DAYS = 7
+GROUPS = ("day", "week", "total")
+
+ROW = np.dtype([
+    ("ticks", np.uint32),
+    ("emotion_s", np.float32, len(EMOTIONS)),
+    ("activity_s", np.float32, len(ACTIVITIES)),
+    ("streak_s", np.float32, len(EMOTIONS)),
+    ("kpm", np.float64),
+    ("mouse", np.float64),
+    ("clicks", np.float64),
+    ("confidence", np.float64),
+    ("confidence_n", np.uint32),
+])
+
+MAGIC = b"EMR1"
+# magic, emotions, activities, row size, day first/count, week first/count,
+# last tick time, streak emotion, streak seconds
+_HEADER = struct.Struct("<4sHHHqqqqdbd")
+_EPOCH = datetime.date(1970, 1, 1).toordinal()
+# Day numbers datetime.date can represent; summaries outside them are a 400.
+MIN_DAY = datetime.date.min.toordinal() - _EPOCH
+MAX_DAY = datetime.date.max.toordinal() - _EPOCH
+
+
+def day_date(day):
+    return datetime.date.fromordinal(_EPOCH + day)
+
+
+def week_start(week):
+    # Day 0 (1970-01-01) was a Thursday; weeks start on Monday.
+    return week * 7 - 3
+
+
+class Table:
+    """ROW records for consecutive keys (day or week numbers), grown on demand."""
+
+    def __init__(self, first=None, rows=None):
+        self.first = first
+        self.rows = np.zeros(0, dtype=ROW) if rows is None else rows
+        self.size = len(self.rows)
+
+    def index(self, key):
+        if self.first is None:
+            self.first = key
+        if key < self.first:
+            pad = self.first - key
+            grown = np.zeros(pad + len(self.rows), dtype=ROW)
+            grown[pad:] = self.rows
+            self.rows, self.first, self.size = grown, key, self.size + pad
+        i = key - self.first
+        if i >= len(self.rows):
+            grown = np.zeros(max(64, 2 * len(self.rows), i + 1), dtype=ROW)
+            grown[:self.size] = self.rows[:self.size]
+            self.rows = grown
+        self.size = max(self.size, i + 1)
+        return i
+
+    def select(self, k0, k1):
+        """(first key, rows) for keys k0 <= key <= k1 that exist."""
+        if self.first is None:
+            return k0, self.rows[:0]
+        a = max(0, k0 - self.first)
+        b = min(self.size, k1 - self.first + 1)
+        return self.first + a, self.rows[a:max(a, b)]
+
+    def used(self):
+        return self.rows[:self.size]
+
+
+class Rollups:
+    def __init__(self, max_gap=MAX_GAP, utc_offset=None):
+        self.max_gap = max_gap
+        # Days start at local midnight, as in HistoryStore.
+        self.utc_offset = time.localtime().tm_gmtoff if utc_offset is None else utc_offset
+        self.days = Table()
+        self.weeks = Table()
+        self.last_t = None
+        self.streak_emotion = UNKNOWN
+        self.streak_s = 0.0
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    # --- Updates ---
+    def add(self, t, kpm, mouse, clicks, emotion, confidence=None, activity=UNKNOWN):
+        """Fold one tick in; emotion/activity are schema codes."""
+        with self._lock:
+            dt = 0.0 if self.last_t is None else t - self.last_t
+            if not 0.0 <= dt <= self.max_gap:
+                dt = 0.0
+                self.streak_emotion = UNKNOWN
+            if t >= (self.last_t or t):
+                self.last_t = t
+            if emotion >= 0 and emotion == self.streak_emotion:
+                self.streak_s += dt
+            else:
+                self.streak_emotion, self.streak_s = emotion, dt
+            day = int((t + self.utc_offset) // 86400)
+            for table, key in ((self.days, day), (self.weeks, (day + 3) // 7)):
+                i = table.index(key)
+                rows = table.rows
+                rows["ticks"][i] += 1
+                rows["kpm"][i] += kpm
+                rows["mouse"][i] += mouse
+                rows["clicks"][i] += clicks
+                if confidence is not None:
+                    rows["confidence"][i] += confidence
+                    rows["confidence_n"][i] += 1
+                if emotion >= 0:
+                    rows["emotion_s"][i, emotion] += dt
+                    if self.streak_s > rows["streak_s"][i, emotion]:
+                        rows["streak_s"][i, emotion] = self.streak_s
+                if activity >= 0:
+                    rows["activity_s"][i, activity] += dt
+            self.dirty = True
+
+    # --- Queries ---
+    def summary(self, d0, d1, group="day"):
+        """Totals for days d0..d1 (inclusive), plus one entry per day or week."""
+        with self._lock:
+            _, days = self.days.select(d0, d1)
+            out = {"from": day_date(d0).isoformat(), "to": day_date(d1).isoformat(),
+                   "group": group, "total": _entry(_fold(days))}
+            if group == "day":
+                first, rows = self.days.select(d0, d1)
+                starts = range(first, first + len(rows))
+            elif group == "week":
+                # Whole weeks that overlap the range.
+                first, rows = self.weeks.select((d0 + 3) // 7, (d1 + 3) // 7)
+                starts = (week_start(w) for w in range(first, first + len(rows)))
+            else:
+                return out
+            out["rows"] = [dict(start=day_date(s).isoformat(), **_entry(r))
+                           for s, r in zip(starts, rows) if r["ticks"]]
+            return out
+
+    def today(self):
+        return int((time.time() + self.utc_offset) // 86400)
+
+    def day_of(self, value):
+        """Day number for a date, an ISO date-time or epoch seconds."""
+        try:
+            return day_of_date(datetime.date.fromisoformat(value))
+        except ValueError:
+            from emotion_core.logquery import parse_time
+
+            return int((parse_time(value) + self.utc_offset) // 86400)
+
+    # --- Persistence ---
+    def to_bytes(self):
+        with self._lock:
+            days, weeks = self.days.used(), self.weeks.used()
+            head = _HEADER.pack(MAGIC, len(EMOTIONS), len(ACTIVITIES), ROW.itemsize,
+                                -1 if self.days.first is None else self.days.first, len(days),
+                                -1 if self.weeks.first is None else self.weeks.first, len(weeks),
+                                -1.0 if self.last_t is None else self.last_t, self.streak_emotion, self.streak_s)
+            return head + days.tobytes() + weeks.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, **kwargs):
+        (magic, n_e, n_a, itemsize, day0, n_days, week0, n_weeks,
+         last_t, streak_e, streak_s) = _HEADER.unpack_from(data)
+        if magic != MAGIC or (n_e, n_a, itemsize) != (len(EMOTIONS), len(ACTIVITIES), ROW.itemsize):
+            raise ValueError("not a rollup snapshot")
+        r = cls(**kwargs)
+        off = _HEADER.size
+        days = np.frombuffer(data, ROW, n_days, off).copy()
+        weeks = np.frombuffer(data, ROW, n_weeks, off + n_days * ROW.itemsize).copy()
+        r.days = Table(day0 if n_days else None, days)
+        r.weeks = Table(week0 if n_weeks else None, weeks)
+        r.last_t = None if last_t < 0 else last_t
+        r.streak_emotion, r.streak_s = streak_e, streak_s
+        return r
+
+    def save(self, path):
+        """Atomic write: readers see the old snapshot or the new one, never a torn file."""
+        data = self.to_bytes()
+        self.dirty = False
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Load a snapshot, or start empty."""
+        try:
+            with open(path, "rb") as f:
+                return cls.from_bytes(f.read(), **kwargs)
+        except (OSError, ValueError, struct.error) as err:
+            if os.path.exists(path):
+                print(f"[WARN] Ignoring unreadable rollups {path}: {err}")
+        return cls(**kwargs)
+
+    def save_if_dirty(self, path):
+        """Save if anything changed since the last save (a periodic job body)."""
+        if self.dirty:
+            try:
+                self.save(path)
+            except OSError as err:
+                print(f"[WARN] Rollup save failed: {err}")
+
+
+def merge(parts, **kwargs):
+    """
+    One Rollups summing several, e.g. every agent of a collector. Days are
+    each part's own local days; streaks keep the longest of any part.
+    """
+    out = Rollups(**kwargs)
+    for r in parts:
+        with r._lock:
+            for mine, theirs in ((out.days, r.days), (out.weeks, r.weeks)):
+                if theirs.first is None or not theirs.size:
+                    continue
+                mine.index(theirs.first)
+                a = mine.index(theirs.first + theirs.size - 1) - theirs.size + 1
+                dst, src = mine.rows[a:a + theirs.size], theirs.used()
+                for name in ROW.names:
+                    if name == "streak_s":
+                        np.maximum(dst[name], src[name], out=dst[name])
+                    else:
+                        dst[name] += src[name]
+    return out
+
+
+def day_of_date(d):
+    return d.toordinal() - _EPOCH
+
+
+def _fold(rows):
+    """One ROW record summing `rows` (streaks: the longest)."""
+    out = np.zeros((), dtype=ROW)
+    for name in ROW.names:
+        if len(rows):
+            out[name] = rows[name].max(axis=0) if name == "streak_s" else rows[name].sum(axis=0)
+    return out
+
+
+def _entry(r):
+    ticks = int(r["ticks"])
+    n = max(ticks, 1)
+    return {
+        "ticks": ticks,
+        "seconds": round(float(r["emotion_s"].sum()), 1),
+        "emotion_seconds": {name: round(float(v), 1) for name, v in zip(EMOTIONS, r["emotion_s"])},
+        "activity_seconds": {name: round(float(v), 1) for name, v in zip(ACTIVITIES, r["activity_s"])},
+        "longest_streak_s": {name: round(float(v), 1) for name, v in zip(EMOTIONS, r["streak_s"])},
+        "avg": {
+            "kpm": round(float(r["kpm"]) / n, 1),
+            "mouse": round(float(r["mouse"]) / n, 1),
+            "clicks": round(float(r["clicks"]) / n, 1),
+            "confidence": round(float(r["confidence"]) / max(int(r["confidence_n"]), 1), 1),
+        },
+    }
+
+
+def summary(rollups, args):
+    """
+    /api/summary for any server: `args` maps from/to/days/group to strings.
+    Returns (status, JSON-able dict).
+    """
+    group = args.get("group") or "day"
+    if group not in GROUPS:
+        return 400, {"error": f"unknown group {group!r}"}
+    try:
+        d1 = rollups.day_of(args["to"]) if args.get("to") else rollups.today()
+        if args.get("from"):
+            d0 = rollups.day_of(args["from"])
+        else:
+            d0 = d1 - int(args.get("days") or DEFAULT_DAYS) + 1
+    except (ValueError, OverflowError) as err:
+        return 400, {"error": str(err)}
+    if not MIN_DAY <= d0 <= MAX_DAY or not MIN_DAY <= d1 <= MAX_DAY:
+        return 400, {"error": "date out of range"}
+    if d1 < d0:
+        return 400, {"error": "`to` is before `from`"}
+    return 200, rollups.summary(d0, d1, group)
+
+
+# --- CLI ---
+def rebuild(log_dir, max_gap=MAX_GAP):
+    """Rollups recomputed from the activity logs (session logs carry no activity)."""
+    from emotion_core.training import read_rows
+
+    r = Rollups(max_gap)
+    for ts, kpm, mouse, clicks, emotion, activity in read_rows(log_dir, "activity"):
+        r.add(ts, kpm, mouse, clicks, emotion, None, activity)
+    return r
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the per-day/per-week rollups.")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--rebuild", action="store_true", help="recompute from the activity logs and save")
+    parser.add_argument("--max-gap", type=float, default=MAX_GAP)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--group", choices=GROUPS, default="day")
+    args = parser.parse_args(argv)
+
+    import json
+
+    path = os.path.join(args.log_dir, ROLLUP_FILE)
+    if args.rebuild:
+        t0 = time.perf_counter()
+        rollups = rebuild(args.log_dir, args.max_gap)
+        rollups.save(path)
+        print(f"[INFO] Rebuilt {path} from {rollups.days.size} days of logs in {time.perf_counter() - t0:.1f} s")
+    else:
+        rollups = Rollups.load(path, max_gap=args.max_gap)
+    status, result = summary(rollups, {"days": str(args.days), "group": args.group})
+    print(json.dumps(result, indent=2))
+    return 0 if status == 200 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+asyncio runtime shared by the entry points and the daemon.
+
+One event loop hosts the HTTP API, the SSE stream and the periodic jobs
+(analyzer ticks, title refresh, baseline saves; see scheduler.py). Anything
+that blocks runs in a thread pool: model inference, log queries, osascript
+and other notification calls. A slow client or a slow call therefore never
+holds up the loop, and an idle keep-alive or stream connection costs one
+suspended coroutine instead of a thread.
+
+    runtime = Runtime(snapshots, port=8080, pages={"/": HTML})
+    runtime.every(15, analyzer_tick)            # blocking job, runs off-loop
+    runtime.every(Adaptive(15, fast=5, slow=120), analyze, name="analyzer")
+    runtime.start()                             # loop in a background thread
+    runtime.spawn(rumps.notification, ...)      # fire-and-forget, any thread
+
+`routes` and `posts` add JSON endpoints without touching _route (the
+collector uses them): a route is fn(args) and a post is fn(body, headers),
+each returning (status, JSON-able dict).
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from emotion_core import metrics
+from emotion_core.scheduler import Scheduler
+from emotion_core.stream import broadcaster
+
+MAX_STREAMS = 1024
+IDLE_TIMEOUT = 30.0      # keep-alive connections with no request are closed after this
+WRITE_TIMEOUT = 10.0     # a client that can't take a response in time is dropped
+STREAM_BUFFER = 256 * 1024   # unsent stream bytes before a stuck client is dropped
+MAX_HEADER = 16 * 1024
+MAX_BODY = 8 * 1024 * 1024
+INLINE_BODY = 16 * 1024  # POST bodies up to this size are handled on the loop, larger ones in the pool
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+JSON = "application/json"
+
+
+class Runtime:
+    def __init__(self, snapshots, host="127.0.0.1", port=8080, log_dir="logs", pages=None,
+                 workers=4, hub=broadcaster, rollups=None, history=None, classifiers=None,
+                 routes=None, posts=None):
+        """
+        `pages` maps a path to HTML (str/bytes, or a callable returning it).
+        `rollups` (rollup.Rollups) backs /api/summary, `history`
+        (history.HistoryStore) backs /api/series and `classifiers`
+        (classifiers.ShadowHarness) backs /api/classifiers; any may be set later.
+        """
+        self.snapshots = snapshots
+        self.host = host
+        self.port = port
+        self.log_dir = log_dir
+        self.rollups = rollups
+        self.history = history
+        self.classifiers = classifiers
+        self.routes = dict(routes or {})
+        self.posts = dict(posts or {})
+        self.pages = dict(pages or {})
+        self.hub = hub
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="runtime")
+        self.loop = None
+        self.scheduler = Scheduler()
+        self._frame = hub.last
+        self._last_frame = 0.0
+        self._streams = set()
+        self._clients = {}                  # connection task -> writer
+        self._stopping = None
+        self._thread = None
+        self._started = threading.Event()
+        self._error = None
+        hub.listeners.append(self._on_frame)
+
+    # --- Scheduling ---
+    def every(self, interval, fn, blocking=True, name=None):
+        """
+        Run fn every `interval` seconds, or per an Adaptive policy fed by
+        fn's return value. The first run is at start, or right away when
+        registered on a running runtime.
+        """
+        self.scheduler.add(name or fn.__name__, fn, interval, blocking)
+
+    def wake(self, name):
+        """Run job `name` now instead of at its (possibly backed-off) deadline."""
+        self.scheduler.wake(name)
+
+    def spawn(self, fn, *args):
+        """Run a blocking side effect in the pool without waiting for it."""
+        fut = self.executor.submit(fn, *args)
+        fut.add_done_callback(_report)
+        return fut
+
+    # --- Lifecycle ---
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._client, self.host, self.port, limit=MAX_HEADER, backlog=512)
+        self.port = server.sockets[0].getsockname()[1]
+        jobs = asyncio.create_task(self.scheduler.run())
+        self._started.set()
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            jobs.cancel()
+            # Closing the sockets lets each connection handler finish on its own.
+            for writer in list(self._clients.values()):
+                writer.close()
+            await asyncio.gather(jobs, *self._clients, return_exceptions=True)
+            self.loop = None
+
+    def run(self):
+        """Serve in the calling thread until stop()."""
+        asyncio.run(self.serve())
+
+    def start(self, timeout=10.0):
+        """Serve from a background thread; returns once the port is listening."""
+        def main():
+            try:
+                self.run()
+            except BaseException as err:
+                self._error = err
+                self._started.set()
+        self._thread = threading.Thread(target=main, name="runtime", daemon=True)
+        self._thread.start()
+        self._started.wait(timeout)
+        if self._error is not None:
+            raise self._error
+
+    def stop(self, timeout=5.0):
+        loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._stopping.set)
+            except RuntimeError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.executor.shutdown(wait=False)
+
+    # --- Stream fan-out ---
+    def _on_frame(self, frame):
+        # Called by Broadcaster.publish from whichever thread ran the tick.
+        loop = self.loop
+        if loop is None:
+            self._frame = frame
+            return
+        try:
+            loop.call_soon_threadsafe(self._fanout, frame)
+        except RuntimeError:
+            pass                            # loop shutting down
+
+    def _fanout(self, frame):
+        # One transport.write per client from this callback; no per-client
+        # task wakeups. A client whose socket buffer backs up is dropped.
+        self._frame = frame
+        self._last_frame = self.loop.time()
+        for writer in list(self._streams):
+            if writer.transport.get_write_buffer_size() > STREAM_BUFFER:
+                self._streams.discard(writer)
+                writer.close()
+            else:
+                writer.write(frame)
+
+    async def _stream(self, reader, writer):
+        if len(self._streams) >= MAX_STREAMS:
+            await self._send(writer, 503, JSON, b'{"error":"too many stream clients"}', keep=False)
+            return
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\nretry: 3000\n\n")
+        if self._frame is not None:
+            writer.write(self._frame)
+        self._streams.add(writer)
+        try:
+            while not self._stopping.is_set() and not writer.is_closing():
+                try:
+                    async with asyncio.timeout(self.hub.keepalive):
+                        if not await reader.read(1024):
+                            break           # client went away
+                except TimeoutError:
+                    if self.loop.time() - self._last_frame >= self.hub.keepalive:
+                        writer.write(b": keepalive\n\n")
+        finally:
+            self._streams.discard(writer)
+
+    # --- HTTP ---
+    async def _client(self, reader, writer):
+        task = asyncio.current_task()
+        self._clients[task] = writer
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout(IDLE_TIMEOUT):
+                        head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                try:
+                    method, target, version, headers = _parse(head)
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._send(writer, 400, JSON, b'{"error":"bad request"}', keep=False)
+                    break
+                if length > MAX_BODY:
+                    await self._send(writer, 413, JSON, b'{"error":"body too large"}', keep=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                url = urlsplit(target)
+                if method == "POST" and url.path in self.posts:
+                    t0 = time.perf_counter()
+                    fn = self.posts[url.path]
+                    try:
+                        if len(body) <= INLINE_BODY:
+                            status, result = fn(body, headers)
+                        else:
+                            status, result = await self.loop.run_in_executor(self.executor, fn, body, headers)
+                        body = json.dumps(result).encode()
+                    except Exception as err:
+                        status, body = _failed(method, target, err)
+                    await self._send(writer, status, JSON, body, (), keep)
+                    metrics.HTTP.labels(path=url.path).observe(time.perf_counter() - t0)
+                    if not keep:
+                        break
+                    continue
+                if method not in ("GET", "HEAD"):
+                    await self._send(writer, 405, JSON, b'{"error":"method not allowed"}', keep=keep)
+                    continue
+                if url.path == "/api/stream":
+                    await self._stream(reader, writer)
+                    break
+                t0 = time.perf_counter()
+                try:
+                    status, ctype, body, extra = await self._route(url, headers)
+                except Exception as err:
+                    (status, body), ctype, extra = _failed(method, target, err), JSON, ()
+                await self._send(writer, status, ctype, body, extra, keep, head_only=method == "HEAD")
+                route = url.path if status != 404 else "unmatched"
+                metrics.HTTP.labels(path=route).observe(time.perf_counter() - t0)
+                if not keep:
+                    break
+        except (ConnectionError, TimeoutError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.pop(task, None)
+            writer.close()
+
+    async def _route(self, url, headers):
+        path = url.path
+        if path == "/api/stats":
+            since = parse_qs(url.query).get("since", [None])[0]
+            status, etag, body = self.snapshots.render(headers.get("if-none-match"), since)
+            return status, JSON, body, (("ETag", etag), ("Cache-Control", "no-cache"))
+        if path == "/api/history":
+            from emotion_core import logquery
+
+            args = {k: v[0] for k, v in parse_qs(url.query).items()}
+            status, result = await self.loop.run_in_executor(self.executor, logquery.history, self.log_dir, args)
+            return status, JSON, json.dumps(result).encode(), ()
+        if path == "/api/summary":
+            if self.rollups is None:
+                return 503, JSON, b'{"error":"rollups not loaded yet"}', ()
+            from emotion_core import rollup
+
+            args = {k: v[0] for k, v in parse_qs(url.query).items()}
+            status, result = await self.loop.run_in_executor(self.executor, rollup.summary, self.rollups, args)
+            return status, JSON, json.dumps(result).encode(), ()
+        if path == "/api/series":
+            if self.history is None:
+                return 503, JSON, b'{"error":"no history store"}', ()
+            from emotion_core import series
+
+            args = {k: v[0] for k, v in parse_qs(url.query).items()}
+            status, result = await self.loop.run_in_executor(self.executor, series.series, self.history, args)
+            return status, JSON, json.dumps(result, separators=(",", ":")).encode(), ()
+        if path == "/api/classifiers":
+            if self.classifiers is None:
+                return 503, JSON, b'{"error":"no classifier harness"}', ()
+            from emotion_core import classifiers
+
+            args = {k: v[0] for k, v in parse_qs(url.query).items()}
+            status, result = await self.loop.run_in_executor(self.executor, classifiers.classifiers,
+                                                             self.classifiers, args)
+            return status, JSON, json.dumps(result).encode(), ()
+        if path == "/metrics":
+            return 200, metrics.CONTENT_TYPE, metrics.registry.render(), ()
+        fn = self.routes.get(path)
+        if fn is not None:
+            args = {k: v[0] for k, v in parse_qs(url.query).items()}
+            status, result = await self.loop.run_in_executor(self.executor, fn, args)
+            return status, JSON, json.dumps(result).encode(), ()
+        page = self.pages.get(path)
+        if page is not None:
+            if callable(page):
+                page = page()
+            if isinstance(page, str):
+                page = page.encode("utf-8")
+            return 200, "text/html; charset=utf-8", page, ()
+        return 404, JSON, b'{"error":"not found"}', ()
+
+    async def _send(self, writer, status, ctype, body, extra=(), keep=True, head_only=False):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {ctype}",
+                 f"Content-Length: {len(body)}", "Connection: " + ("keep-alive" if keep else "close")]
+        lines.extend(f"{name}: {value}" for name, value in extra)
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head_only:
+            writer.write(body)
+        async with asyncio.timeout(WRITE_TIMEOUT):
+            await writer.drain()
+
+
+def _parse(head):
+    """(method, target, version, {lower-case header: value}) from a request head."""
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, version = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+def _failed(method, target, err):
+    """500 response for a handler that raised; the connection stays usable."""
+    print(f"[WARN] {method} {target} failed: {type(err).__name__}: {err}")
+    return 500, b'{"error":"internal error"}'
+
+
+def _report(fut):
+    if not fut.cancelled() and fut.exception() is not None:
+        print(f"[WARN] Background task failed: {fut.exception()}")
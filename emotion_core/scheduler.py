@@ -0,0 +1,239 @@
+"""
+One timer wheel for every periodic job, with adaptive intervals.
+
+Jobs sit in a hashed timer wheel of RESOLUTION-wide slots. The driver sleeps
+until the next occupied slot, so a wakeup happens only when something is
+due, and deadlines that fall in the same slot share one wakeup. Deadlines
+are absolute monotonic times and the next one is always the previous one
+plus the interval, never "now + interval". Intervals therefore don't drift
+over long runs. A job that overruns skips the missed periods instead of
+bursting to catch up.
+
+A job's return value is a hint for its Adaptive policy:
+
+    ACTIVE   input or the detected state changed  -> next run after `fast`
+    IDLE     nothing happening, or paused          -> interval doubles up to `slow`
+    None     normal                                -> back to `base`
+"""
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from emotion_core import metrics
+
+ACTIVE = "active"
+IDLE = "idle"
+
+RESOLUTION = 0.05        # seconds per wheel slot (also the timer slack)
+SLOTS = 512
+
+
+class Adaptive:
+    def __init__(self, base, fast=None, slow=None, factor=2.0):
+        self.base = base
+        self.fast = fast or base
+        self.slow = slow or base
+        self.factor = factor
+        self.current = base
+
+    def next(self, hint=None):
+        if hint == ACTIVE:
+            self.current = self.fast
+        elif hint == IDLE:
+            self.current = min(self.slow, max(self.current, self.base) * self.factor)
+        else:
+            self.current = self.base
+        return self.current
+
+
+class Job:
+    __slots__ = ("name", "fn", "policy", "blocking", "deadline", "tick", "running", "poke", "pool", "drift")
+
+    def __init__(self, name, fn, policy, blocking):
+        self.name = name
+        self.fn = fn
+        self.policy = policy if isinstance(policy, Adaptive) else Adaptive(policy)
+        self.blocking = blocking
+        self.deadline = 0.0
+        self.tick = None           # wheel tick while queued, else None
+        self.running = False
+        self.poke = False
+        self.pool = None
+        self.drift = metrics.SLEEP_DRIFT.labels(loop=name)
+
+
+class TimerWheel:
+    """Hashed timer wheel; times are monotonic seconds, quantized up to RESOLUTION."""
+
+    def __init__(self, origin=0.0, resolution=RESOLUTION, slots=SLOTS):
+        self.origin = origin
+        self.resolution = resolution
+        self.slots = [[] for _ in range(slots)]
+        self.cursor = 0            # first tick not yet expired
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, job, when):
+        tick = max(self.cursor, math.ceil((when - self.origin) / self.resolution - 1e-9))
+        job.tick = tick
+        self.slots[tick % len(self.slots)].append(job)
+        self.count += 1
+
+    def remove(self, job):
+        self.slots[job.tick % len(self.slots)].remove(job)
+        job.tick = None
+        self.count -= 1
+
+    def expire(self, now):
+        """Remove and return the jobs whose slot has been reached, earliest deadline first."""
+        target = math.floor((now - self.origin) / self.resolution + 1e-6)
+        if target < self.cursor:
+            return []
+        n = len(self.slots)
+        due = []
+        for t in range(self.cursor, min(target, self.cursor + n - 1) + 1):
+            slot = self.slots[t % n]
+            if slot:
+                keep = [job for job in slot if job.tick > target]
+                if len(keep) != len(slot):
+                    due.extend(job for job in slot if job.tick <= target)
+                    slot[:] = keep
+        self.cursor = target + 1
+        for job in due:
+            job.tick = None
+        self.count -= len(due)
+        due.sort(key=lambda job: job.deadline)
+        return due
+
+    def next_time(self):
+        """Time of the next occupied slot, or None when the wheel is empty."""
+        if not self.count:
+            return None
+        n = len(self.slots)
+        for t in range(self.cursor, self.cursor + n):
+            for job in self.slots[t % n]:
+                if job.tick == t:
+                    return self.origin + t * self.resolution
+        # Everything is more than one revolution away.
+        tick = min(job.tick for slot in self.slots for job in slot)
+        return self.origin + tick * self.resolution
+
+
+class Scheduler:
+    """Runs Jobs from a TimerWheel on the running asyncio loop."""
+
+    def __init__(self, resolution=RESOLUTION):
+        self.resolution = resolution
+        self.jobs = {}
+        self.wakeups = 0
+        self.wheel = None
+        self.loop = None
+        self._wake = None
+        metrics.registry.gauge("emotion_scheduler_wakeups_total", "Scheduler loop wakeups.",
+                               lambda: self.wakeups, kind="counter")
+
+    def add(self, name, fn, interval, blocking=True):
+        """Register a job (interval: seconds or an Adaptive); it runs first at start, or now if running."""
+        job = self.jobs[name] = Job(name, fn, interval, blocking)
+        loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._enqueue, job)
+            except RuntimeError:
+                pass
+
+    def wake(self, name):
+        """Run job `name` as soon as possible (e.g. after resume). Thread-safe."""
+        loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._poke, name)
+            except RuntimeError:
+                pass
+
+    async def run(self):
+        loop = self.loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.wheel = TimerWheel(loop.time(), self.resolution)
+        for job in list(self.jobs.values()):
+            self._enqueue(job)
+        try:
+            while True:
+                for job in self.wheel.expire(loop.time()):
+                    self._start(job)
+                when = self.wheel.next_time()
+                self._wake.clear()
+                try:
+                    async with asyncio.timeout(None if when is None else max(0.0, when - loop.time())):
+                        await self._wake.wait()
+                except TimeoutError:
+                    pass
+                self.wakeups += 1
+        finally:
+            for job in self.jobs.values():
+                if job.pool is not None:
+                    job.pool.shutdown(wait=False)
+            self.loop = None
+
+    def _enqueue(self, job):
+        if job.blocking and job.pool is None:
+            # One thread per blocking job: it never overlaps itself and
+            # never queues behind other work.
+            job.pool = ThreadPoolExecutor(1, thread_name_prefix=job.name)
+        job.deadline = self.loop.time()
+        self.wheel.add(job, job.deadline)
+        self._wake.set()
+
+    def _start(self, job):
+        job.drift.observe(self.loop.time() - job.deadline)
+        job.running = True
+        if job.blocking:
+            fut = self.loop.run_in_executor(job.pool, job.fn)
+            fut.add_done_callback(lambda f: self._finish(job, f))
+            return
+        try:
+            hint = job.fn()
+        except Exception as err:
+            print(f"[WARN] {job.name} failed: {err}")
+            hint = None
+        self._reschedule(job, hint)
+
+    def _finish(self, job, fut):
+        hint = None
+        if not fut.cancelled():
+            if fut.exception() is not None:
+                print(f"[WARN] {job.name} failed: {fut.exception()}")
+            else:
+                hint = fut.result()
+        self._reschedule(job, hint)
+        self._wake.set()
+
+    def _reschedule(self, job, hint):
+        job.running = False
+        now = self.loop.time()
+        interval = job.policy.next(hint)
+        if job.poke:
+            job.poke = False
+            job.deadline = now
+        else:
+            job.deadline += interval
+            if job.deadline < now:
+                # Overran: skip whole periods so later deadlines stay on the grid.
+                job.deadline += math.ceil((now - job.deadline) / interval) * interval
+        self.wheel.add(job, job.deadline)
+
+    def _poke(self, name):
+        job = self.jobs.get(name)
+        if job is None or self.wheel is None:
+            return
+        if job.running:
+            job.poke = True
+            return
+        if job.tick is not None:
+            self.wheel.remove(job)
+        job.policy.current = job.policy.base
+        job.deadline = self.loop.time()
+        self.wheel.add(job, job.deadline)
+        self._wake.set()
@@ -0,0 +1,60 @@
+"""
+Label codes, display tables and the model feature layout.
+
+Codes are small integers so history, logs and batch results can be stored
+in NumPy arrays instead of strings. The class order matches the label
+encoding of the shipped models in model/ (alphabetical).
+"""
+
+# --- Labels ---
+EMOTIONS = ("Focused", "Normal", "Stressed", "Tired")
+ACTIVITIES = ("Active", "Calm", "Idle", "Working")
+
+EMOTION_CODES = {name: i for i, name in enumerate(EMOTIONS)}
+ACTIVITY_CODES = {name: i for i, name in enumerate(ACTIVITIES)}
+UNKNOWN = -1
+
+EMOTION_EMOJI = {
+    "Focused": "🧠",
+    "Normal": "🙂",
+    "Stressed": "⚡️",
+    "Tired": "🌙",
+}
+
+EMOTION_COLORS = {
+    "Focused": "#00ff66",
+    "Normal": "#FFD700",
+    "Tired": "#0096FF",
+    "Stressed": "#FF4040",
+}
+
+# --- Model input ---
+# One row per analysis window. The first three columns are the raw window
+# counts every entry point already has; the rest describe typing rhythm.
+# features.FeatureExtractor measures them from key events, but the logs keep
+# only counts, so the models are trained, backfilled and served on the rows
+# training.FeatureBuilder rebuilds from the counts. The models shipped in
+# model/ were fitted on a different, unrecorded layout (their scaler's column
+# means do not fit these inputs), so they only score sensibly once replaced
+# by `python -m emotion_core.training --install`; until then the apps run
+# the heuristic as the primary classifier.
+FEATURE_NAMES = (
+    "kpm",
+    "mouse_px",
+    "clicks",
+    "kpm_mean",
+    "kpm_std",
+    "iki_mean_ms",
+    "iki_std_ms",
+    "burst_count",
+    "idle_gap_s",
+)
+N_FEATURES = len(FEATURE_NAMES)
+
+
+def emotion_name(code):
+    return EMOTIONS[code] if 0 <= code < len(EMOTIONS) else "Initializing"
+
+
+def activity_name(code):
+    return ACTIVITIES[code] if 0 <= code < len(ACTIVITIES) else "Idle"
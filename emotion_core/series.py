@@ -0,0 +1,139 @@
+"""
+Downsampled chart series for long time ranges.
+
+    GET /api/series?from=<time>&to=<time>&points=500[&fields=kpm,mouse,emotion]
+
+The samples come from HistoryStore's tiers: the finest tier (raw, 1m, 1h,
+1d) that covers `from` with at most OVERSAMPLE * points samples, so a
+30-day view reads ~1h buckets rather than 500k raw ticks. Numeric fields
+are then reduced to `points` samples each with Largest-Triangle-Three-
+Buckets, which keeps the peaks and dips a plain stride or average would
+flatten. Emotion and activity are labels, so each of `points`
+equal-count buckets keeps its most common one.
+
+The response is columnar, one {t: [...], v: [...]} pair per field, with
+epoch seconds and rounded values:
+
+    {"tier": "1h", "from": ..., "to": ..., "samples": 720,
+     "kpm": {"t": [...], "v": [...]}, "emotion": {"t": [...], "v": [...]},
+     "labels": {"emotion": ["Focused", ...]}}
+"""
+import math
+import time
+
+import numpy as np
+
+from emotion_core.schema import ACTIVITIES, EMOTIONS, UNKNOWN
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+OVERSAMPLE = 8               # input samples per output point when picking a tier
+SCALAR_BUCKET = 32           # lttb() loops over floats below this many samples per bucket
+DEFAULT_RANGE = 86400.0
+NUMERIC = {"kpm": 1, "mouse": 0, "clicks": 1, "confidence": 0}     # field -> decimals
+LABELS = {"emotion": EMOTIONS, "activity": ACTIVITIES}
+DEFAULT_FIELDS = ("kpm", "mouse", "emotion")
+
+
+def lttb(x, y, n):
+    """Indices of the n points Largest-Triangle-Three-Buckets keeps, first and last included."""
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1][:max(n, 0)], dtype=np.intp)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # The first and last points are fixed; the rest go into n - 2 buckets.
+    edges = (np.arange(n - 1) * (size - 2) / (n - 2)).astype(np.intp) + 1
+    # Average point of each bucket (and of the lone last point), from prefix sums.
+    sx = np.concatenate([[0.0], np.cumsum(x)])
+    sy = np.concatenate([[0.0], np.cumsum(y)])
+    lo = edges[1:]
+    hi = np.append(edges[2:], size)
+    avg_x = (sx[hi] - sx[lo]) / (hi - lo)
+    avg_y = (sy[hi] - sy[lo]) / (hi - lo)
+    out = np.empty(n, dtype=np.intp)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    if size > SCALAR_BUCKET * n:
+        for i in range(n - 2):
+            s, e = edges[i], edges[i + 1]
+            # Twice the triangle area (a, candidate, next bucket's average).
+            area = np.abs((x[a] - avg_x[i]) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (avg_y[i] - y[a]))
+            a = s + int(area.argmax())
+            out[i + 1] = a
+        return out
+    # Small buckets: plain floats beat per-bucket array calls.
+    xs, ys, bounds = x.tolist(), y.tolist(), edges.tolist()
+    avg_x, avg_y = avg_x.tolist(), avg_y.tolist()
+    for i in range(n - 2):
+        xa, ya = xs[a], ys[a]
+        dx, dy = xa - avg_x[i], avg_y[i] - ya
+        best = -1.0
+        for j in range(bounds[i], bounds[i + 1]):
+            area = abs(dx * (ys[j] - ya) - (xa - xs[j]) * dy)
+            if area > best:
+                best, pick = area, j
+        a = out[i + 1] = pick
+    return out
+
+
+def bucket_mode(t, codes, n, k):
+    """(bucket start times, most common non-UNKNOWN code) over n equal-count buckets."""
+    size = len(t)
+    if n >= size:
+        return t, codes
+    edges = np.linspace(0, size, n + 1).astype(np.intp)
+    bucket = np.repeat(np.arange(n), np.diff(edges))
+    valid = codes != UNKNOWN
+    counts = np.bincount(bucket[valid] * k + codes[valid], minlength=n * k).reshape(n, k)
+    mode = counts.argmax(axis=1).astype(np.int8)
+    mode[counts.sum(axis=1) == 0] = UNKNOWN
+    return t[edges[:-1]], mode
+
+
+def downsample(s, fields, points):
+    """Columnar dict for a history.Series, at most `points` samples per field."""
+    out = {"tier": s.tier, "samples": int(len(s.t)), "labels": {}}
+    t = s.t
+    for field in fields:
+        values = getattr(s, field)
+        if field in LABELS:
+            bt, bv = bucket_mode(t, values, points, len(LABELS[field]))
+            out[field] = {"t": np.round(bt).astype(np.int64).tolist(), "v": bv.tolist()}
+            out["labels"][field] = list(LABELS[field])
+        else:
+            keep = lttb(t, values, points)
+            v = np.round(values[keep].astype(np.float64), NUMERIC[field])
+            out[field] = {"t": np.round(t[keep]).astype(np.int64).tolist(),
+                          "v": (v.astype(np.int64) if NUMERIC[field] == 0 else v).tolist()}
+    return out
+
+
+def series(history, args):
+    """
+    /api/series for any server: `args` maps from/to/points/fields to strings.
+    Returns (status, JSON-able dict).
+    """
+    from emotion_core.logquery import parse_time
+
+    try:
+        t1 = parse_time(args.get("to"))
+        if t1 is None:
+            t1 = time.time()
+        t0 = parse_time(args.get("from"))
+        if t0 is None:
+            t0 = t1 - DEFAULT_RANGE
+        points = min(max(int(args.get("points") or DEFAULT_POINTS), 2), MAX_POINTS)
+    except ValueError as err:
+        return 400, {"error": str(err)}
+    if not (math.isfinite(t0) and math.isfinite(t1)):
+        return 400, {"error": "`from` and `to` must be finite"}
+    fields = args.get("fields")
+    fields = [f for f in fields.split(",") if f] if fields else list(DEFAULT_FIELDS)
+    unknown = [f for f in fields if f not in NUMERIC and f not in LABELS]
+    if unknown:
+        return 400, {"error": f"unknown field(s) {', '.join(unknown)}"}
+    s = history.range(t0, t1, max_points=points * OVERSAMPLE)
+    return 200, dict(downsample(s, fields, points), **{"from": t0, "to": t1})
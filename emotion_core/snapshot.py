@@ -0,0 +1,86 @@
+"""
+Immutable, pre-encoded stats snapshots.
+
+The analyzer calls `publish()` once per tick. That builds a new Snapshot
+(JSON body, sequence number, ETag, recent history entries each encoded once)
+and swaps it in with a single attribute assignment. Request handlers read
+`publisher.current` without a lock and answer from the bytes it holds:
+
+    GET /api/stats                      full body
+    GET /api/stats  If-None-Match: tag  304 when nothing changed
+    GET /api/stats?since=<seq>          only history entries newer than seq
+"""
+import bisect
+import json
+import os
+import time
+
+_BOOT = f"{os.getpid():x}{int(time.time()):x}"    # ETags never repeat across restarts
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+class Snapshot:
+    __slots__ = ("seq", "etag", "head", "entries", "body")
+
+    def __init__(self, seq, head, entries):
+        self.seq = seq
+        self.etag = f'"{_BOOT}-{seq}"'
+        self.head = head            # encoded stats members, without braces
+        self.entries = entries      # tuple of (seq, encoded entry), oldest first
+        self.body = self._encode(entries)
+
+    def _encode(self, entries):
+        parts = [b'"seq":%d' % self.seq]
+        if self.head:
+            parts.append(self.head)
+        if entries is not None:
+            parts.append(b'"history":[' + b",".join(e for _, e in entries) + b"]")
+        return b"{" + b",".join(parts) + b"}"
+
+    def since(self, seq):
+        """Body holding only history entries newer than `seq`."""
+        if self.entries is None or seq > self.seq:
+            return self.body          # no history, or a seq from before a restart
+        if seq == self.seq:
+            return self._encode(())
+        i = bisect.bisect_right(self.entries, seq, key=lambda e: e[0])
+        return self._encode(self.entries[i:])
+
+
+class SnapshotPublisher:
+    """
+    Builds snapshots for one endpoint. With history_len > 0 every publish
+    may carry one history entry, and the body gets a "history" array of the
+    last history_len entries.
+    """
+
+    def __init__(self, stats, history_len=0):
+        self.history_len = history_len
+        self.current = Snapshot(0, _dumps(stats)[1:-1], () if history_len else None)
+
+    def publish(self, stats, entry=None):
+        prev = self.current
+        seq = prev.seq + 1
+        entries = prev.entries
+        if self.history_len and entry is not None:
+            entries = (entries + ((seq, _dumps(entry)),))[-self.history_len:]
+        snap = Snapshot(seq, _dumps(stats)[1:-1], entries)
+        self.current = snap
+        return snap
+
+    def render(self, if_none_match=None, since=None):
+        """(status, etag, body) for a request; body is b"" for 304."""
+        snap = self.current
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                since = None
+        if since is not None:
+            return 200, snap.etag, snap.since(since)
+        if if_none_match and snap.etag in if_none_match:
+            return 304, snap.etag, b""
+        return 200, snap.etag, snap.body
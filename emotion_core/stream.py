@@ -0,0 +1,33 @@
+"""
+Server-Sent Events frames for the dashboards.
+
+The analyzer calls `publish()` once per tick; the payload is encoded to an
+SSE frame once, kept as `last` for clients that connect later, and handed
+by reference to every `listeners` callback. The asyncio runtime registers
+one and fans frames out to its own stream connections.
+"""
+import json
+
+KEEPALIVE = 15.0        # seconds between comment frames on a quiet stream
+
+
+class Broadcaster:
+    def __init__(self, keepalive=KEEPALIVE):
+        self.keepalive = keepalive
+        self.seq = 0
+        self.last = None
+        self.listeners = []
+
+    def publish(self, payload, event="stats"):
+        """Encode payload once and hand the frame to every listener."""
+        self.seq += 1
+        data = payload if isinstance(payload, (bytes, str)) else json.dumps(payload, separators=(",", ":"))
+        if isinstance(data, bytes):
+            data = data.decode()
+        frame = f"id: {self.seq}\nevent: {event}\ndata: {data}\n\n".encode()
+        self.last = frame
+        for fn in self.listeners:
+            fn(frame)
+
+
+broadcaster = Broadcaster()
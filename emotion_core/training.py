@@ -0,0 +1,381 @@
+"""
+Offline training: logs -> scaler + emotion/activity boosters + report.
+
+    python -m emotion_core.training [--log-dir logs] [--jobs 4] [--install]
+
+activity_log.csv (and optionally session_log.txt) segments, rotated .gz
+ones included, are read line by line in chunks of --chunk-rows. Each
+chunk is turned into model features and folded into a streaming
+StandardScaler. A reservoir then keeps a uniform sample of at most
+--max-rows rows, so memory stays bounded however long the history is.
+
+The logs only keep window counts, so FeatureBuilder rebuilds the rhythm
+columns from them. kpm_mean/kpm_std are trailing KPM_WINDOW statistics
+over the rows, iki_mean_ms is 60000 / kpm, and idle_gap_s is the time
+since the last row with any input. The live "xgboost" classifier builds
+its rows with the same FeatureBuilder, so an installed model sees the
+inputs it was trained on.
+
+The sample is split by time: the newest --test-frac is held out. The rest
+is split into train and validation, also by time. A grid of xgboost
+parameters is searched on a process pool (one single-threaded fit per
+task, early stopping on validation log-loss). The best parameters are
+refit on train+validation and scored on the held-out rows, next to the
+currently installed model.
+
+Artifacts go to <out>/<version>/: scaler.pkl, emotion_xgb.json,
+activity_xgb.json, models.npz (see compiled.py) and report.json.
+--install copies them into model/ (or --model-dir).
+"""
+import argparse
+import datetime
+import gzip
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from emotion_core.features import KPM_WINDOW
+from emotion_core.logquery import ActivityFormat, SessionFormat
+from emotion_core.logwriter import segment_paths
+from emotion_core.schema import ACTIVITIES, ACTIVITY_CODES, EMOTION_CODES, EMOTIONS, N_FEATURES, UNKNOWN
+
+SOURCES = {"activity": ("activity_log.csv", ActivityFormat), "session": ("session_log.txt", SessionFormat)}
+
+GRIDS = {
+    "quick": {"max_depth": (4, 8), "eta": (0.3,), "subsample": (1.0,), "min_child_weight": (1,)},
+    "full": {"max_depth": (3, 5, 8), "eta": (0.1, 0.3), "subsample": (0.8, 1.0), "min_child_weight": (1, 5)},
+}
+MAX_ROUNDS = 400
+EARLY_STOP = 20
+
+
+# --- Reading ---
+def read_rows(log_dir, source):
+    """(ts, kpm, mouse, clicks, emotion code, activity code) per log line, oldest first."""
+    name, fmt_cls = SOURCES[source]
+    for path in segment_paths(os.path.join(log_dir, name)):
+        fmt = fmt_cls(path)
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            data = f.read()         # segments are capped by LogWriter.max_bytes
+        fmt.scan(data)
+        pos = 0
+        for line in data.splitlines(keepends=True):
+            ts = fmt.timestamp(line, pos)
+            pos += len(line)
+            row = fmt.row(line, ts) if ts is not None else None
+            if row is None:
+                continue
+            if source == "activity":
+                ts, kpm, mouse, clicks, emotion, activity = row
+            else:
+                ts, emotion, _, kpm, mouse, clicks = row
+                activity = None
+            yield (ts, kpm or 0, mouse or 0, clicks or 0,
+                   EMOTION_CODES.get(emotion, UNKNOWN), ACTIVITY_CODES.get(activity, UNKNOWN))
+
+
+def read_chunks(log_dir, sources, chunk_rows):
+    """The rows above as arrays of at most chunk_rows, one source after another."""
+    for source in sources:
+        rows = read_rows(log_dir, source)
+        while True:
+            block = list(itertools.islice(rows, chunk_rows))
+            if not block:
+                break
+            a = np.array(block, dtype=np.float64)
+            yield source, a[:, 0], a[:, 1:4], a[:, 4].astype(np.int8), a[:, 5].astype(np.int8)
+
+
+class FeatureBuilder:
+    """Model feature rows from consecutive log rows; carries state across chunks."""
+
+    def __init__(self, window=KPM_WINDOW):
+        self.window = window
+        self.tail_ts = np.empty(0)
+        self.tail_kpm = np.empty(0)
+        self.last_input = None
+
+    def reset(self):
+        self.__init__(self.window)
+
+    def build(self, ts, counts):
+        kpm, mouse, clicks = counts[:, 0], counts[:, 1], counts[:, 2]
+        # Trailing-window KPM mean/std from prefix sums over [carried tail, chunk].
+        all_ts = np.concatenate([self.tail_ts, ts])
+        all_kpm = np.concatenate([self.tail_kpm, kpm])
+        s1 = np.concatenate([[0.0], np.cumsum(all_kpm)])
+        s2 = np.concatenate([[0.0], np.cumsum(all_kpm * all_kpm)])
+        end = np.arange(len(self.tail_ts), len(all_ts)) + 1
+        start = np.searchsorted(all_ts, ts - self.window, side="right")
+        n = end - start
+        mean = (s1[end] - s1[start]) / n
+        std = np.sqrt(np.maximum(0.0, (s2[end] - s2[start]) / n - mean * mean))
+        keep = all_ts > all_ts[-1] - self.window
+        self.tail_ts, self.tail_kpm = all_ts[keep], all_kpm[keep]
+
+        active = (kpm > 0) | (mouse > 0) | (clicks > 0)
+        seen = np.where(active, ts, -np.inf)
+        if self.last_input is not None:
+            seen[0] = max(seen[0], self.last_input)
+        seen = np.maximum.accumulate(seen)
+        # Before any input at all, fall back to features_from_counts' 60 s.
+        idle = np.where(np.isfinite(seen), ts - seen, 60.0)
+        if np.isfinite(seen[-1]):
+            self.last_input = seen[-1]
+
+        X = np.zeros((len(ts), N_FEATURES))
+        X[:, 0], X[:, 1], X[:, 2] = kpm, mouse, clicks
+        X[:, 3], X[:, 4] = mean, std
+        X[:, 5] = np.divide(60000.0, kpm, out=np.zeros_like(kpm), where=kpm > 0)
+        X[:, 8] = np.maximum(0.0, idle)
+        return X
+
+
+class Reservoir:
+    """Uniform sample of at most `size` rows (algorithm R, vectorized per chunk)."""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+        self.cols = None
+        self.n = 0
+
+    def add(self, **cols):
+        m = len(next(iter(cols.values())))
+        if self.cols is None:
+            self.cols = {k: np.empty((self.size,) + v.shape[1:], dtype=v.dtype) for k, v in cols.items()}
+        fill = min(m, self.size - self.n)
+        for k, v in cols.items():
+            self.cols[k][self.n:self.n + fill] = v[:fill]
+        self.n += fill
+        if fill < m:
+            idx = np.arange(fill, m)
+            slot = self.rng.integers(0, self.seen + idx + 1)
+            hit = slot < self.size
+            idx, slot = idx[hit], slot[hit]
+            # Several rows may land on one slot; the last one wins, as in the serial algorithm.
+            slot_rev, first = np.unique(slot[::-1], return_index=True)
+            src = idx[::-1][first]
+            for k, v in cols.items():
+                self.cols[k][slot_rev] = v[src]
+        self.seen += m
+
+    def arrays(self):
+        return {k: v[:self.n] for k, v in (self.cols or {}).items()}
+
+
+# --- Search ---
+_DATA = {}      # worker globals: X_<head>_<split>, y_<head>_<split>
+
+
+def _init_worker(data):
+    _DATA.update(data)
+
+
+def _fit(head, params, X, y, X_val=None, y_val=None, rounds=MAX_ROUNDS):
+    import xgboost as xgb
+
+    n_class = len(EMOTIONS if head == "emotion" else ACTIVITIES)
+    # num_class is fixed by the schema, so a class missing from the logs is fine.
+    full = {"objective": "multi:softprob", "num_class": n_class, "eval_metric": "mlogloss",
+            "tree_method": "hist", "nthread": 1, "seed": 0, **params}
+    dtrain = xgb.DMatrix(X, label=y)
+    if X_val is None:
+        return xgb.train(full, dtrain, num_boost_round=rounds)
+    return xgb.train(full, dtrain, num_boost_round=rounds, evals=[(xgb.DMatrix(X_val, label=y_val), "val")],
+                     early_stopping_rounds=EARLY_STOP, verbose_eval=False)
+
+
+def _search_task(head, params):
+    """Worker: fit on train, early-stop on validation; returns the scores."""
+    import xgboost as xgb
+
+    t0 = time.perf_counter()
+    X_val, y_val = _DATA[f"X_{head}_val"], _DATA[f"y_{head}_val"]
+    booster = _fit(head, params, _DATA[f"X_{head}_train"], _DATA[f"y_{head}_train"], X_val, y_val)
+    rounds = booster.best_iteration + 1
+    p = booster.predict(xgb.DMatrix(X_val), iteration_range=(0, rounds))
+    return {"head": head, "params": params, "rounds": rounds,
+            "val_logloss": round(_logloss(p, y_val), 5), "val_accuracy": round(float((p.argmax(1) == y_val).mean()), 4),
+            "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def grid(name):
+    spec = GRIDS[name]
+    return [dict(zip(spec, values)) for values in itertools.product(*spec.values())]
+
+
+# --- Evaluation ---
+def _logloss(p, y):
+    return float(-np.mean(np.log(np.clip(p[np.arange(len(y)), y], 1e-15, 1.0))))
+
+
+def evaluate(pred, y, labels):
+    """Accuracy, macro-F1 and a confusion matrix (rows: true, cols: predicted)."""
+    k = len(labels)
+    cm = np.bincount(y * k + pred, minlength=k * k).reshape(k, k)
+    tp = np.diag(cm).astype(float)
+    precision = np.divide(tp, cm.sum(0), out=np.zeros(k), where=cm.sum(0) > 0)
+    recall = np.divide(tp, cm.sum(1), out=np.zeros(k), where=cm.sum(1) > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(k), where=precision + recall > 0)
+    present = cm.sum(1) > 0
+    return {
+        "rows": int(len(y)),
+        "accuracy": round(float(tp.sum() / max(1, len(y))), 4),
+        "macro_f1": round(float(f1[present].mean()) if present.any() else 0.0, 4),
+        "per_class": {labels[i]: {"precision": round(precision[i], 4), "recall": round(recall[i], 4),
+                                  "f1": round(f1[i], 4), "support": int(cm[i].sum())} for i in range(k)},
+        "confusion": cm.tolist(),
+    }
+
+
+# --- Pipeline ---
+def load_sample(args):
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    sample = Reservoir(args.max_rows, args.seed)
+    rows = 0
+    builder = FeatureBuilder()
+    current = None
+    for source, ts, counts, emotion, activity in read_chunks(args.log_dir, args.sources, args.chunk_rows):
+        if source != current:
+            builder.reset()         # rolling features don't carry across sources
+            current = source
+        X = builder.build(ts, counts)
+        scaler.partial_fit(X)
+        sample.add(X=X.astype(np.float32), ts=ts, emotion=emotion, activity=activity)
+        rows += len(ts)
+        print(f"[INFO] {rows:,} rows read ({source})", end="\r", flush=True)
+    print()
+    return scaler, sample.arrays(), rows
+
+
+def split_by_time(data, test_frac, val_frac):
+    order = np.argsort(data["ts"], kind="stable")
+    n = len(order)
+    n_test = int(n * test_frac)
+    n_val = int((n - n_test) * val_frac)
+    cut1, cut2 = n - n_test - n_val, n - n_test
+    return order[:cut1], order[cut1:cut2], order[cut2:]
+
+
+def train(args):
+    import joblib
+
+    from emotion_core import compiled
+    from emotion_core.inference import COMPILED_FILE, MODEL_DIR, InferenceEngine
+
+    t0 = time.perf_counter()
+    scaler, data, total = load_sample(args)
+    if not len(data.get("ts", ())):
+        print(f"[WARN] No labelled rows under {args.log_dir}")
+        return 1
+    train_idx, val_idx, test_idx = split_by_time(data, args.test_frac, args.val_frac)
+    Xs = scaler.transform(data["X"]).astype(np.float32)
+
+    shared, heads = {}, {}
+    for head in ("emotion", "activity"):
+        y = data[head]
+        parts = {name: idx[y[idx] != UNKNOWN] for name, idx in
+                 (("train", train_idx), ("val", val_idx), ("test", test_idx))}
+        if min(len(p) for p in parts.values()) < args.min_rows:
+            print(f"[WARN] Not enough labelled {head} rows ({', '.join(f'{k}={len(v)}' for k, v in parts.items())})")
+            return 1
+        heads[head] = parts
+        for split in ("train", "val"):
+            shared[f"X_{head}_{split}"] = Xs[parts[split]]
+            shared[f"y_{head}_{split}"] = y[parts[split]].astype(np.int32)
+
+    tasks = [(head, params) for head in heads for params in grid(args.grid)]
+    print(f"[INFO] {total:,} rows read, {len(Xs):,} sampled; {len(tasks)} fits on {args.jobs} processes")
+    results = []
+    # The training arrays go to each worker once, through the initializer.
+    with ProcessPoolExecutor(args.jobs, initializer=_init_worker, initargs=(shared,)) as pool:
+        for r in pool.map(_search_task, *zip(*tasks)):
+            results.append(r)
+            print(f"[INFO] {r['head']:<8} {r['params']} -> logloss {r['val_logloss']:.4f}, "
+                  f"acc {r['val_accuracy']:.3f}, {r['rounds']} rounds ({r['seconds']} s)")
+
+    version = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    out = os.path.join(args.out, version)
+    os.makedirs(out, exist_ok=True)
+    report = {"version": version, "rows_read": total, "rows_sampled": int(len(Xs)),
+              "sources": list(args.sources), "grid": args.grid, "search": results, "heads": {}}
+    boosters = {}
+    model_dir = args.model_dir or MODEL_DIR
+    current = InferenceEngine(model_dir)
+    for head, parts in heads.items():
+        labels = EMOTIONS if head == "emotion" else ACTIVITIES
+        best = min((r for r in results if r["head"] == head), key=lambda r: r["val_logloss"])
+        fit = np.concatenate([parts["train"], parts["val"]])
+        params = dict(best["params"], nthread=args.jobs)
+        booster = boosters[head] = _fit(head, params, Xs[fit], data[head][fit].astype(np.int32), rounds=best["rounds"])
+        booster.save_model(os.path.join(out, f"{head}_xgb.json"))
+        y_test = data[head][parts["test"]].astype(np.int64)
+        pred = booster.inplace_predict(Xs[parts["test"]]).argmax(1)
+        old = current.predict_batch(data["X"][parts["test"]])
+        report["heads"][head] = {
+            "params": best["params"], "rounds": best["rounds"],
+            "test": evaluate(pred, y_test, labels),
+            "installed_model_test": evaluate(np.asarray(getattr(old, head), dtype=np.int64), y_test, labels),
+        }
+    joblib.dump(scaler, os.path.join(out, "scaler.pkl"))
+    compiled.save(os.path.join(out, COMPILED_FILE), scaler.mean_, scaler.scale_,
+                  {head: compiled.compile_booster(b) for head, b in boosters.items()})
+    report["seconds"] = round(time.perf_counter() - t0, 1)
+    with open(os.path.join(out, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    for head, r in report["heads"].items():
+        print(f"[INFO] {head:<8} test acc {r['test']['accuracy']:.3f} macro-F1 {r['test']['macro_f1']:.3f} "
+              f"(installed model: acc {r['installed_model_test']['accuracy']:.3f}, "
+              f"macro-F1 {r['installed_model_test']['macro_f1']:.3f})")
+    print(f"[INFO] Wrote {out}")
+    if args.install:
+        install(out, model_dir)
+    return 0
+
+
+def install(version_dir, model_dir):
+    """Copy a version's artifacts into model/; each file is swapped in atomically."""
+    for name in ("scaler.pkl", "emotion_xgb.json", "activity_xgb.json", "models.npz"):
+        tmp = os.path.join(model_dir, f".{name}.tmp")
+        shutil.copyfile(os.path.join(version_dir, name), tmp)
+        os.replace(tmp, os.path.join(model_dir, name))
+    print(f"[INFO] Installed {os.path.basename(version_dir)} into {model_dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain the emotion/activity models from local logs.")
+    parser.add_argument("--log-dir", default="logs")
+    parser.add_argument("--sources", default="activity", type=lambda s: tuple(s.split(",")),
+                        help="comma-separated: activity, session (session rows only label emotion)")
+    parser.add_argument("--out", default=os.path.join("model", "versions"))
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--max-rows", type=int, default=500_000, help="reservoir size used for fitting")
+    parser.add_argument("--test-frac", type=float, default=0.2, help="newest fraction held out for the report")
+    parser.add_argument("--val-frac", type=float, default=0.2, help="newest fraction of the rest used for the search")
+    parser.add_argument("--min-rows", type=int, default=20, help="per head and split")
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="quick")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-dir", help="installed model to compare against and --install into (default: model/)")
+    parser.add_argument("--install", action="store_true", help="copy the new artifacts into the model dir")
+    args = parser.parse_args(argv)
+    unknown = set(args.sources) - set(SOURCES)
+    if unknown:
+        parser.error(f"unknown source(s): {', '.join(sorted(unknown))}")
+    return train(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
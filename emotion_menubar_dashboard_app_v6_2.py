@@ -6,18 +6,26 @@ Emotion + Activity Monitor (macOS v6.2 Final Stable)
 Thread-safe | Fixed Dashboard | Smart Fallback | 7-min Detection | Focus Mode | Notifications
 """
 
+import os
 import time
-import json
 import subprocess
-import threading
+from functools import partial
 from datetime import datetime
-from collections import deque
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import numpy as np
 import rumps
 import AppKit
 import objc
 from WebKit import WKWebView, WKWebViewConfiguration
+from emotion_core.capture import InputCapture
+from emotion_core.classifiers import SAVE_INTERVAL as SHADOW_SAVE_INTERVAL, SHADOW_FILE, ShadowHarness
+from emotion_core.history import SAVE_INTERVAL as HISTORY_SAVE_INTERVAL, HistoryStore
+from emotion_core.metrics import TICK
+from emotion_core.notify import Notifier, osascript
+from emotion_core.rollup import ROLLUP_FILE, SAVE_INTERVAL, Rollups
+from emotion_core.runtime import Runtime
+from emotion_core.scheduler import ACTIVE, IDLE, Adaptive
+from emotion_core.schema import ACTIVITY_CODES, EMOTION_CODES, UNKNOWN
+from emotion_core.snapshot import SnapshotPublisher
+from emotion_core.stream import broadcaster
 
 # Hide Dock icon
 rumps.debug_mode(False)
@@ -25,17 +33,31 @@ AppKit.NSApplication.sharedApplication().setActivationPolicy_(1)
 
 # --- Core Configurations ---
 DETECTION_INTERVAL = 420     # 7 minutes
+DETECTION_FAST = 120         # after the emotion changes
+DETECTION_SLOW = 1800        # backed off while idle or paused
 NOTIFY_COOLDOWN = 900        # 15 minutes
 
 # --- State ---
+# Tick history behind /api/series, kept across restarts.
+HISTORY_PATH = os.path.join("logs", "history.bin")
 state = {
     "emotion": "Normal",
     "activity": "Idle",
-    "last_notified": 0,
     "focus_mode": False,
     "paused": False,
-    "history": deque(maxlen=15)
+    "history": HistoryStore.load(HISTORY_PATH)
 }
+DASHBOARD_POINTS = 15
+
+capture = InputCapture()
+# Per-day / per-week totals behind /api/summary; a tick can be DETECTION_SLOW apart.
+os.makedirs("logs", exist_ok=True)
+ROLLUP_PATH = os.path.join("logs", ROLLUP_FILE)
+rollups = Rollups.load(ROLLUP_PATH, max_gap=2 * DETECTION_SLOW)
+# Heuristic as primary (the shipped models predate schema.FEATURE_NAMES); the models are
+# scored alongside in the background for /api/classifiers.
+SHADOW_PATH = os.path.join("logs", SHADOW_FILE)
+classifier = ShadowHarness.from_names("heuristic", ["xgboost"]).load(SHADOW_PATH)
 
 # --- Emoji Titles ---
 EMOJI_TEXT = {
@@ -47,19 +69,16 @@ EMOJI_TEXT = {
 
 # --- Thread-safe Main Thread Execution ---
 def run_on_main_thread(func):
-    AppKit.NSApp().performSelectorOnMainThread_withObject_waitUntilDone_(
-        objc.selector(func, signature=b"v@:"), None, False
-    )
+    # A block on the main operation queue; a bare Python function is not a
+    # selector NSApp can perform.
+    AppKit.NSOperationQueue.mainQueue().addOperationWithBlock_(func)
 
 # --- macOS Notification ---
-def system_notify(title, message):
-    def _notify():
-        try:
-            script = f'display notification "{message}" with title "{title}"'
-            subprocess.run(["osascript", "-e", script])
-        except Exception as e:
-            print("[WARN] Notification failed:", e)
-    run_on_main_thread(_notify)
+# osascript runs on the notifier's own thread, off the analyzer and UI threads.
+notifier = Notifier(osascript)
+
+def system_notify(title, message, key=None, cooldown=0.0):
+    notifier.notify(title, message, key=key, cooldown=cooldown)
 
 # --- Dashboard HTML ---
 def get_dashboard_html():
@@ -84,11 +103,22 @@ def get_dashboard_html():
             #legend {{
                 display: flex; justify-content: center; gap: 20px; margin-top: 15px; font-size: 15px;
             }}
+            #ranges button {{
+                background: #161b22; color: #bbb; border: 1px solid #30363d; border-radius: 6px;
+                padding: 4px 12px; margin: 0 2px; cursor: pointer;
+            }}
+            #ranges button.on {{ color: #e6edf3; border-color: #1E90FF; }}
         </style>
     </head>
     <body>
         <h1>🧠 Emotion + Activity Dashboard</h1>
         <p>Tracking your emotional state during this session</p>
+        <div id="ranges">
+            <button class="on" data-r="0">Session</button>
+            <button data-r="86400">24 h</button>
+            <button data-r="604800">7 days</button>
+            <button data-r="2592000">30 days</button>
+        </div>
         <div><canvas id="chart"></canvas></div>
         <div id="legend">
             <span style="color:#00FF00;">🟢 Focused</span>
@@ -97,88 +127,117 @@ def get_dashboard_html():
             <span style="color:#FF4500;">🔴 Stressed</span>
         </div>
         <script>
-            async function updateChart() {{
-                const res = await fetch('http://localhost:8080/api/stats');
-                const data = await res.json();
-                const emotions = data.history.map(item => item.emotion);
-                const times = data.history.map(item => item.time);
-                const colors = emotions.map(e => ({{ 
-                    "Focused": "#00FF00",
-                    "Normal": "#1E90FF",
-                    "Tired": "#FFA500",
-                    "Stressed": "#FF4500"
-                }})[e]);
-                const ctx = document.getElementById('chart').getContext('2d');
-                if (window.chartInstance) window.chartInstance.destroy();
-                window.chartInstance = new Chart(ctx, {{
-                    type: 'line',
-                    data: {{
-                        labels: times,
-                        datasets: [{{
-                            label: 'Emotion Trend',
-                            data: emotions.map((e,i)=>i+1),
-                            borderColor: colors[colors.length-1] || "#00FF00",
-                            backgroundColor: colors.map(c => c + "33"),
-                            fill: true,
-                            tension: 0.4,
-                            borderWidth: 3,
-                            pointRadius: 5,
-                            pointBackgroundColor: colors
-                        }}]
-                    }},
-                    options: {{
-                        plugins: {{ legend: {{ display: false }} }},
-                        scales: {{
-                            x: {{ ticks: {{ color: '#bbb' }} }},
-                            y: {{ display: false }}
-                        }}
+            const COLORS = {{
+                "Focused": "#00FF00",
+                "Normal": "#1E90FF",
+                "Tired": "#FFA500",
+                "Stressed": "#FF4500"
+            }};
+            // Height of each emotion on the (hidden) y axis, lowest energy first.
+            const LEVEL = {{ "Tired": 1, "Normal": 2, "Focused": 3, "Stressed": 4 }};
+            let range = 0;
+            // Built once; updates swap labels and data and redraw without animation.
+            const chart = new Chart(document.getElementById('chart').getContext('2d'), {{
+                type: 'line',
+                data: {{
+                    labels: [],
+                    datasets: [{{
+                        label: 'Emotion Trend',
+                        data: [],
+                        borderColor: "#00FF00",
+                        backgroundColor: [],
+                        fill: true,
+                        tension: 0.4,
+                        borderWidth: 3,
+                        pointRadius: 5,
+                        pointBackgroundColor: []
+                    }}]
+                }},
+                options: {{
+                    plugins: {{ legend: {{ display: false }} }},
+                    scales: {{
+                        x: {{ ticks: {{ color: '#bbb', maxTicksLimit: 12 }} }},
+                        y: {{ display: false, min: 0, max: 5 }}
                     }}
-                }});
+                }}
+            }});
+            function draw(times, emotions, radius) {{
+                const ds = chart.data.datasets[0];
+                const colors = emotions.map(e => COLORS[e] || "#888888");
+                chart.data.labels = times;
+                ds.data = emotions.map(e => LEVEL[e] || 0);
+                ds.borderColor = colors[colors.length-1] || "#00FF00";
+                ds.backgroundColor = colors.map(c => c + "33");
+                ds.pointBackgroundColor = colors;
+                ds.pointRadius = radius;
+                chart.update('none');
+            }}
+            function updateChart(data) {{
+                if (range) return;
+                draw(data.history.map(item => item.time), data.history.map(item => item.emotion), 5);
             }}
-            setInterval(updateChart, 3000);
-            updateChart();
+            async function showRange(r) {{
+                range = r;
+                document.querySelectorAll('#ranges button').forEach(b => b.classList.toggle('on', +b.dataset.r === r));
+                if (!r) {{
+                    const res = await fetch('http://localhost:8080/api/stats');
+                    updateChart(await res.json());
+                    return;
+                }}
+                const res = await fetch(`http://localhost:8080/api/series?fields=emotion&points=200&from=${{Date.now()/1000 - r}}`);
+                const s = await res.json();
+                if (range !== r || !res.ok) return;
+                const names = s.labels.emotion;
+                const fmt = t => {{
+                    const d = new Date(t * 1000);
+                    return r > 86400 ? d.toLocaleDateString([], {{ month: 'short', day: 'numeric' }}) : d.toLocaleTimeString([], {{ hour: '2-digit', minute: '2-digit' }});
+                }};
+                draw(s.emotion.t.map(fmt), s.emotion.v.map(v => names[v]), 2);
+            }}
+            document.querySelectorAll('#ranges button').forEach(b => b.onclick = () => showRange(+b.dataset.r));
+            const es = new EventSource('http://localhost:8080/api/stream');
+            es.addEventListener('stats', e => updateChart(JSON.parse(e.data)));
         </script>
     </body>
     </html>
     """
 
 # --- Local Server for Dashboard Data ---
-class DashboardHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == "/api/stats":
-            stats = {
-                "emotion": state["emotion"],
-                "activity": state["activity"],
-                "focus_mode": state["focus_mode"],
-                "paused": state["paused"],
-                "history": list(state["history"]),
-            }
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(stats).encode("utf-8"))
-        else:
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html")
-            self.end_headers()
-            self.wfile.write(get_dashboard_html().encode("utf-8"))
+def current_stats():
+    return {
+        "emotion": state["emotion"],
+        "activity": state["activity"],
+        "focus_mode": state["focus_mode"],
+        "paused": state["paused"],
+    }
+
+# Pre-encoded /api/stats body (with the last DASHBOARD_POINTS history entries)
+snapshots = SnapshotPublisher(current_stats(), history_len=DASHBOARD_POINTS)
+
+def publish_state(entry=None):
+    broadcaster.publish(snapshots.publish(current_stats(), entry).body)
 
-def run_server():
-    server = HTTPServer(("localhost", 8080), DashboardHandler)
-    print("[INFO] Dashboard data server running at http://localhost:8080")
-    server.serve_forever()
+# Dashboard page, /api/stats, /api/stream, /api/history, /api/summary, /api/series,
+# /api/classifiers and /metrics on one asyncio loop
+runtime = Runtime(snapshots, host="localhost", port=8080, pages={"/": get_dashboard_html},
+                  rollups=rollups, history=state["history"], classifiers=classifier)
 
-# --- Emotion Detection Simulation ---
+# --- Emotion Detection ---
 def detect_emotion_activity(app):
+    """One detection; returns the scheduler hint (ACTIVE on a change, IDLE with no input)."""
     if state["paused"]:
-        return
-    emotions = ["Focused", "Normal", "Tired", "Stressed"]
-    activities = ["Typing", "Browsing", "Idle"]
-    e = np.random.choice(emotions)
-    a = np.random.choice(activities)
+        return IDLE
+    w, x = capture.sample()
+    kpm, mouse, clicks = w["kpm"], w["mouse"], w["clicks"]
+    e, c, a = classifier.classify(w, x)
+    changed = e != state["emotion"]
     state["emotion"] = e
     state["activity"] = a
-    state["history"].append({ "emotion": e, "time": datetime.now().strftime("%H:%M:%S") })
+    now = time.time()
+    codes = EMOTION_CODES.get(e, UNKNOWN), ACTIVITY_CODES.get(a, UNKNOWN)
+    state["history"].append(now, kpm, mouse, clicks, codes[0], c, codes[1])
+    rollups.add(now, kpm, mouse, clicks, codes[0], c, codes[1])
+    publish_state({"emotion": e, "time": datetime.fromtimestamp(now).strftime("%H:%M:%S")})
 
     def update_ui():
         app.title = EMOJI_TEXT.get(e, "🧠 Monitoring...")
@@ -186,15 +245,18 @@ def detect_emotion_activity(app):
 
     print(f"[INFO] Emotion: {e}, Activity: {a}")
 
-    now = time.time()
-    if not state["focus_mode"] and e in ["Tired", "Stressed"] and (now - state["last_notified"]) > NOTIFY_COOLDOWN:
-        system_notify("🧘 Emotion Monitor", "You seem tired — take a short break ☕")
-        state["last_notified"] = now
+    if not state["focus_mode"] and e in ["Tired", "Stressed"]:
+        system_notify("🧘 Emotion Monitor", "You seem tired — take a short break ☕", key="break", cooldown=NOTIFY_COOLDOWN)
+    if changed:
+        return ACTIVE
+    if not (kpm or mouse or clicks):
+        return IDLE
 
-def analyzer_loop(app):
-    while True:
-        detect_emotion_activity(app)
-        time.sleep(DETECTION_INTERVAL)
+def analyzer_job(app):
+    def analyze():
+        with TICK.time():
+            return detect_emotion_activity(app)
+    return analyze
 
 # --- Native Popup Dashboard (WebKit) ---
 class DashboardWindow(AppKit.NSWindow):
@@ -219,8 +281,14 @@ class EmotionMenubarApp(rumps.App):
         super(EmotionMenubarApp, self).__init__("🧠", title="Emotion Monitor", quit_button=None)
         self.dashboard = None
         self.menu = ["Open Dashboard", "Open in Browser", "Pause Monitoring", "Toggle Focus Mode", None, "Quit"]
-        threading.Thread(target=run_server, daemon=True).start()
-        threading.Thread(target=analyzer_loop, args=(self,), daemon=True).start()
+        capture.start()
+        runtime.every(Adaptive(DETECTION_INTERVAL, fast=DETECTION_FAST, slow=DETECTION_SLOW),
+                      analyzer_job(self), name="analyzer")
+        runtime.every(SAVE_INTERVAL, partial(rollups.save_if_dirty, ROLLUP_PATH), name="rollups")
+        runtime.every(HISTORY_SAVE_INTERVAL, partial(state["history"].save_if_dirty, HISTORY_PATH), name="history")
+        runtime.every(SHADOW_SAVE_INTERVAL, partial(classifier.save_if_dirty, SHADOW_PATH), name="classifiers")
+        runtime.start()
+        print("[INFO] Dashboard data server running at http://localhost:8080")
 
     @rumps.clicked("Open Dashboard")
     def open_dashboard(self, _):
@@ -247,7 +315,9 @@ class EmotionMenubarApp(rumps.App):
     @rumps.clicked("Pause Monitoring")
     def toggle_pause(self, _):
         state["paused"] = not state["paused"]
+        runtime.wake("analyzer")
         status = "Paused ⏸️" if state["paused"] else "Resumed ▶️"
+        publish_state()
         run_on_main_thread(lambda: setattr(self, "title", f"🧠 {status}"))
         system_notify("Emotion Monitor", f"Monitoring {status.lower()}")
 
@@ -255,10 +325,17 @@ class EmotionMenubarApp(rumps.App):
     def toggle_focus(self, _):
         state["focus_mode"] = not state["focus_mode"]
         mode = "ON 🧘" if state["focus_mode"] else "OFF 💻"
+        publish_state()
         system_notify("Focus Mode", f"Focus Mode turned {mode}")
 
     @rumps.clicked("Quit")
     def quit_app(self, _):
+        runtime.stop()
+        notifier.close()
+        rollups.save_if_dirty(ROLLUP_PATH)
+        state["history"].save_if_dirty(HISTORY_PATH)
+        classifier.close()
+        classifier.save_if_dirty(SHADOW_PATH)
         rumps.quit_application()
 
 
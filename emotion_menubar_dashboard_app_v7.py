@@ -1,29 +1,41 @@
 # ===============================================
 # Emotion + Activity Monitor v7  (Core Functional Demo)
 # ===============================================
-import threading, time, random, json, webbrowser, math
+import time, json, webbrowser, math
+from functools import partial
 from datetime import datetime
-from collections import deque
 import rumps
 import AppKit
-from flask import Flask, jsonify, Response
+from emotion_core.baseline import SAVE_INTERVAL, BaselineModel
+from emotion_core.capture import InputCapture
+from emotion_core.classifiers import SAVE_INTERVAL as SHADOW_SAVE_INTERVAL, SHADOW_FILE, ShadowHarness, create
+from emotion_core.history import SAVE_INTERVAL as HISTORY_SAVE_INTERVAL, HistoryStore
+from emotion_core.metrics import TICK
+from emotion_core.notify import Notifier
+from emotion_core.rollup import Rollups
+from emotion_core.runtime import Runtime
+from emotion_core.scheduler import ACTIVE, IDLE, Adaptive
+from emotion_core.schema import EMOTION_CODES
+from emotion_core.snapshot import SnapshotPublisher
+from emotion_core.stream import broadcaster
 
 # ------------------------------------------------
-# Simulated adaptive baseline + emotion detection
+# Input capture + adaptive baseline + emotion detection
 # ------------------------------------------------
-baseline = {"kpm": 180, "mouse": 9000, "clicks": 20}
-history = deque(maxlen=40)
+BASELINE_FILE = "logs/baseline.bin"
+baselines = BaselineModel.load(BASELINE_FILE, legacy_json="logs/baseline.json")
+HISTORY_FILE = "logs/history.bin"
+history = HistoryStore.load(HISTORY_FILE)
+ROLLUP_FILE = "logs/rollups.bin"
+rollups = Rollups.load(ROLLUP_FILE)
+# detect_emotion stays in charge; the models score the same ticks in the background.
+SHADOW_PATH = "logs/" + SHADOW_FILE
+classifier = ShadowHarness(create("heuristic", baseline=baselines.get), [create("xgboost")]).load(SHADOW_PATH)
+capture = InputCapture()
 
-def simulate_metrics():
-    """Simulate keystrokes/mouse/clicks."""
-    return {
-        "kpm": random.randint(100, 260),
-        "mouse": random.randint(5000, 15000),
-        "clicks": random.randint(5, 35),
-    }
-
-def detect_emotion(metrics):
-    """Heuristic emotion + confidence based on deviation."""
+def detect_emotion(metrics, baseline=None):
+    """Heuristic emotion + confidence based on deviation from this hour's baseline."""
+    if baseline is None: baseline = baselines.get(time.time())
     kpm, mouse, clicks = metrics["kpm"], metrics["mouse"], metrics["clicks"]
     emotion = "Normal"; emoji = "🙂"
     if kpm > 240 or mouse > 14000: emotion, emoji = "Stressed", "⚡️"
@@ -34,9 +46,8 @@ def detect_emotion(metrics):
     return emotion, emoji, conf
 
 # ------------------------------------------------
-# Flask dashboard
+# Dashboard (served by the asyncio runtime)
 # ------------------------------------------------
-app = Flask(__name__)
 HTML = """
 <!DOCTYPE html><html><head>
 <title>Emotion Monitor</title>
@@ -51,31 +62,29 @@ footer{margin-top:20px;font-size:12px;opacity:0.6}
 </style></head><body>
 <h1>🧠 Emotion + Activity Monitor</h1>
 <div id='data'></div>
-<footer>Auto refresh every 3 s</footer>
+<footer>Live updates</footer>
 <script>
-async function refresh(){
- const r=await fetch('/api/stats'); const d=await r.json();
+function render(d){
  document.getElementById('data').innerHTML =
   `<div class='card'><b>Emotion:</b> ${d.emotion} (${d.confidence}%)</div>
    <div class='card'><b>KPM:</b> ${d.kpm}</div>
    <div class='card'><b>Mouse px/min:</b> ${d.mouse}</div>
    <div class='card'><b>Clicks/min:</b> ${d.clicks}</div>`;
 }
-refresh(); setInterval(refresh,3000);
+const es=new EventSource('/api/stream');
+es.addEventListener('stats',e=>render(JSON.parse(e.data)));
 </script></body></html>
 """
 
-@app.route("/")
-def home(): return Response(HTML, mimetype="text/html")
-
-@app.route("/api/stats")
-def stats():
-    if history: h = history[-1]
-    else: h = {"emotion":"Initializing","confidence":0,"kpm":0,"mouse":0,"clicks":0}
-    return jsonify(h)
+def latest_stats():
+    h = history.latest()
+    if h is None: return {"emotion":"Initializing","confidence":0,"kpm":0,"mouse":0,"clicks":0}
+    h["time"] = datetime.fromtimestamp(h["time"]).isoformat()
+    return h
 
-def start_server():
-    app.run(port=8080, debug=False, use_reloader=False)
+snapshots = SnapshotPublisher(latest_stats(), history_len=40)
+runtime = Runtime(snapshots, port=8080, pages={"/": HTML}, rollups=rollups, history=history,
+                  classifiers=classifier)
 
 # ------------------------------------------------
 # macOS menubar app
@@ -85,11 +94,17 @@ class EmotionApp(rumps.App):
         super().__init__("🧠 Initializing...", quit_button=None)
         self.menu = ["Open Dashboard", "Pause Monitoring", None, "Quit"]
         self.paused = False
-        self.last_notify = 0
-        threading.Thread(target=start_server, daemon=True).start()
-        time.sleep(1)
+        self.notifier = Notifier(self.notify)
+        self.last_emotion = None
+        runtime.every(SAVE_INTERVAL, partial(baselines.save_if_dirty, BASELINE_FILE), name="baseline")
+        runtime.every(SAVE_INTERVAL, partial(rollups.save_if_dirty, ROLLUP_FILE), name="rollups")
+        runtime.every(HISTORY_SAVE_INTERVAL, partial(history.save_if_dirty, HISTORY_FILE), name="history")
+        runtime.every(SHADOW_SAVE_INTERVAL, partial(classifier.save_if_dirty, SHADOW_PATH), name="classifiers")
+        capture.start()
+        # every 5 sec for testing; 3 sec after a change, up to 60 sec when idle
+        runtime.every(Adaptive(5, fast=3, slow=60), self.tick, name="analyzer")
+        runtime.start()
         webbrowser.open("http://localhost:8080")   # auto open first launch
-        threading.Thread(target=self.loop, daemon=True).start()
 
     @rumps.clicked("Open Dashboard")
     def open_dash(self,_):
@@ -98,39 +113,60 @@ class EmotionApp(rumps.App):
     @rumps.clicked("Pause Monitoring")
     def pause(self,_):
         self.paused = not self.paused
+        runtime.wake("analyzer")
         self.title = "⏸ Paused" if self.paused else "🧠 Resuming..."
         time.sleep(2); self.title="🧠 Monitoring..."
 
     @rumps.clicked("Quit")
-    def quit_app(self,_=None): rumps.quit_application()
+    def quit_app(self,_=None):
+        runtime.stop()
+        self.notifier.close()
+        baselines.close(BASELINE_FILE)
+        rollups.save_if_dirty(ROLLUP_FILE)
+        history.save_if_dirty(HISTORY_FILE)
+        classifier.close()
+        classifier.save_if_dirty(SHADOW_PATH)
+        rumps.quit_application()
 
-    def notify(self,title,msg):
+    def notify(self,title,subtitle,msg):
+        """Notifier backend; runs on the notifier thread."""
         AppKit.NSUserNotificationCenter.defaultUserNotificationCenter().deliverNotification_(
             AppKit.NSUserNotification.alloc().init().autorelease())
         note = AppKit.NSUserNotification.alloc().init()
         note.setTitle_(f"🧠 {title}")
+        if subtitle:
+            note.setSubtitle_(subtitle)
         note.setInformativeText_(msg)
         AppKit.NSUserNotificationCenter.defaultUserNotificationCenter().deliverNotification_(note)
 
-    def loop(self):
-        while True:
-            if not self.paused:
-                metrics = simulate_metrics()
-                # adaptive baseline
-                for k in baseline:
-                    baseline[k] = (baseline[k]*0.9 + metrics[k]*0.1)
-                emotion, emoji, conf = detect_emotion(metrics)
-                data = {"time":datetime.now().isoformat(),
-                        "emotion":emotion,"confidence":conf, **metrics}
-                history.append(data)
-                self.title = f"{emoji} {emotion}"
-                # occasional notification
-                now=time.time()
-                if emotion in ["Tired","Stressed"] and now-self.last_notify>900:
-                    self.notify(emotion, f"You seem {emotion.lower()}, take a short break.")
-                    self.last_notify=now
-                print(f"[INFO] {emotion} ({conf}%) | kpm={metrics['kpm']} mouse={metrics['mouse']} clicks={metrics['clicks']}")
-            time.sleep(5)  # update every 5 sec for testing
+    def tick(self):
+        """Analyzer job; returns ACTIVE on an emotion change, IDLE with no input or paused."""
+        if self.paused:
+            return IDLE
+        t0 = time.perf_counter()
+        metrics, features = capture.sample()
+        # adaptive hour-of-week baseline
+        now = time.time()
+        baselines.update(now, metrics)
+        t1 = time.perf_counter()
+        emotion, emoji, conf = detect_emotion(metrics, baselines.get(now))
+        classifier.observe(metrics, features, (emotion, conf, None), time.perf_counter() - t1)
+        history.append(now, metrics["kpm"], metrics["mouse"], metrics["clicks"],
+                       EMOTION_CODES[emotion], conf)
+        rollups.add(now, metrics["kpm"], metrics["mouse"], metrics["clicks"], EMOTION_CODES[emotion], conf)
+        h = latest_stats()
+        broadcaster.publish(snapshots.publish(h, entry=h).body)
+        self.title = f"{emoji} {emotion}"
+        TICK.observe(time.perf_counter() - t0)
+        # occasional notification (at most one per 15 min)
+        if emotion in ["Tired","Stressed"]:
+            self.notifier.notify(emotion, f"You seem {emotion.lower()}, take a short break.", key="break", cooldown=900)
+        print(f"[INFO] {emotion} ({conf}%) | kpm={metrics['kpm']} mouse={metrics['mouse']} clicks={metrics['clicks']}")
+        changed, self.last_emotion = emotion != self.last_emotion, emotion
+        if changed:
+            return ACTIVE
+        if not (metrics["kpm"] or metrics["mouse"] or metrics["clicks"]):
+            return IDLE
 
 if __name__ == "__main__":
     EmotionApp().run()
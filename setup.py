@@ -1,10 +1,12 @@
 from setuptools import setup
 
 APP = ['emotionMonitor_v9.py']
-DATA_FILES = ['dashboard.html', 'app_icon.icns']
+DATA_FILES = ['dashboard.html', 'app_icon.icns', ('model', ['model/models.npz'])]
 OPTIONS = {
     'argv_emulation': True,
-    'packages': ['rumps', 'pynput', 'flask'],
+    'packages': ['rumps', 'pynput'],
+    # The app scores with model/models.npz (NumPy only); see emotion_core/compiled.py.
+    'excludes': ['xgboost', 'sklearn', 'scipy', 'joblib'],
     'iconfile': 'app_icon.icns',
     'plist': {
         'CFBundleName': 'Emotion Monitor',
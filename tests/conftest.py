@@ -0,0 +1,78 @@
+"""
+Shared fixtures. The entry points are macOS menubar apps; where rumps and
+PyObjC are not installed (CI, Linux), `entry_point` imports them against
+minimal stand-ins for those modules so one analyzer tick can run headless.
+"""
+import importlib
+import importlib.util
+import os
+import sys
+import types
+from unittest import mock
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_MODULES = ("rumps", "AppKit", "objc", "WebKit")
+
+
+def _fake_rumps():
+    rumps = types.ModuleType("rumps")
+
+    class App:
+        def __init__(self, name, title=None, quit_button=None, **_):
+            self.name = name
+            self.title = title if title is not None else name
+            self.menu = []
+
+        def run(self):
+            pass
+
+    rumps.App = App
+    rumps.clicked = lambda *_: (lambda fn: fn)
+    rumps.notification = lambda *args, **kwargs: None
+    rumps.debug_mode = lambda *_: None
+    rumps.quit_application = lambda: None
+    return rumps
+
+
+def _fake_appkit():
+    appkit = mock.MagicMock(name="AppKit")
+    appkit.NSWindow = type("NSWindow", (), {})
+    return appkit
+
+
+@pytest.fixture
+def gui_modules(monkeypatch):
+    """Real GUI modules where importable, stand-ins otherwise."""
+    fakes = {"rumps": _fake_rumps, "AppKit": _fake_appkit,
+             "objc": lambda: mock.MagicMock(name="objc"), "WebKit": lambda: mock.MagicMock(name="WebKit")}
+    for name in GUI_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            monkeypatch.setitem(sys.modules, name, fakes[name]())
+
+
+@pytest.fixture
+def entry_point(gui_modules, tmp_path, monkeypatch):
+    """Import an entry-point script by file name, with its logs/ under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("logs", exist_ok=True)
+    loaded = []
+
+    def load(filename):
+        name = "entry_" + os.path.splitext(filename)[0]
+        spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+        module = importlib.util.module_from_spec(spec)
+        monkeypatch.setitem(sys.modules, name, module)
+        spec.loader.exec_module(module)
+        loaded.append(module)
+        return module
+
+    yield load
+    for module in loaded:
+        for name in ("classifier", "notifier"):
+            if hasattr(module, name):
+                getattr(module, name).close()
+        module.runtime.executor.shutdown(wait=False)
@@ -0,0 +1,55 @@
+"""Backfill labels must not depend on where the chunks are cut."""
+import contextlib
+import datetime
+import gzip
+import io
+import os
+
+import numpy as np
+
+from emotion_core import backfill
+
+HEADER = b"timestamp,kpm,mouse_px,clicks,emotion,activity\n"
+
+
+def make_logs(log_dir):
+    """Two rotated segments (one .gz) and a live file: ~1000 ticks with idle stretches."""
+    rng = np.random.default_rng(7)
+    start = datetime.datetime(2026, 3, 1, 9, 0)
+    lines = []
+    for i in range(1000):
+        busy = (i // 60) % 3 != 2
+        kpm, mouse, clicks = (rng.integers(0, 300), rng.integers(0, 15000), rng.integers(0, 40)) if busy else (0, 0, 0)
+        t = start + datetime.timedelta(seconds=5 * i)
+        lines.append(f"{t.isoformat()},{kpm},{mouse},{clicks},Normal,Calm\n".encode())
+    os.makedirs(log_dir)
+    with open(os.path.join(log_dir, "activity_log-20260301-1.csv"), "wb") as f:
+        f.write(HEADER + b"".join(lines[:400]))
+    with gzip.open(os.path.join(log_dir, "activity_log-20260301-2.csv.gz"), "wb") as f:
+        f.write(HEADER + b"".join(lines[400:430]))
+    with open(os.path.join(log_dir, "activity_log.csv"), "wb") as f:
+        f.write(HEADER + b"".join(lines[430:]))
+
+
+def relabel(log_dir, chunk_bytes):
+    make_logs(log_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert backfill.main(["--log-dir", log_dir, "--jobs", "1", "--chunk-bytes", str(chunk_bytes),
+                              "--include-live", "--no-swap"]) == 0
+    (version,) = os.listdir(os.path.join(log_dir, backfill.WORK_DIR))
+    new = os.path.join(log_dir, backfill.WORK_DIR, version, "new")
+    out = {}
+    for name in sorted(os.listdir(new)):
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(os.path.join(new, name), "rb") as f:
+            out[name] = f.read()
+    return out
+
+
+def test_labels_do_not_depend_on_chunk_boundaries(tmp_path):
+    whole = relabel(str(tmp_path / "whole"), 1 << 30)
+    cut = relabel(str(tmp_path / "cut"), 700)
+    assert len(whole) == 3
+    assert cut == whole
+    labels = {tuple(line.rsplit(b",", 2)[1:]) for data in whole.values() for line in data.splitlines()[1:]}
+    assert len(labels) > 1
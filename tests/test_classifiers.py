@@ -0,0 +1,29 @@
+import numpy as np
+
+from emotion_core import classifiers
+from emotion_core.schema import ACTIVITIES, EMOTIONS
+
+
+def test_heuristic_labels_activity_from_counts():
+    engine = classifiers.create("heuristic")
+    cases = {(0, 0, 0): "Idle", (200, 9000, 20): "Working", (10, 8000, 30): "Active", (10, 500, 2): "Calm"}
+    for (kpm, mouse, clicks), expected in cases.items():
+        e, c, a = engine.predict({"kpm": kpm, "mouse": mouse, "clicks": clicks}, None)
+        assert e in EMOTIONS and 60 <= c <= 99
+        assert a == expected
+
+
+def test_harness_fills_activity_for_engines_without_one():
+    harness = classifiers.ShadowHarness(classifiers.create("random", seed=1))
+    for kpm in (0, 50, 250):
+        e, c, a = harness.classify({"kpm": kpm, "mouse": 4000, "clicks": 5}, np.zeros(9))
+        assert a in ACTIVITIES
+    harness.close()
+
+
+def test_failed_stats_save_warns_instead_of_raising(tmp_path, capsys):
+    harness = classifiers.ShadowHarness(classifiers.create("heuristic"))
+    harness.classify({"kpm": 100, "mouse": 4000, "clicks": 5}, np.zeros(9))
+    harness.save_if_dirty(str(tmp_path / "missing" / "classifiers.json"))
+    assert "[WARN] Classifier stats save failed" in capsys.readouterr().out
+    harness.close()
@@ -0,0 +1,75 @@
+"""Collector (session, seq) dedup: retries never count twice, rejects never count once."""
+import json
+import time
+
+import pytest
+
+from emotion_core.agent import Agent, encode
+from emotion_core.collector import Collector
+
+HEADERS = {"content-encoding": "gzip"}
+
+
+@pytest.fixture
+def collector(tmp_path):
+    c = Collector(host="127.0.0.1", port=0, log_dir=str(tmp_path), save=False)
+    yield c
+    if c.runtime.loop is not None:
+        c.stop()
+    else:
+        c.runtime.executor.shutdown(wait=False)
+
+
+def ticks(n, start=None):
+    start = time.time() - 600 if start is None else start
+    return [(start + 5 * i, 100, 2000, 3, 1, 90, 2) for i in range(n)]
+
+
+def agent_state(collector, agent_id="a"):
+    agent = collector.shard(agent_id).agents[agent_id]
+    return agent.seq, agent.ticks, agent.rollups.to_bytes()
+
+
+def test_resent_batch_is_acknowledged_but_not_applied_again(collector):
+    body = encode("a", "s1", 1, ticks(3))
+    assert collector.ingest(body, HEADERS) == (200, {"seq": 1, "ticks": 3})
+    before = agent_state(collector)
+    status, result = collector.ingest(body, HEADERS)
+    assert (status, result) == (200, {"seq": 1, "duplicate": True})
+    assert agent_state(collector) == before
+    assert (collector.batches, collector.duplicates, collector.ingested) == (1, 1, 3)
+
+    # An older seq from the same session is a late retry too.
+    assert collector.ingest(encode("a", "s1", 2, ticks(2)), HEADERS)[0] == 200
+    assert collector.ingest(encode("a", "s1", 1, ticks(3)), HEADERS)[1]["duplicate"]
+    assert agent_state(collector)[:2] == (2, 5)
+
+
+def test_rejected_batch_does_not_advance_seq(collector):
+    collector.ingest(encode("a", "s1", 1, ticks(1)), HEADERS)
+    bad = ticks(2) + [(float("nan"), 0, 0, 0, 1, 90, 2)]
+    status, _ = collector.ingest(encode("a", "s1", 2, bad), HEADERS)
+    assert status == 400
+    assert agent_state(collector)[:2] == (1, 1)
+    assert collector.ingest(encode("a", "s1", 2, ticks(2)), HEADERS) == (200, {"seq": 2, "ticks": 2})
+
+
+def test_new_session_restarts_seq(collector):
+    collector.ingest(encode("a", "s1", 7, ticks(1)), HEADERS)
+    assert collector.ingest(encode("a", "s2", 1, ticks(1)), HEADERS) == (200, {"seq": 1, "ticks": 1})
+    assert agent_state(collector)[:2] == (1, 2)
+
+
+def test_agent_retry_over_http_counts_once(collector):
+    collector.start()
+    host, port = collector.address
+    agent = Agent(f"http://{host}:{port}", agent_id="a", interval=5)
+    for row in ticks(4):
+        agent.add(*row)
+    assert agent.flush() == 4
+    # The ack got lost: the agent sends the same body again.
+    body = encode("a", agent.session, agent.seq, ticks(4))
+    status, data = agent.pool.post(agent.path, body, agent._headers)
+    assert status == 200 and json.loads(data)["duplicate"]
+    assert collector.ingested == 4
+    agent.pool.close()
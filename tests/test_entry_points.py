@@ -0,0 +1,93 @@
+"""One analyzer tick through each entry point, checking what it records and logs."""
+import csv
+
+import pytest
+
+from emotion_core import notify
+from emotion_core.capture import ReplaySource
+from emotion_core.schema import ACTIVITIES, EMOTIONS
+
+
+def type_some(capture, keys=40, moves=20):
+    c = capture.counters
+    for _ in range(keys):
+        c.on_key()
+    for i in range(moves):
+        c.on_move(i * 50, i * 20)
+    c.on_click(0, 0)
+
+
+def last_activity(history):
+    """Activity code of the newest raw sample (latest() maps UNKNOWN to "Idle")."""
+    return int(history.tail(1).activity[0])
+
+
+def activity_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_v9_tick_logs_and_records_activity(entry_point):
+    app = entry_point("emotionMonitor_v9_final.py")
+    app.notifier.backend = notify.null
+    for _ in range(2):
+        type_some(app.capture)
+        assert app.analyzer_tick() in EMOTIONS
+    app.session_log.close()
+    app.activity_log.close()
+
+    rows = activity_rows("logs/activity_log.csv")
+    assert len(rows) == 2
+    assert all(r["activity"] in ACTIVITIES for r in rows)
+    assert last_activity(app.history) >= 0
+    assert app.rollups.days.size == 1
+
+
+def test_v6_2_tick_records_and_publishes(entry_point):
+    app = entry_point("emotion_menubar_dashboard_app_v6_2.py")
+    app.notifier.backend = notify.null
+    seq = app.snapshots.current.seq
+    menubar = type("Menubar", (), {"title": ""})()
+    type_some(app.capture)
+    app.detect_emotion_activity(menubar)
+
+    assert app.state["activity"] in ACTIVITIES
+    assert last_activity(app.state["history"]) >= 0
+    assert app.rollups.days.size == 1
+    assert app.snapshots.current.seq > seq
+
+
+def test_v7_tick_records_history(entry_point):
+    app = entry_point("emotion_menubar_dashboard_app_v7.py")
+    fake = type("App", (), {"paused": False, "last_emotion": None, "title": "",
+                            "notifier": notify.Notifier(notify.null, name="test-v7")})()
+    type_some(app.capture)
+    app.EmotionApp.tick(fake)
+    fake.notifier.close()
+
+    assert fake.title.split()[-1] in EMOTIONS
+    assert app.history.latest()["emotion"] == fake.title.split()[-1]
+    assert app.classifier.ticks == 1
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    from emotion_core.daemon import Daemon
+
+    d = Daemon(port=0, interval=0.05, log_dir=str(tmp_path / "logs"),
+               capture_source=lambda counters: ReplaySource(counters, []))
+    d.setup()
+    yield d
+    d.stop()
+
+
+def test_daemon_tick_logs_and_records_activity(daemon):
+    for _ in range(2):
+        type_some(daemon.capture)
+        daemon.tick()
+    assert daemon.stats["activity"] in ACTIVITIES
+    daemon.activity_log.close()
+    rows = activity_rows(daemon.activity_log.path)
+    assert [r["activity"] in ACTIVITIES for r in rows] == [True, True]
+    assert last_activity(daemon.history) >= 0
+    assert daemon.rollups.days.size == 1
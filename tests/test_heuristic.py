@@ -0,0 +1,47 @@
+"""detect_emotion_batch against the scalar v7 loop it replaces."""
+import numpy as np
+import pytest
+
+from emotion_core import heuristic
+from emotion_core.schema import EMOTIONS
+
+
+def scalar_loop(kpm, mouse, clicks):
+    """The original EmotionApp.loop: update the EMA baseline, then detect_emotion."""
+    baseline = dict(heuristic.DEFAULT_BASELINE)
+    out = []
+    for metrics in ({"kpm": k, "mouse": m, "clicks": c} for k, m, c in zip(kpm, mouse, clicks)):
+        for key in baseline:
+            baseline[key] = (baseline[key] * 0.9 + metrics[key] * 0.1)
+        k, m = metrics["kpm"], metrics["mouse"]
+        emotion = "Normal"
+        if k > 240 or m > 14000:
+            emotion = "Stressed"
+        elif k < 120 and m < 5000:
+            emotion = "Tired"
+        elif 160 < k < 230 and 7000 < m < 11000:
+            emotion = "Focused"
+        conf = max(60, min(99, int(90 - abs(k - baseline["kpm"]) / 3)))
+        out.append((emotion, conf))
+    return out, baseline
+
+
+def runs():
+    rng = np.random.default_rng(0)
+    n = 3000
+    yield pytest.param([180] * 5000, [9000] * 5000, [20] * 5000, id="constant-180")
+    yield pytest.param([150] * n, [6000] * n, [10] * n, id="constant-150")
+    yield pytest.param([180] * 100 + [0] * 4000, [9000] * 100 + [0] * 4000, [20] * 100 + [0] * 4000,
+                       id="burst-then-idle")
+    yield pytest.param(rng.integers(0, 400, n).tolist(), rng.integers(0, 20000, n).tolist(),
+                       rng.integers(0, 50, n).tolist(), id="random")
+
+
+@pytest.mark.parametrize("kpm,mouse,clicks", list(runs()))
+def test_batch_matches_scalar_loop(kpm, mouse, clicks):
+    expected, baseline = scalar_loop(kpm, mouse, clicks)
+    codes, emojis, conf, final = heuristic.detect_emotion_batch(kpm, mouse, clicks)
+    assert [EMOTIONS[c] for c in codes] == [e for e, _ in expected]
+    assert conf.tolist() == [c for _, c in expected]
+    assert final == baseline
+
@@ -0,0 +1,54 @@
+"""HistoryStore day buckets across DST and the save/dirty handshake."""
+import datetime
+import os
+import time
+
+import pytest
+
+from emotion_core.history import HistoryStore
+
+
+@pytest.fixture
+def berlin():
+    old = os.environ.get("TZ")
+    os.environ["TZ"] = "CET-1CEST,M3.5.0,M10.5.0/3"
+    time.tzset()
+    yield
+    if old is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = old
+    time.tzset()
+
+
+def local(*args):
+    return time.mktime(datetime.datetime(*args).timetuple())
+
+
+def test_day_buckets_follow_the_offset_across_dst(berlin):
+    history = HistoryStore()
+    # 2026-03-29 is the spring-forward day. Sample every 10 minutes until the
+    # 31st is far enough along for the 30th to roll up through 1m and 1h.
+    t, end = local(2026, 3, 28, 0, 5), local(2026, 3, 31, 2, 15)
+    while t < end:
+        history.append(t, 100, 2000, 3, 1, 90, 2)
+        t += 600
+    days = history.range(0, end, tier="1d")
+    assert list(days.t) == [local(2026, 3, 28), local(2026, 3, 29), local(2026, 3, 30)]
+    assert list(days.n) == [144, 138, 144]       # the 29th is 23 hours long
+    hours = history.range(local(2026, 3, 30), local(2026, 3, 30, 3), tier="1h")
+    assert list(hours.t) == [local(2026, 3, 30, h) for h in range(3)]
+
+
+def test_a_tick_during_save_keeps_the_store_dirty(tmp_path):
+    history = HistoryStore(utc_offset=0)
+    history.append(1.0, 100, 2000, 3, 1, 90, 2)
+    snapshot = history.to_bytes
+
+    def racing_tick():
+        history.append(2.0, 100, 2000, 3, 1, 90, 2)
+        return snapshot()
+
+    history.to_bytes = racing_tick
+    history.save(str(tmp_path / "history.bin"))
+    assert history.dirty
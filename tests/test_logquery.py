@@ -0,0 +1,50 @@
+"""Session segments that span midnight."""
+import datetime
+import os
+
+from emotion_core import logquery, training
+
+LINE = "[{}] Emotion=Normal (90%) | KPM=100 | Mouse=2000 | Clicks=3\n"
+
+
+def write(path, clocks, mode="w"):
+    with open(path, mode) as f:
+        f.writelines(LINE.format(c) for c in clocks)
+
+
+def at(day, clock):
+    return datetime.datetime.combine(day, datetime.time.fromisoformat(clock)).timestamp()
+
+
+def test_live_segment_is_dated_back_from_its_mtime(tmp_path):
+    today = datetime.date(2026, 3, 4)
+    path = tmp_path / "session_log.txt"
+    write(path, ["23:59:58", "23:59:59", "00:00:01", "00:00:02"])
+    os.utime(path, (at(today, "00:00:03"),) * 2)
+    times = logquery.session_log(str(tmp_path)).columns(fields=["time"])["columns"]["time"]
+    yesterday = today - datetime.timedelta(days=1)
+    assert times == [at(yesterday, "23:59:58"), at(yesterday, "23:59:59"),
+                     at(today, "00:00:01"), at(today, "00:00:02")]
+    assert [r[0] for r in training.read_rows(str(tmp_path), "session")] == times
+
+
+def test_appended_rollover_keeps_earlier_lines_dated(tmp_path):
+    day = datetime.date(2026, 3, 3)
+    path = tmp_path / "session_log.txt"
+    write(path, ["22:00:00", "23:59:59"])
+    os.utime(path, (at(day, "23:59:59"),) * 2)
+    query = logquery.session_log(str(tmp_path))
+    assert len(query.range()) == 2
+    write(path, ["00:00:01"], mode="a")
+    os.utime(path, (at(day, "23:59:59") + 2,) * 2)
+    times = [r[0] for r in query.range()]
+    assert times == [at(day, "22:00:00"), at(day, "23:59:59"), at(day, "23:59:59") + 2]
+    assert [r[0] for r in query.range(t0=at(day, "23:00:00"))] == times[1:]
+
+
+def test_named_segment_counts_forward_and_ignores_dst_fallback(tmp_path):
+    day = datetime.date(2026, 3, 4)
+    write(tmp_path / "session_log-20260304-1.txt", ["01:59:59", "01:00:00", "23:00:00", "09:00:00"])
+    times = [r[0] for r in logquery.session_log(str(tmp_path)).range()]
+    tomorrow = day + datetime.timedelta(days=1)
+    assert times == [at(day, "01:59:59"), at(day, "01:00:00"), at(day, "23:00:00"), at(tomorrow, "09:00:00")]
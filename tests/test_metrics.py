@@ -0,0 +1,34 @@
+"""Histogram per-thread rows and TimedLock samples."""
+import threading
+
+from emotion_core.metrics import Histogram, TimedLock
+
+
+def test_rows_from_every_thread_are_merged():
+    hist = Histogram("t")
+    hist.observe(0.0012)
+
+    def work():
+        for _ in range(1000):
+            hist.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counts, total = hist.snapshot()
+    assert sum(counts) == 4001
+    assert counts[hist.bounds.index(0.5)] == 4000
+    assert total == 0.0012 + 4000 * 0.5
+    out = []
+    hist.render(out)
+    assert out[-1] == "t_count 4001"
+
+
+def test_timed_lock_records_wait_and_hold():
+    lock = TimedLock("test_metrics")
+    with lock:
+        assert lock.locked()
+    assert sum(lock._wait.snapshot()[0]) == 1
+    assert sum(lock._hold.snapshot()[0]) == 1
@@ -0,0 +1,24 @@
+"""/api/series argument handling."""
+import json
+
+import pytest
+
+from emotion_core.history import HistoryStore
+from emotion_core.series import DEFAULT_RANGE, series
+
+
+def test_to_zero_is_epoch_not_now():
+    history = HistoryStore(utc_offset=0)
+    history.append(10.0, 100, 2000, 3, 1, 90, 2)
+    status, body = series(history, {"to": "0"})
+    assert status == 200
+    assert (body["from"], body["to"]) == (-DEFAULT_RANGE, 0.0)
+    assert body["samples"] == 0
+
+
+@pytest.mark.parametrize("args", [{"to": "nan"}, {"from": "inf"}, {"from": "-inf", "to": "10"}],
+                         ids=["nan-to", "inf-from", "negative-inf"])
+def test_non_finite_bounds_are_rejected(args):
+    status, body = series(HistoryStore(utc_offset=0), args)
+    assert status == 400
+    json.dumps(body, allow_nan=False)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from emotion_core.classifiers import ModelClassifier
+from emotion_core.training import FeatureBuilder
+
+
+class Recorder:
+    """Stands in for InferenceEngine; keeps the rows it is asked to score."""
+
+    def __init__(self):
+        self.rows = []
+
+    def predict_one(self, row):
+        self.rows.append(np.array(row))
+        return "Normal", 70, "Calm"
+
+
+def windows(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = 1.7e9 + np.cumsum(rng.uniform(5, 20, n))
+    counts = rng.integers(0, 300, (n, 3)).astype(np.float64)
+    counts[rng.random(n) < 0.3] = 0           # idle stretches
+    return ts, counts
+
+
+def test_live_model_rows_match_training_rows():
+    ts, counts = windows()
+    engine = Recorder()
+    clock = iter(ts)
+    model = ModelClassifier(engine, clock=lambda: next(clock))
+    for kpm, mouse, clicks in counts:
+        model.predict({"kpm": kpm, "mouse": mouse, "clicks": clicks}, None)
+    np.testing.assert_allclose(np.array(engine.rows), FeatureBuilder().build(ts, counts))
+
+
+def test_feature_builder_is_chunk_invariant():
+    ts, counts = windows()
+    whole = FeatureBuilder().build(ts, counts)
+    builder = FeatureBuilder()
+    parts = [builder.build(ts[a:b], counts[a:b]) for a, b in ((0, 7), (7, 150), (150, 151), (151, 400))]
+    np.testing.assert_allclose(np.concatenate(parts), whole)